@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "psycopg2-binary",
+#     "python-dotenv",
+#     "requests",
+# ]
+# ///
 """
 Knowledge Skill 评测脚本 (AutoResearch 风格)
-用法: python eval.py [--verbose] [--record]
+用法: uv run scripts/eval.py [--verbose] [--record] [--workers N] [--timeout SECONDS] [--subprocess]
+
+默认在本进程内执行：各脚本模块只导入一次，直接调用 main(argv)，共用同一个数据库连接池和本地缓存；
+互不依赖的测试并发执行（依赖关系见 DEPENDS），每个测试输出自己的墙钟耗时，最后输出总耗时。
+当前解释器缺少依赖时自动回退到 --subprocess（每个测试 `uv run scripts/xxx.py`，旧方式）。
 
---record  追加结果到 results.tsv
---verbose 显示详细输出
+--record      追加结果到 eval_results.tsv
+--verbose     测试结束后输出脚本工作线程写到 stderr 的内容（本进程模式）
+--workers N   并发测试数（默认 4；本地 SQLite 后端固定为 1）
+--timeout S   单个测试的超时秒数（默认 180）；超时记为 TIMEOUT，不再等它，其余测试照常继续
+--subprocess  每个测试起一个子进程
 """
 
 import argparse
+import io
 import json
 import os
+import queue
+import shlex
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
@@ -21,8 +41,47 @@ SCRIPTS = str(Path(__file__).parent)
 RESULTS_FILE = str(Path(__file__).parent.parent / "eval_results.tsv")
 
 
+class InProcessRunner:
+    """在本进程里执行各脚本的 main(argv)；stdout / stderr 按线程收集，测试可以并发"""
+
+    def __init__(self):
+        import importlib
+
+        from knowledge_daemon import ThreadStream, run_main
+
+        self._import = importlib.import_module
+        self._run_main = run_main
+        # 脚本内部工作线程（如 embedding 请求线程）的输出不属于任何测试，收进 stray，--verbose 时再输出
+        self.stray = io.StringIO()
+        self.stdout = ThreadStream(sys.stdout)
+        self.stderr = ThreadStream(self.stray)
+
+    def __enter__(self):
+        self._saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        return self
+
+    def __exit__(self, *exc):
+        sys.stdout, sys.stderr = self._saved
+
+    def run(self, script_name, args_str):
+        start = time.time()
+        module = self._import(Path(script_name).stem)
+        code, out, err = self._run_main(module, shlex.split(args_str), self.stdout, self.stderr)
+        return code == 0, out.strip(), err.strip(), time.time() - start
+
+
+# 本进程模式下的执行器；None 表示 --subprocess
+_runner = None
+
+
 def run_script(script_name, args_str, timeout=60):
-    """运行脚本，返回 (ok, stdout, stderr, duration)"""
+    """
+    运行脚本，返回 (ok, stdout, stderr, duration)。
+    本进程模式下直接调用 main(argv)，单次调用的 timeout 不生效，由 run_tests 按测试整体限时
+    """
+    if _runner is not None:
+        return _runner.run(script_name, args_str)
     cmd = f'{VENV} {SCRIPTS}/{script_name} {args_str}'
     start = time.time()
     try:
@@ -181,14 +240,14 @@ def test_export():
             "source_type",
             "summary",
             "ai_summary",
-            "content",
+            "content_preview",
             "metadata",
         ]
         missing = [field for field in required_fields if field not in top]
         if missing:
             return False, f"missing fields: {missing}"
 
-        if len(top.get("content", "")) > 303:
+        if len(top.get("content_preview", "")) > 303:
             return False, "content not truncated as expected"
 
         return True, f"fields ok top='{top.get('title', '')[:20]}' {dur:.1f}s"
@@ -795,93 +854,97 @@ def test_memory_self_tune_state():
         return False, f"invalid json: {out[:80]}"
 
 
+def wiki_memory_link_check():
+    """
+    在本进程里调用 wiki_compile.link_wiki_to_memory_cards，验证双向关联和幂等。
+    种子卡片与实现共用 knowledge_db 的连接池；结束后删除 test:wiki_link 标签的卡片。
+    """
+    import psycopg2.extras
+
+    import wiki_compile
+    from knowledge_db import connection
+
+    start = time.time()
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            # Seed: source_card — 模拟从 knowledge_item 编译来的 memory_card
+            cur.execute("""
+                INSERT INTO memory_cards (layer, title, summary, keywords, context_tags, confidence, source_item_ids)
+                VALUES (2, 'Wiki Link Test Source', 'Source card', ARRAY['Agent', 'RAG'], ARRAY['test:wiki_link'], 1.0, ARRAY['99999'])
+                RETURNING id
+            """)
+            source_id = cur.fetchone()["id"]
+
+            # Seed: match_card — 与概念关键词有交集的 memory_card
+            cur.execute("""
+                INSERT INTO memory_cards (layer, title, summary, keywords, context_tags, confidence)
+                VALUES (2, 'Wiki Link Test Match', 'Match card', ARRAY['RAG', '向量数据库'], ARRAY['test:wiki_link'], 1.0)
+                RETURNING id
+            """)
+            match_id = cur.fetchone()["id"]
+            conn.commit()
+
+            # 调用 wiki_compile.py 中的真实 link_wiki_to_memory_cards 函数
+            linked = wiki_compile.link_wiki_to_memory_cards(99999, ["RAG"], [])
+
+            # 验证双向关联
+            cur.execute("SELECT related_card_ids FROM memory_cards WHERE id = %s", [source_id])
+            source_rel = cur.fetchone()["related_card_ids"] or []
+            cur.execute("SELECT related_card_ids FROM memory_cards WHERE id = %s", [match_id])
+            match_rel = cur.fetchone()["related_card_ids"] or []
+            bidirectional = (match_id in source_rel and source_id in match_rel)
+
+            # 验证幂等：再次调用，关联不应重复
+            linked2 = wiki_compile.link_wiki_to_memory_cards(99999, ["RAG"], [])
+            cur.execute("SELECT related_card_ids FROM memory_cards WHERE id = %s", [source_id])
+            final = cur.fetchone()["related_card_ids"] or []
+            idempotent = sum(1 for x in final if x == match_id) == 1
+            conn.commit()
+
+            dur = time.time() - start
+            return (bidirectional and idempotent,
+                    f"linked={linked} linked2={linked2} bidirectional={bidirectional} idempotent={idempotent} {dur:.1f}s")
+        except Exception as e:
+            conn.rollback()
+            return False, f"error: {str(e)[:80]}"
+        finally:
+            try:
+                # 其他卡片里指向测试卡片的关联一并清掉
+                cur.execute("""
+                    UPDATE memory_cards
+                    SET related_card_ids = ARRAY(
+                        SELECT x FROM unnest(related_card_ids) x
+                        WHERE x NOT IN (SELECT id FROM memory_cards WHERE context_tags @> ARRAY['test:wiki_link'])
+                    )
+                    WHERE related_card_ids && ARRAY(SELECT id FROM memory_cards WHERE context_tags @> ARRAY['test:wiki_link'])
+                """)
+                cur.execute("DELETE FROM memory_cards WHERE context_tags @> ARRAY['test:wiki_link']")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+            cur.close()
+
+
 def test_wiki_memory_link():
     """测试24: wiki_compile → memory_cards 双向关联回归测试（调用真实实现）"""
+    if _runner is not None:
+        return wiki_memory_link_check()
+
+    # --subprocess：eval.py 所在解释器可能没有 psycopg2，借一个带依赖的临时脚本在 uv 环境里调用同一个检查函数
     import tempfile
 
-    inline_script = r'''
+    inline_script = f"""
 # /// script
 # requires-python = ">=3.10"
-# dependencies = ["psycopg2-binary", "python-dotenv", "requests"]
+# dependencies = ["numpy", "psycopg2-binary", "python-dotenv", "requests"]
 # ///
-import json, os, sys, time
-from pathlib import Path
-
-# 导入真实的 wiki_compile 模块（cwd = skills/knowledge-skill/）
-sys.path.insert(0, os.path.join(os.getcwd(), "scripts"))
-import wiki_compile
-
-import psycopg2, psycopg2.extras
-from dotenv import load_dotenv
-
-load_dotenv(Path(".env"))
-psycopg2.extras.register_uuid()
-
-DB = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
-conn = psycopg2.connect(**DB)
-cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-start = time.time()
-
-try:
-    # Seed: source_card — 模拟从 knowledge_item 编译来的 memory_card
-    cur.execute("""
-        INSERT INTO memory_cards (layer, title, summary, keywords, context_tags, confidence, source_item_ids)
-        VALUES (2, 'Wiki Link Test Source', 'Source card', ARRAY['Agent', 'RAG'], ARRAY['test:wiki_link'], 1.0, ARRAY['99999'])
-        RETURNING id
-    """)
-    source_id = cur.fetchone()["id"]
-
-    # Seed: match_card — 与概念关键词有交集的 memory_card
-    cur.execute("""
-        INSERT INTO memory_cards (layer, title, summary, keywords, context_tags, confidence)
-        VALUES (2, 'Wiki Link Test Match', 'Match card', ARRAY['RAG', '向量数据库'], ARRAY['test:wiki_link'], 1.0)
-        RETURNING id
-    """)
-    match_id = cur.fetchone()["id"]
-    conn.commit()
-
-    # 调用 wiki_compile.py 中的真实 link_wiki_to_memory_cards 函数
-    linked = wiki_compile.link_wiki_to_memory_cards(99999, ["RAG"], [])
-
-    # 验证双向关联
-    cur.execute("SELECT related_card_ids FROM memory_cards WHERE id = %s", [source_id])
-    source_rel = cur.fetchone()["related_card_ids"] or []
-    cur.execute("SELECT related_card_ids FROM memory_cards WHERE id = %s", [match_id])
-    match_rel = cur.fetchone()["related_card_ids"] or []
-    bidirectional = (match_id in source_rel and source_id in match_rel)
-
-    # 验证幂等：再次调用，关联不应重复
-    linked2 = wiki_compile.link_wiki_to_memory_cards(99999, ["RAG"], [])
-    cur.execute("SELECT related_card_ids FROM memory_cards WHERE id = %s", [source_id])
-    final = cur.fetchone()["related_card_ids"] or []
-    idempotent = sum(1 for x in final if x == match_id) == 1
-
-    dur = time.time() - start
-    print(json.dumps({
-        "ok": bidirectional and idempotent,
-        "detail": f"linked={linked} linked2={linked2} bidirectional={bidirectional} idempotent={idempotent} {dur:.1f}s"
-    }))
-except Exception as e:
-    print(json.dumps({"ok": False, "detail": f"error: {str(e)[:80]}"}))
-    sys.exit(0)
-finally:
-    try:
-        cur.execute("DELETE FROM memory_cards WHERE context_tags @> ARRAY['test:wiki_link']")
-        conn.commit()
-    except Exception:
-        pass
-    cur.close()
-    conn.close()
-'''
-
-    # 写入临时文件，通过 uv run 执行（eval.py 本身无 psycopg2 依赖）
+import json, sys
+sys.path.insert(0, {SCRIPTS!r})
+from eval import wiki_memory_link_check
+ok, detail = wiki_memory_link_check()
+print(json.dumps({{"ok": ok, "detail": detail}}))
+"""
     with tempfile.NamedTemporaryFile(suffix=".py", mode="w", delete=False) as f:
         f.write(inline_script)
         tmp_path = f.name
@@ -943,6 +1006,107 @@ TESTS = [
 ]
 
 
+# 测试 → 必须先跑完的测试（读前面写入的数据 / 需要先迁移）；其余测试之间互不依赖，可以并发
+DEPENDS = {
+    "test_8_candidate_review": {"test_2_ai_summary"},
+    "test_17_memory_organize": {"test_16_memory_migrate"},
+    "test_19_memory_save_working": {"test_16_memory_migrate"},
+    "test_21_memory_health": {"test_16_memory_migrate"},
+    "test_24_wiki_memory_link": {"test_16_memory_migrate"},
+}
+
+# 写 knowledge_items 的测试（各写各的 source_id，彼此可以并发）；读 knowledge_items 的测试等它们全部写完，
+# 结果不受线程调度影响。backfill 会补其他测试刚写入的条目，放在种子数据之后
+KNOWLEDGE_WRITERS = {
+    "test_1_save", "test_2_ai_summary", "test_11_backfill_ai_summary",
+    "test_12_seed_demo_items", "test_13_ingest_markdown", "test_15_seed_wiki_docs",
+}
+KNOWLEDGE_READERS = {
+    "test_3_vector_search", "test_4_keyword_search", "test_5_hybrid_search", "test_6_export",
+    "test_7_deck_brief", "test_8_candidate_review", "test_10_pool_report", "test_17_memory_organize",
+}
+DEPENDS["test_11_backfill_ai_summary"] = {"test_12_seed_demo_items", "test_13_ingest_markdown", "test_15_seed_wiki_docs"}
+for _name in KNOWLEDGE_READERS:
+    DEPENDS[_name] = DEPENDS.get(_name, set()) | KNOWLEDGE_WRITERS
+
+# memory_cards 上的测试串行：organize / save_working / compress / wiki_link / self_tune 都会改卡片
+# （compress 会合并、归档 wiki_link 插入的卡片），recall / health 的结果依赖当时的卡片集合。
+# 依赖写成全部前序测试，中间某个测试不在本次运行里时顺序也不变
+MEMORY_CHAIN = [
+    "test_16_memory_migrate",
+    "test_17_memory_organize",
+    "test_18_memory_recall",
+    "test_19_memory_save_working",
+    "test_20_memory_compress",
+    "test_24_wiki_memory_link",
+    "test_21_memory_health",
+    "test_22_memory_self_tune",
+    "test_23_memory_self_tune_state",
+]
+for _i, _name in enumerate(MEMORY_CHAIN):
+    DEPENDS[_name] = DEPENDS.get(_name, set()) | set(MEMORY_CHAIN[:_i])
+
+TEST_TIMEOUT = 180
+
+
+def _timed(test_fn):
+    start = time.time()
+    try:
+        ok, detail = test_fn()
+    except Exception as e:
+        ok, detail = False, f"error: {type(e).__name__}: {str(e)[:80]}"
+    return ok, detail, time.time() - start
+
+
+def run_tests(tests, workers, on_done, timeout=TEST_TIMEOUT):
+    """
+    按 DEPENDS 调度：依赖都跑完的测试各起一个线程，同时最多 workers 个；不在本次运行里的依赖视为已满足。
+    超过 timeout 秒的测试记为 TIMEOUT（线程没法强行终止，守护线程留在后台，不挡住进程退出）；
+    它可能还在改数据，依赖它的测试（直接或间接）不再调度，记为 SKIP（ok 为 None）
+    """
+    names = {name for name, _ in tests}
+    pending = list(tests)
+    finished = set()
+    blocked = {}  # 超时的测试，以及因此跳过的测试 → 源头那个超时的测试
+    running = {}  # 测试名 → 截止时间
+    results = queue.Queue()
+
+    def worker(name, test_fn):
+        results.put((name, *_timed(test_fn)))
+
+    def skip_blocked():
+        while skipped := [t for t in pending if DEPENDS.get(t[0], set()) & blocked.keys()]:
+            for name, test_fn in skipped:
+                pending.remove((name, test_fn))
+                blocked[name] = blocked[min(DEPENDS[name] & blocked.keys())]
+                on_done(name, None, f"SKIP (dependency {blocked[name]} timed out)", 0.0)
+
+    while pending or running:
+        ready = [t for t in pending if (DEPENDS.get(t[0], set()) & names) <= finished]
+        for name, test_fn in ready[:max(1, workers) - len(running)]:
+            pending.remove((name, test_fn))
+            running[name] = time.time() + timeout
+            threading.Thread(target=worker, args=(name, test_fn), name=name, daemon=True).start()
+        if not running:
+            raise RuntimeError(f"DEPENDS 有环: {[name for name, _ in pending]}")
+
+        try:
+            name, ok, detail, seconds = results.get(timeout=max(0.0, min(running.values()) - time.time()))
+        except queue.Empty:
+            now = time.time()
+            for name, deadline in list(running.items()):
+                if deadline <= now:
+                    del running[name]
+                    blocked[name] = name
+                    on_done(name, False, "TIMEOUT", timeout)
+            skip_blocked()
+            continue
+        if name in running:  # 已按超时记过的测试后来才跑完，忽略
+            del running[name]
+            finished.add(name)
+            on_done(name, ok, detail, seconds)
+
+
 # HEADER 由 TESTS 自动生成，保证三者始终一致
 # TSV 列数始终固定（包含全部测试），跳过的测试标记 SKIP
 HEADER = "\t".join(["timestamp", "passed", "total", "rate"] + [name for name, _ in TESTS] + ["notes"])
@@ -954,16 +1118,34 @@ def main():
     parser.add_argument("--record", "-r", action="store_true", help="Append to results.tsv")
     parser.add_argument("--extended", "-e", action="store_true",
                         help="Include heavy tests (self_tune, etc.). Default: skip heavy tests for fast CI.")
+    parser.add_argument("--workers", "-j", type=int, default=4, help="Concurrent tests (default 4)")
+    parser.add_argument("--timeout", type=float, default=TEST_TIMEOUT,
+                        help=f"Per-test timeout in seconds (default {TEST_TIMEOUT})")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run every script in a fresh `uv run` process instead of in-process")
     args = parser.parse_args()
 
+    global _runner
+    workers = args.workers
+    if not args.subprocess:
+        try:
+            _runner = InProcessRunner()
+            from knowledge_db import local_backend
+            if local_backend():
+                workers = 1  # 本地 SQLite 后端共用一个连接，测试串行
+        except ImportError as e:
+            print(f"⚠️  in-process runner unavailable ({e}), falling back to --subprocess")
+
     ts = datetime.now().strftime("%Y-%m-%d %H:%M")
     mode = "extended" if args.extended else "fast"
+    runner = "in-process" if _runner is not None else "subprocess"
     print(f"{'='*55}")
-    print(f"Knowledge Skill Eval — {ts} [{mode}]")
+    print(f"Knowledge Skill Eval — {ts} [{mode}, {runner}, workers={workers}]")
     print(f"{'='*55}")
 
     results = {}
     passed = 0
+    to_run = []
 
     for name, test_fn in TESTS:
         # 默认跳过重量级测试，--extended 才运行
@@ -971,20 +1153,38 @@ def main():
             results[name] = (None, "SKIP")
             print(f"  ⏭️  {name}: SKIP (use --extended to run)")
             continue
+        to_run.append((name, test_fn))
 
-        ok, detail = test_fn()
+    def on_done(name, ok, detail, seconds):
+        nonlocal passed
         results[name] = (ok, detail)
+        if ok is None:
+            print(f"  ⏭️  {name}: {detail}", flush=True)
+            return
         if ok:
             passed += 1
         status = "✅" if ok else "❌"
-        print(f"  {status} {name}: {detail}")
+        print(f"  {status} {name}: {detail} [{seconds:.2f}s]", flush=True)
+
+    start = time.time()
+    if _runner is not None:
+        with _runner:
+            run_tests(to_run, workers, on_done, args.timeout)
+    else:
+        run_tests(to_run, workers, on_done, args.timeout)
+    elapsed = time.time() - start
 
     total = len(TESTS)
     rate = f"{passed}/{total} ({passed/total*100:.0f}%)"
     print(f"\n{'='*55}")
     print(f"结果: {rate}")
+    print(f"总耗时: {elapsed:.1f}s")
     print(f"{'='*55}")
 
+    if args.verbose and _runner is not None and _runner.stray.getvalue():
+        print("\n[worker stderr]")
+        print(_runner.stray.getvalue().rstrip())
+
     if args.record:
         # 由 TESTS 驱动 row 生成，保证与 HEADER 一一对应
         row = [ts, str(passed), str(total), rate]
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests",
@@ -15,10 +16,13 @@ import argparse
 import json
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
 
-from knowledge_save import DB_CONFIG, generate_ai_summary
+from knowledge_db import Vector, connection
+from knowledge_embedding import get_embeddings
+from knowledge_llm import map_ordered
+from knowledge_save import generate_ai_summary
+from memory_recall_cache import bump_generation
 
 
 def fetch_missing_items(
@@ -26,57 +30,58 @@ def fetch_missing_items(
     source_type: str | None = None,
     source_id: str | None = None,
 ) -> list[dict[str, Any]]:
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        clauses = [
-            "status = 'active'",
-            "(ai_summary IS NULL OR btrim(ai_summary) = '')",
-            "content IS NOT NULL",
-            "btrim(content) <> ''",
-        ]
-        params: list[Any] = []
-        if source_type:
-            clauses.append("source_type = %s")
-            params.append(source_type)
-        if source_id:
-            clauses.append("source_id = %s")
-            params.append(source_id)
-
-        params.append(limit)
-        cur.execute(
-            f"""
-            SELECT id, source_type, source_id, title, content, created_at
-            FROM knowledge_items
-            WHERE {' AND '.join(clauses)}
-            ORDER BY created_at DESC
-            LIMIT %s
-            """,
-            params,
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def update_ai_summary(item_id: Any, ai_summary: str) -> None:
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            UPDATE knowledge_items
-            SET ai_summary = %s,
-                updated_at = NOW()
-            WHERE id = %s
-            """,
-            (ai_summary, item_id),
-        )
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            clauses = [
+                "status = 'active'",
+                "(ai_summary IS NULL OR btrim(ai_summary) = '')",
+                "content IS NOT NULL",
+                "btrim(content) <> ''",
+            ]
+            params: list[Any] = []
+            if source_type:
+                clauses.append("source_type = %s")
+                params.append(source_type)
+            if source_id:
+                clauses.append("source_id = %s")
+                params.append(source_id)
+
+            params.append(limit)
+            cur.execute(
+                f"""
+                SELECT id, source_type, source_id, title, content, created_at
+                FROM knowledge_items
+                WHERE {' AND '.join(clauses)}
+                ORDER BY created_at DESC
+                LIMIT %s
+                """,
+                params,
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def update_ai_summary(item_id: Any, ai_summary: str, embedding: list[float] | None = None) -> None:
+    """写回 AI 摘要；embedding 与 knowledge_save 一致基于 title + ai_summary，生成失败时保留原值"""
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE knowledge_items
+                SET ai_summary = %s,
+                    embedding = COALESCE(%s::vector, embedding),
+                    updated_at = NOW()
+                WHERE id = %s
+                """,
+                (ai_summary, Vector(embedding) if embedding else None, item_id),
+            )
+            bump_generation(conn)
+            conn.commit()
+        finally:
+            cur.close()
 
 
 def backfill_ai_summary(
@@ -88,16 +93,17 @@ def backfill_ai_summary(
     items = fetch_missing_items(limit=limit, source_type=source_type, source_id=source_id)
     processed: list[dict[str, Any]] = []
 
-    for item in items:
+    # AI 摘要有界并发生成，结果按条目顺序返回
+    summaries = map_ordered(
+        lambda item: generate_ai_summary(str(item.get("title") or ""), str(item.get("content") or "")).strip(),
+        items,
+    )
+
+    for item, ai_summary in zip(items, summaries):
         title = str(item.get("title") or "")
-        content = str(item.get("content") or "")
-        ai_summary = generate_ai_summary(title, content).strip()
         if not ai_summary:
             continue
 
-        if not dry_run:
-            update_ai_summary(item["id"], ai_summary)
-
         processed.append(
             {
                 "id": str(item["id"]),
@@ -108,6 +114,13 @@ def backfill_ai_summary(
             }
         )
 
+    if not dry_run and processed:
+        # 摘要变了，embedding 一并按批量请求重算
+        embeddings = get_embeddings([f"{row['title']}\n{row['ai_summary']}" for row in processed])
+        for row, embedding in zip(processed, embeddings):
+            update_ai_summary(row["id"], row["ai_summary"], embedding)
+            row["has_embedding"] = embedding is not None
+
     return {
         "dry_run": dry_run,
         "requested_limit": limit,
@@ -117,13 +130,13 @@ def backfill_ai_summary(
     }
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="批量补齐缺失的 AI 摘要")
     parser.add_argument("--limit", type=int, default=10, help="最多处理多少条")
     parser.add_argument("--source-type", help="只处理某个来源类型")
     parser.add_argument("--source-id", help="只处理某个 source_id")
     parser.add_argument("--dry-run", action="store_true", help="只预览，不写入数据库")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = backfill_ai_summary(
         limit=args.limit,
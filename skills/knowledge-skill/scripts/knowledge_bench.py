@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "psycopg2-binary",
+#     "python-dotenv",
+#     "requests",
+# ]
+# ///
+"""
+knowledge-skill 性能基准
+对比改造前后的端到端延迟，输出 JSON / Markdown 报告。
+
+子命令:
+  recall   分层召回端到端延迟：
+           legacy  每层查询各自新建连接（改造前的行为）
+           single  整次召回共用一个新建连接（不走连接池）
+           pooled  整次召回共用连接池里的连接（默认行为）
+           fused   单条 CTE 语句完成全部分层召回 + 访问计数（--fused）
+  pairs    相似卡片对查找（merge_similar_l2 / self_tune 用）：合成聚簇 embedding，
+           NumPy 分块矩阵乘法在各规模下的耗时；--sql-max 以内的规模同时跑 pgvector
+           自连接（临时表，不碰 memory_cards）并校验两边结果一致
+  backends 同一套工作负载（批量入库 → 关键词 / 向量 / 混合搜索 → 分层召回 → 相似合并预览）
+           分别跑在 postgres 和 sqlite（嵌入式本地存储）后端上；embedding 为合成向量，不请求网络
+
+用法:
+  uv run scripts/knowledge_bench.py recall --query "Agent 基础设施" --runs 20
+  uv run scripts/knowledge_bench.py recall --query "RAG" --mode keyword --output markdown
+  uv run scripts/knowledge_bench.py pairs --sizes 1000 10000 50000 --sql-max 1000
+  uv run scripts/knowledge_bench.py backends --items 2000 --cards 500 --backends sqlite
+
+注意: recall 会更新命中卡片的 access_count，请在测试库上跑基准。
+backends 在 postgres 上写入 source_type='bench' 的条目和带 'bench' 标签的卡片，结束后删除；
+sqlite 后端写在临时目录里。两边的搜索 / 召回都作用于整个库，想要可比的数字请用空的测试库。
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import psycopg2.extras
+
+import knowledge_db
+import knowledge_hybrid
+import knowledge_local_store
+import knowledge_search
+import memory_compress
+import memory_recall
+from knowledge_bulk import bulk_insert_memory_cards, bulk_upsert_knowledge
+from knowledge_vectors import normalize_rows, similar_pairs
+
+
+def summarize_samples(samples_ms: list[float]) -> dict[str, float]:
+    """把一组耗时（毫秒）汇总成 mean / p50 / p95 / min / max"""
+    ordered = sorted(samples_ms)
+    p95_index = min(len(ordered) - 1, max(0, round(len(ordered) * 0.95) - 1))
+    return {
+        "runs": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[p95_index], 2),
+        "min_ms": round(ordered[0], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def time_runs(fn: Callable[[], Any], runs: int, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def legacy_recall(query: str, mode: str, limit: int, context_tags: list[str] | None) -> int:
+    """改造前的召回：每个层级函数各自建连，访问计数再单独建连更新"""
+    hit_ids: list[str] = []
+    l1 = memory_recall.recall_l1_keyword(query, context_tags=context_tags, limit=min(limit, 5))
+    hit_ids.extend(str(r["id"]) for r in l1)
+    total = len(l1)
+    query_embedding = None
+
+    remaining = limit - total
+    if remaining > 0:
+        if mode in ("vector", "hybrid"):
+            query_embedding = memory_recall.get_embedding(query)
+            if query_embedding:
+                l2 = memory_recall.recall_l2_vector(query_embedding, limit=remaining)
+                hit_ids.extend(str(r["id"]) for r in l2)
+                total += len(l2)
+        if mode in ("keyword", "hybrid"):
+            l2 = memory_recall.recall_l2_keyword(query, limit=max(remaining, 5))
+            hit_ids.extend(str(r["id"]) for r in l2)
+            total += len(l2)
+
+    remaining = limit - total
+    if remaining > 0:
+        if mode in ("vector", "hybrid") and query_embedding:
+            total += len(memory_recall.recall_l3(query_embedding, limit=remaining))
+        if mode in ("keyword", "hybrid"):
+            total += len(memory_recall.recall_l3_keyword(query, limit=max(remaining, 5)))
+
+    memory_recall.update_access_stats(hit_ids)
+    return total
+
+
+def bench_recall(
+    query: str,
+    mode: str,
+    limit: int,
+    context_tags: list[str] | None,
+    runs: int,
+    include_embedding: bool,
+) -> dict[str, Any]:
+    if not include_embedding:
+        # 默认只测数据库侧：query embedding 预先算好，三种变体复用同一个向量
+        cached = memory_recall.get_embedding(query)
+        memory_recall.get_embedding = lambda _text: cached
+
+    variants: dict[str, tuple[bool, Callable[[], Any]]] = {
+        "legacy": (False, lambda: legacy_recall(query, mode, limit, context_tags)),
+        "single": (False, lambda: memory_recall.recall(query, mode=mode, limit=limit, context_tags=context_tags,
+                                                       use_cache=False)),
+        "pooled": (True, lambda: memory_recall.recall(query, mode=mode, limit=limit, context_tags=context_tags,
+                                                      use_cache=False)),
+        "fused": (True, lambda: memory_recall.recall(query, mode=mode, limit=limit, context_tags=context_tags,
+                                                     fused=True, use_cache=False)),
+        # 结果缓存命中（warmup 那次写入缓存，之后每次只读代数 + 更新访问计数）
+        "cached": (True, lambda: memory_recall.recall(query, mode=mode, limit=limit, context_tags=context_tags)),
+    }
+
+    results: dict[str, Any] = {}
+    for name, (use_pool, fn) in variants.items():
+        knowledge_db.POOL_ENABLED = use_pool
+        before = knowledge_db.stats()
+        samples = time_runs(fn, runs)
+        after = knowledge_db.stats()
+        summary = summarize_samples(samples)
+        # warmup 那一次也计入了连接数，按 runs + 1 平均
+        summary["connects_per_recall"] = round((after["connects"] - before["connects"]) / (runs + 1), 2)
+        results[name] = summary
+    knowledge_db.POOL_ENABLED = True
+
+    base = results["legacy"]["p50_ms"]
+    return {
+        "benchmark": "recall",
+        "query": query,
+        "mode": mode,
+        "limit": limit,
+        "include_embedding": include_embedding,
+        "variants": results,
+        "speedup_p50": {
+            name: round(base / stats["p50_ms"], 2) if stats["p50_ms"] else None
+            for name, stats in results.items()
+        },
+    }
+
+
+def synthetic_embeddings(n: int, dim: int, seed: int = 42) -> np.ndarray:
+    """合成聚簇 embedding：约 n/4 个簇，簇内噪声大小不一，相似度横跨常用阈值"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 4), dim)).astype(np.float32)
+    assignment = rng.integers(0, len(centers), size=n)
+    noise_scale = rng.uniform(0.05, 0.6, size=(n, 1)).astype(np.float32)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * noise_scale
+    return (centers[assignment] + noise).astype(np.float32)
+
+
+def sql_similar_pairs(vectors: np.ndarray, threshold: float) -> tuple[set[tuple[int, int]], float]:
+    """在临时表上跑改造前的 pgvector 自连接，返回 (行号对集合, 耗时 ms)"""
+    with knowledge_db.connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"CREATE TEMP TABLE bench_cards (id INT PRIMARY KEY, embedding vector({vectors.shape[1]})) ON COMMIT DROP")
+            psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO bench_cards (id, embedding) VALUES %s",
+                [(idx, knowledge_db.Vector(vec)) for idx, vec in enumerate(vectors)],
+                page_size=500,
+            )
+            start = time.perf_counter()
+            cur.execute(
+                """
+                SELECT a.id, b.id
+                FROM bench_cards a
+                JOIN bench_cards b ON a.id < b.id
+                WHERE 1 - (a.embedding <=> b.embedding) >= %s
+                """,
+                [threshold],
+            )
+            pairs = {(row[0], row[1]) for row in cur.fetchall()}
+            elapsed = (time.perf_counter() - start) * 1000
+            conn.rollback()
+            return pairs, elapsed
+        finally:
+            cur.close()
+
+
+def bench_pairs(sizes: list[int], dim: int, threshold: float, sql_max: int, runs: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for n in sizes:
+        vectors = synthetic_embeddings(n, dim)
+        matrix = np.ascontiguousarray(normalize_rows(vectors), dtype=np.float32)
+        pairs: list[tuple[int, int, float]] = []
+
+        def run_numpy() -> None:
+            nonlocal pairs
+            pairs = similar_pairs(matrix, threshold)
+
+        summary = summarize_samples(time_runs(run_numpy, runs, warmup=0))
+        summary["pairs"] = len(pairs)
+        entry: dict[str, Any] = {"numpy": summary}
+
+        if n <= sql_max:
+            sql_pairs, sql_ms = sql_similar_pairs(vectors, threshold)
+            numpy_pairs = {(i, j) for i, j, _ in pairs}
+            entry["sql_self_join"] = {"runs": 1, "mean_ms": round(sql_ms, 2), "p50_ms": round(sql_ms, 2),
+                                      "p95_ms": round(sql_ms, 2), "pairs": len(sql_pairs)}
+            entry["same_pairs"] = sql_pairs == numpy_pairs
+        results[str(n)] = entry
+
+    return {
+        "benchmark": "pairs",
+        "dim": dim,
+        "threshold": threshold,
+        "sizes": results,
+    }
+
+
+BENCH_QUERIES = ["Agent 基础设施", "RAG 检索", "知识库", "向量数据库", "记忆 压缩"]
+
+
+def _backend_workload(n_items: int, n_cards: int, queries: list[str], runs: int, dim: int) -> dict[str, Any]:
+    """在当前 knowledge_db.BACKEND 上跑一遍工作负载，返回各阶段耗时"""
+    vectors = synthetic_embeddings(n_items + n_cards + len(queries), dim).tolist()
+    query_vectors = dict(zip(queries, vectors[n_items + n_cards:]))
+    topics = ["Agent 基础设施", "RAG 检索增强", "知识库建设", "向量数据库选型", "记忆压缩策略"]
+    items = [
+        {
+            "source_type": "bench",
+            "source_id": f"bench-{i}",
+            "title": f"{topics[i % len(topics)]} 第 {i} 篇",
+            "content": f"{topics[i % len(topics)]}相关的正文内容。" * 20,
+            "summary": topics[i % len(topics)],
+            "ai_summary": f"关于{topics[i % len(topics)]}的一句话摘要",
+            "embedding": vectors[i],
+        }
+        for i in range(n_items)
+    ]
+    cards = [
+        {
+            "title": f"{topics[i % len(topics)]} 卡片 {i}",
+            "summary": f"{topics[i % len(topics)]}的结论",
+            "keywords": [topics[i % len(topics)]],
+            "context_tags": ["bench"],
+            "source_item_ids": [],
+            "embedding": vectors[n_items + i],
+        }
+        for i in range(n_cards)
+    ]
+
+    # 查询 embedding 用合成向量代替，只测存储后端
+    embed = lambda text: query_vectors.get(text, vectors[0])
+    original = (knowledge_search.get_embedding, knowledge_hybrid.get_embedding, memory_recall.get_embedding)
+    knowledge_search.get_embedding = embed
+    knowledge_hybrid.get_embedding = embed
+    memory_recall.get_embedding = embed
+    try:
+        stages: dict[str, Any] = {}
+        start = time.perf_counter()
+        bulk_upsert_knowledge(items)
+        bulk_insert_memory_cards(cards)
+        elapsed = time.perf_counter() - start
+        stages["ingest"] = {"rows": n_items + n_cards, "seconds": round(elapsed, 3),
+                            "rows_per_sec": round((n_items + n_cards) / elapsed) if elapsed else None}
+
+        workloads: dict[str, Callable[[], Any]] = {
+            "search_keyword": lambda: [knowledge_search.search_keyword(q, limit=10) for q in queries],
+            "search_vector": lambda: [knowledge_search.search_vector(q, limit=10) for q in queries],
+            "search_hybrid": lambda: [knowledge_search.search_hybrid(q, limit=10) for q in queries],
+            "recall_hybrid": lambda: [memory_recall.recall(q, mode="hybrid", limit=10, use_cache=False) for q in queries],
+            "merge_dry_run": lambda: memory_compress.merge_similar_l2(dry_run=True),
+        }
+        for name, fn in workloads.items():
+            stages[name] = summarize_samples(time_runs(fn, runs))
+        return stages
+    finally:
+        knowledge_search.get_embedding, knowledge_hybrid.get_embedding, memory_recall.get_embedding = original
+
+
+def _cleanup_postgres_bench() -> None:
+    with knowledge_db.connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM knowledge_items WHERE source_type = 'bench'")
+            cur.execute("DELETE FROM memory_cards WHERE 'bench' = ANY(context_tags)")
+        finally:
+            cur.close()
+
+
+def bench_backends(n_items: int, n_cards: int, runs: int, backends: list[str], dim: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    original_backend = knowledge_db.BACKEND
+    original_dir = knowledge_local_store.LOCAL_DIR
+    for backend in backends:
+        knowledge_db.BACKEND = backend
+        tmp_dir = None
+        if backend == "sqlite":
+            tmp_dir = tempfile.mkdtemp(prefix="knowledge-bench-")
+            knowledge_local_store.LOCAL_DIR = Path(tmp_dir)
+        try:
+            results[backend] = _backend_workload(n_items, n_cards, BENCH_QUERIES, runs, dim)
+        finally:
+            if backend == "postgres":
+                _cleanup_postgres_bench()
+            if tmp_dir:
+                knowledge_local_store.close_store(tmp_dir)
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    knowledge_db.BACKEND = original_backend
+    knowledge_local_store.LOCAL_DIR = original_dir
+
+    return {
+        "benchmark": "backends",
+        "items": n_items,
+        "cards": n_cards,
+        "queries_per_run": len(BENCH_QUERIES),
+        "dim": dim,
+        "backends": results,
+    }
+
+
+def render_markdown(report: dict[str, Any]) -> str:
+    lines = [f"# Benchmark: {report['benchmark']}", ""]
+    for key in ("query", "mode", "limit", "include_embedding", "items", "cards", "queries_per_run", "dim", "threshold"):
+        if key in report:
+            lines.append(f"- {key}: {report[key]}")
+    lines.append("")
+    if report["benchmark"] == "backends":
+        lines.append("| backend | stage | p50 ms | p95 ms | rows/s |")
+        lines.append("|---|---|---|---|---|")
+        for backend, stages in report["backends"].items():
+            for stage, stats in stages.items():
+                if stage == "ingest":
+                    lines.append(f"| {backend} | ingest | {round(stats['seconds'] * 1000, 2)} | - | {stats['rows_per_sec']} |")
+                else:
+                    lines.append(f"| {backend} | {stage} | {stats['p50_ms']} | {stats['p95_ms']} | - |")
+        return "\n".join(lines) + "\n"
+    if report["benchmark"] == "pairs":
+        lines.append("| cards | engine | runs | p50 ms | p95 ms | pairs | same pairs |")
+        lines.append("|---|---|---|---|---|---|---|")
+        for n, entry in report["sizes"].items():
+            for engine in ("numpy", "sql_self_join"):
+                if engine in entry:
+                    stats = entry[engine]
+                    lines.append(
+                        f"| {n} | {engine} | {stats['runs']} | {stats['p50_ms']} | {stats['p95_ms']} "
+                        f"| {stats['pairs']} | {entry.get('same_pairs', '-')} |"
+                    )
+        return "\n".join(lines) + "\n"
+    lines.append("| variant | runs | mean ms | p50 ms | p95 ms | connects/op | speedup(p50) |")
+    lines.append("|---|---|---|---|---|---|---|")
+    for name, stats in report["variants"].items():
+        lines.append(
+            f"| {name} | {stats['runs']} | {stats['mean_ms']} | {stats['p50_ms']} | {stats['p95_ms']} "
+            f"| {stats.get('connects_per_recall', '-')} | {report['speedup_p50'].get(name, '-')} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="knowledge-skill 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_recall = sub.add_parser("recall", help="分层召回端到端延迟（legacy / single / pooled / fused）")
+    p_recall.add_argument("--query", required=True, help="召回查询")
+    p_recall.add_argument("--mode", choices=["keyword", "vector", "hybrid"], default="hybrid")
+    p_recall.add_argument("--limit", type=int, default=10)
+    p_recall.add_argument("--context-tags", nargs="*")
+    p_recall.add_argument("--runs", type=int, default=20, help="每个变体的计时次数")
+    p_recall.add_argument("--include-embedding", action="store_true",
+                          help="把 query embedding 的网络请求也计入每次召回")
+    p_recall.add_argument("--output", choices=["json", "markdown"], default="json")
+
+    p_pairs = sub.add_parser("pairs", help="相似卡片对查找（NumPy 分块矩阵乘法 vs pgvector 自连接）")
+    p_pairs.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="合成卡片数量")
+    p_pairs.add_argument("--dim", type=int, default=1024)
+    p_pairs.add_argument("--threshold", type=float, default=0.95)
+    p_pairs.add_argument("--sql-max", type=int, default=0,
+                         help="不超过这个规模时同时跑 SQL 自连接并校验结果（需要数据库，默认不跑）")
+    p_pairs.add_argument("--runs", type=int, default=3, help="每个规模的计时次数")
+    p_pairs.add_argument("--output", choices=["json", "markdown"], default="json")
+
+    p_backends = sub.add_parser("backends", help="同一工作负载在 postgres / sqlite 后端上的耗时")
+    p_backends.add_argument("--items", type=int, default=2000, help="合成 knowledge_items 条数")
+    p_backends.add_argument("--cards", type=int, default=500, help="合成 L2 卡片张数")
+    p_backends.add_argument("--dim", type=int, default=1024)
+    p_backends.add_argument("--runs", type=int, default=5, help="每个阶段的计时次数")
+    p_backends.add_argument("--backends", nargs="+", choices=["postgres", "sqlite"], default=["postgres", "sqlite"])
+    p_backends.add_argument("--output", choices=["json", "markdown"], default="json")
+
+    args = parser.parse_args()
+
+    if args.command == "recall":
+        report = bench_recall(
+            query=args.query,
+            mode=args.mode,
+            limit=args.limit,
+            context_tags=args.context_tags,
+            runs=args.runs,
+            include_embedding=args.include_embedding,
+        )
+    elif args.command == "pairs":
+        report = bench_pairs(
+            sizes=args.sizes,
+            dim=args.dim,
+            threshold=args.threshold,
+            sql_max=args.sql_max,
+            runs=args.runs,
+        )
+    elif args.command == "backends":
+        report = bench_backends(
+            n_items=args.items,
+            n_cards=args.cards,
+            runs=args.runs,
+            backends=args.backends,
+            dim=args.dim,
+        )
+    else:
+        print(f"Unknown command: {args.command}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output == "markdown":
+        print(render_markdown(report))
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
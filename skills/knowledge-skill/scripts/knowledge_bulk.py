@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "psycopg2-binary",
+#     "python-dotenv",
+# ]
+# ///
+"""
+批量写入层
+把 knowledge_items / memory_cards 的写入攒成多行 INSERT（execute_values），
+embedding 用二进制 COPY 送进临时表再 JOIN，每批一个事务，代替逐行 INSERT + 逐行提交。
+
+- bulk_upsert_knowledge: 按 (source_type, source_id) ON CONFLICT DO UPDATE，批内重复 key 以最后一条为准
+- bulk_insert_memory_cards: 卡片 id 在客户端预先生成（uuid4），结果可按输入顺序对回
+- existing_knowledge_keys: 一次查询返回一批 (source_type, source_id) 中已入库的那些，供入库前去重
+
+某一批整体失败时回滚，再逐行重试这一批，坏数据只影响它自己。
+结果列表与输入一一对应，单条失败为 {"success": False, "error": ...}。
+"""
+
+import contextlib
+import io
+import struct
+import sys
+import uuid
+from typing import Any, Callable
+
+import numpy as np
+import psycopg2.extras
+
+from knowledge_db import connection, local_backend
+from knowledge_fts import fts_ready, search_vector
+from knowledge_local_store import get_store
+from memory_recall_cache import bump_generation
+
+BULK_PAGE_SIZE = 500
+
+# embedding 不走 SQL 文本：每批先用二进制 COPY 写进会话级临时表，再在 INSERT ... SELECT 里按序号 JOIN 回来。
+# 省掉 Python 端 str(list) 和服务端解析 1024 个浮点数文本，这两步是逐行写入里最贵的部分。
+STAGING_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS _bulk_vectors (ord INT, embedding vector)
+    ON COMMIT DELETE ROWS
+"""
+CLEAR_STAGING_SQL = "DELETE FROM _bulk_vectors"
+COPY_VECTORS_SQL = "COPY _bulk_vectors (ord, embedding) FROM STDIN WITH (FORMAT binary)"
+
+# 全文检索迁移后（knowledge_fts），search_tsv 在这里分好词一起写入，省掉触发器在数据库里逐行分词
+UPSERT_KNOWLEDGE_VALUES_SQL = """
+    INSERT INTO knowledge_items
+    (source_type, source_id, source_url, title, content, summary, ai_summary, embedding, metadata{fts_column})
+    SELECT v.source_type, v.source_id, v.source_url, v.title, v.content, v.summary, v.ai_summary,
+           b.embedding, v.metadata{fts_value}
+    FROM (VALUES %s) AS v(ord, source_type, source_id, source_url, title, content, summary, ai_summary, metadata{fts_column})
+    LEFT JOIN _bulk_vectors b ON b.ord = v.ord
+    ON CONFLICT (source_type, source_id) DO UPDATE
+    SET title = EXCLUDED.title,
+        content = EXCLUDED.content,
+        summary = EXCLUDED.summary,
+        ai_summary = EXCLUDED.ai_summary,
+        embedding = EXCLUDED.embedding,
+        metadata = EXCLUDED.metadata,{fts_update}
+        updated_at = NOW()
+    RETURNING source_type, source_id, id, created_at
+"""
+KNOWLEDGE_VALUES_TEMPLATE = "(%s, %s, %s, %s::text, %s, %s, %s::text, %s::text, %s::jsonb{fts_template})"
+
+INSERT_CARDS_VALUES_SQL = """
+    INSERT INTO memory_cards
+    (id, layer, title, summary, keywords, context_tags, source_item_ids, embedding, confidence{fts_column})
+    SELECT v.id, v.layer, v.title, v.summary, v.keywords, v.context_tags, v.source_item_ids,
+           b.embedding, v.confidence{fts_value}
+    FROM (VALUES %s) AS v(ord, id, layer, title, summary, keywords, context_tags, source_item_ids, confidence{fts_column})
+    LEFT JOIN _bulk_vectors b ON b.ord = v.ord
+    RETURNING id, created_at
+"""
+CARD_VALUES_TEMPLATE = "(%s, %s::uuid, %s::smallint, %s, %s, %s::text[], %s::text[], %s::text[], %s::real{fts_template})"
+
+_FTS_FRAGMENTS = {
+    True: {"fts_column": ", search_tsv", "fts_value": ", v.search_tsv::tsvector",
+           "fts_update": "\n        search_tsv = EXCLUDED.search_tsv,", "fts_template": ", %s"},
+    False: {"fts_column": "", "fts_value": "", "fts_update": "", "fts_template": ""},
+}
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+
+
+def encode_vectors_copy(vectors: list[tuple[int, list[float]]]) -> bytes:
+    """
+    编码成 COPY BINARY 流：每行 (ord int4, embedding vector)。
+    pgvector 的二进制格式：int16 维度 + int16 保留位 + 维度个大端 float4。
+    """
+    parts = [_COPY_HEADER]
+    for ord_, vector in vectors:
+        values = np.asarray(vector, dtype=">f4")
+        parts.append(struct.pack(">hii", 2, 4, ord_))
+        parts.append(struct.pack(">ihh", 4 + values.nbytes, len(values), 0))
+        parts.append(values.tobytes())
+    parts.append(_COPY_TRAILER)
+    return b"".join(parts)
+
+
+def _statements(conn, table: str, sql: str, template: str) -> tuple[str, str, bool]:
+    """按表是否已做全文检索迁移，补上（或去掉）search_tsv 列"""
+    fts = fts_ready(conn, table)
+    fragments = _FTS_FRAGMENTS[fts]
+    return sql.format(**fragments), template.format(**fragments), fts
+
+
+def _knowledge_values(ord_: int, row: dict[str, Any], fts: bool = False) -> tuple:
+    values = (
+        ord_,
+        row["source_type"],
+        row["source_id"],
+        row.get("source_url"),
+        row["title"],
+        row["content"],
+        row.get("summary"),
+        row.get("ai_summary"),
+        psycopg2.extras.Json(row.get("metadata") or {}),
+    )
+    return values + (search_vector("knowledge_items", row),) if fts else values
+
+
+def _card_values(ord_: int, card: dict[str, Any], fts: bool = False) -> tuple:
+    values = (
+        ord_,
+        card["id"],
+        card.get("layer", 2),
+        card["title"],
+        card["summary"],
+        card.get("keywords") or [],
+        card.get("context_tags") or [],
+        card.get("source_item_ids") or [],
+        card.get("confidence", 0.8),
+    )
+    return values + (search_vector("memory_cards", card),) if fts else values
+
+
+def _write_batch(cur, sql: str, template: str, batch: list[tuple], embeddings: list[list[float] | None]) -> list[tuple]:
+    """在当前事务里写一批：COPY embedding 到临时表 → 多行 INSERT ... SELECT"""
+    cur.execute(STAGING_TABLE_SQL)
+    # 调用方的事务里前面几批（或前一次调用）留下的行要清掉，ord 只在一次调用内唯一
+    cur.execute(CLEAR_STAGING_SQL)
+    vectors = [(value[0], embedding) for value, embedding in zip(batch, embeddings) if embedding]
+    if vectors:
+        cur.copy_expert(COPY_VECTORS_SQL, io.BytesIO(encode_vectors_copy(vectors)))
+    rows = psycopg2.extras.execute_values(cur, sql, batch, template=template, page_size=len(batch), fetch=True)
+    # 召回缓存随这一批一起失效（同一事务）
+    bump_generation(cur.connection)
+    return rows
+
+
+@contextlib.contextmanager
+def _write_unit(conn, cur, owned: bool):
+    """
+    一批（或重试的一行）写入的提交单位：自己借的连接直接提交 / 回滚；
+    调用方传入的连接用 SAVEPOINT，失败只撤销这一批，提交留给调用方
+    """
+    if not owned:
+        cur.execute("SAVEPOINT bulk_write")
+    try:
+        yield
+    except Exception:
+        if owned:
+            conn.rollback()
+        else:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_write")
+        raise
+    if owned:
+        conn.commit()
+    else:
+        cur.execute("RELEASE SAVEPOINT bulk_write")
+
+
+def _write_batches(
+    conn,
+    owned: bool,
+    sql: str,
+    template: str,
+    values: list[tuple],
+    embeddings: list[list[float] | None],
+    page_size: int,
+    row_key: Callable[[tuple], Any],
+    value_key: Callable[[tuple], Any],
+) -> list[tuple | Exception]:
+    """
+    按 page_size 切批写入，返回与 values 对应的 RETURNING 行（失败为异常对象）。
+    owned 为 True（连接是自己借的）时每批一个事务；否则都在调用方的事务里，每批一个 SAVEPOINT，由调用方提交。
+    多行 INSERT 的 RETURNING 顺序没有保证，用 value_key / row_key 把返回行对回输入。
+    批量失败时逐行重试，定位出具体哪一行有问题。
+    """
+    results: list[tuple | Exception] = []
+    cur = conn.cursor()
+    try:
+        for start in range(0, len(values), page_size):
+            batch = values[start:start + page_size]
+            batch_embeddings = embeddings[start:start + page_size]
+            try:
+                with _write_unit(conn, cur, owned):
+                    rows = _write_batch(cur, sql, template, batch, batch_embeddings)
+                returned = {row_key(row): row for row in rows}
+                results.extend(returned[value_key(value)] for value in batch)
+                continue
+            except Exception as e:
+                print(f"Bulk write of {len(batch)} rows failed ({e}); retrying one by one", file=sys.stderr)
+
+            for value, embedding in zip(batch, batch_embeddings):
+                try:
+                    with _write_unit(conn, cur, owned):
+                        rows = _write_batch(cur, sql, template, [value], [embedding])
+                    results.append(rows[0])
+                except Exception as e:
+                    results.append(e)
+    finally:
+        cur.close()
+    return results
+
+
+def bulk_upsert_knowledge(
+    rows: list[dict[str, Any]],
+    conn=None,
+    page_size: int = BULK_PAGE_SIZE,
+) -> list[dict[str, Any]]:
+    """
+    批量 upsert knowledge_items。rows 的字段与表列同名（embedding 为 list[float] 或 None）。
+    返回与 rows 对应的 {"success", "id", "created_at"}。
+    传入 conn 时在调用方的事务里写入（失败的批次回滚到 SAVEPOINT），由调用方提交；否则每批单独提交。
+    """
+    if not rows:
+        return []
+    if local_backend():
+        results = get_store().upsert_knowledge_many(rows)
+        bump_generation()
+        return results
+
+    # 同一条 INSERT 里同一个 key 出现两次会触发 "cannot affect row a second time"，批内先去重（后者覆盖前者）
+    latest: dict[tuple[str, str], dict[str, Any]] = {}
+    for row in rows:
+        latest[(row["source_type"], row["source_id"])] = row
+    unique = list(latest.values())
+
+    owned = conn is None
+    with connection(conn) as conn:
+        sql, template, fts = _statements(conn, "knowledge_items", UPSERT_KNOWLEDGE_VALUES_SQL, KNOWLEDGE_VALUES_TEMPLATE)
+        written = _write_batches(conn, owned, sql, template,
+                                 [_knowledge_values(idx, row, fts) for idx, row in enumerate(unique)],
+                                 [row.get("embedding") for row in unique], page_size,
+                                 row_key=lambda row: (row[0], row[1]),
+                                 value_key=lambda value: (value[1], value[2]))
+
+    by_key: dict[tuple[str, str], dict[str, Any]] = {}
+    for row, result in zip(unique, written):
+        key = (row["source_type"], row["source_id"])
+        if isinstance(result, Exception):
+            by_key[key] = {"success": False, "error": str(result)}
+        else:
+            by_key[key] = {"success": True, "id": str(result[2]), "created_at": result[3].isoformat()}
+    return [dict(by_key[(row["source_type"], row["source_id"])]) for row in rows]
+
+
+# 走 (source_type, source_id) 唯一索引；psycopg2 把元组的元组展开成 (('a', 'b'), ('c', 'd'))
+EXISTING_KEYS_SQL = """
+    SELECT source_type, source_id FROM knowledge_items
+    WHERE (source_type, source_id) IN %s
+"""
+
+
+def existing_knowledge_keys(keys: list[tuple[str, str]], conn=None) -> set[tuple[str, str]]:
+    """keys 中已存在于 knowledge_items 的 (source_type, source_id)，整批一次查询"""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return set()
+    if local_backend():
+        return get_store().existing_knowledge_keys(keys)
+    with connection(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(EXISTING_KEYS_SQL, (tuple(keys),))
+            return {(row[0], row[1]) for row in cur.fetchall()}
+
+
+def bulk_insert_memory_cards(
+    cards: list[dict[str, Any]],
+    conn=None,
+    page_size: int = BULK_PAGE_SIZE,
+) -> list[dict[str, Any]]:
+    """
+    批量写入 memory_cards。cards 可自带 id（uuid 字符串），没有则在这里生成。
+    返回与 cards 对应的 {"success", "id", "created_at"}。
+    传入 conn 时在调用方的事务里写入（失败的批次回滚到 SAVEPOINT），由调用方提交；否则每批单独提交。
+    """
+    if not cards:
+        return []
+    if local_backend():
+        results = get_store().insert_cards(cards)
+        bump_generation()
+        return results
+
+    for card in cards:
+        card.setdefault("id", str(uuid.uuid4()))
+
+    owned = conn is None
+    with connection(conn) as conn:
+        sql, template, fts = _statements(conn, "memory_cards", INSERT_CARDS_VALUES_SQL, CARD_VALUES_TEMPLATE)
+        written = _write_batches(conn, owned, sql, template,
+                                 [_card_values(idx, card, fts) for idx, card in enumerate(cards)],
+                                 [card.get("embedding") for card in cards], page_size,
+                                 row_key=lambda row: str(row[0]),
+                                 value_key=lambda value: value[1])
+
+    results: list[dict[str, Any]] = []
+    for card, result in zip(cards, written):
+        if isinstance(result, Exception):
+            results.append({"success": False, "error": str(result)})
+        else:
+            results.append({"success": True, "id": card["id"], "created_at": result[1].isoformat()})
+    return results
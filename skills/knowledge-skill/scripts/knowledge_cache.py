@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "python-dotenv",
+# ]
+# ///
+"""
+本地持久化缓存（SQLite）
+给 embedding、查询结果等"算一次很贵、短期内不变"的东西用：
+- 按 namespace 隔离，同一个缓存文件里可以放多类数据
+- LRU 淘汰：超过 max_entries 时删掉最久没被读过的条目
+- 可选 TTL：过期条目读取时视为未命中
+- 命中 / 未命中计数同时记在进程内和缓存文件里（跨进程累计）
+
+用法:
+  uv run scripts/knowledge_cache.py --stats
+  uv run scripts/knowledge_cache.py --clear embedding
+
+环境变量:
+  KNOWLEDGE_CACHE=0            关闭缓存（所有 get 都未命中，set 不落盘）
+  KNOWLEDGE_CACHE_PATH=...     缓存文件路径，默认 skills/knowledge-skill/.cache/knowledge-cache.sqlite3
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+SKILL_DIR = Path(__file__).parent.parent
+load_dotenv(SKILL_DIR / ".env")
+
+CACHE_ENABLED = os.getenv("KNOWLEDGE_CACHE", "1") != "0"
+CACHE_PATH = Path(os.getenv("KNOWLEDGE_CACHE_PATH", str(SKILL_DIR / ".cache" / "knowledge-cache.sqlite3")))
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    value       BLOB NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries(namespace, accessed_at);
+CREATE TABLE IF NOT EXISTS cache_counters (
+    namespace TEXT PRIMARY KEY,
+    hits      INTEGER NOT NULL DEFAULT 0,
+    misses    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_conn: sqlite3.Connection | None = None
+_conn_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    """进程内共享一个 SQLite 连接（WAL 模式，允许多进程并发读写）"""
+    global _conn
+    if _conn is None:
+        with _conn_lock:
+            if _conn is None:
+                CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(CACHE_PATH), timeout=30, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA_SQL)
+                _conn = conn
+    return _conn
+
+
+class LocalCache:
+    """一个 namespace 下的 LRU + TTL 缓存，值为 bytes"""
+
+    def __init__(self, namespace: str, max_entries: int = 10000, ttl_seconds: float | None = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+
+    def _count(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+        _db().execute(
+            """
+            INSERT INTO cache_counters (namespace, hits, misses) VALUES (?, ?, ?)
+            ON CONFLICT(namespace) DO UPDATE
+            SET hits = hits + excluded.hits, misses = misses + excluded.misses
+            """,
+            (self.namespace, hits, misses),
+        )
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        """批量读取，返回命中的 key → value；命中条目刷新 LRU 时间"""
+        if not CACHE_ENABLED or not keys:
+            self.misses += len(keys)
+            return {}
+        now = time.time()
+        found: dict[str, bytes] = {}
+        with self._lock:
+            db = _db()
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = db.execute(
+                    f"SELECT key, value, created_at FROM cache_entries "
+                    f"WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [self.namespace, *chunk],
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                        continue
+                    found[key] = value
+            if found:
+                db.executemany(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    [(now, self.namespace, key) for key in found],
+                )
+            hits = sum(1 for key in keys if key in found)
+            self._count(hits, len(keys) - hits)
+        return found
+
+    def get(self, key: str) -> bytes | None:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: dict[str, bytes]) -> None:
+        if not CACHE_ENABLED or not items:
+            return
+        now = time.time()
+        with self._lock:
+            db = _db()
+            db.executemany(
+                """
+                INSERT INTO cache_entries (namespace, key, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE
+                SET value = excluded.value, created_at = excluded.created_at, accessed_at = excluded.accessed_at
+                """,
+                [(self.namespace, key, value, now, now) for key, value in items.items()],
+            )
+            self._writes_since_evict += len(items)
+            # 淘汰有代价（一次 COUNT），攒一批写入再做
+            if self._writes_since_evict >= max(1, self.max_entries // 100):
+                self._writes_since_evict = 0
+                self._evict(db)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.set_many({key: value})
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        (total,) = db.execute(
+            "SELECT count(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        overflow = total - self.max_entries
+        if overflow > 0:
+            db.execute(
+                """
+                DELETE FROM cache_entries
+                WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ?
+                    ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (self.namespace, self.namespace, overflow),
+            )
+
+    def clear(self) -> int:
+        with self._lock:
+            cur = _db().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            _db().execute("DELETE FROM cache_counters WHERE namespace = ?", (self.namespace,))
+            return cur.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        """进程内计数 + 缓存文件里的累计计数"""
+        result: dict[str, Any] = {
+            "namespace": self.namespace,
+            "enabled": CACHE_ENABLED,
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+        }
+        if CACHE_ENABLED:
+            result.update(namespace_stats(self.namespace))
+        return result
+
+
+def namespace_stats(namespace: str) -> dict[str, Any]:
+    db = _db()
+    (entries,) = db.execute("SELECT count(*) FROM cache_entries WHERE namespace = ?", (namespace,)).fetchone()
+    row = db.execute("SELECT hits, misses FROM cache_counters WHERE namespace = ?", (namespace,)).fetchone()
+    hits, misses = row if row else (0, 0)
+    total = hits + misses
+    return {
+        "entries": entries,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
+
+
+def all_stats() -> dict[str, Any]:
+    if not CACHE_ENABLED:
+        return {"enabled": False, "path": str(CACHE_PATH), "namespaces": {}}
+    db = _db()
+    names = [row[0] for row in db.execute(
+        "SELECT namespace FROM cache_entries UNION SELECT namespace FROM cache_counters ORDER BY 1"
+    ).fetchall()]
+    return {
+        "enabled": True,
+        "path": str(CACHE_PATH),
+        "namespaces": {name: namespace_stats(name) for name in names},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="knowledge-skill 本地缓存管理")
+    parser.add_argument("--stats", action="store_true", help="输出各 namespace 的条目数和命中率")
+    parser.add_argument("--clear", metavar="NAMESPACE", help="清空某个 namespace（如 embedding）")
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = LocalCache(args.clear).clear()
+        print(json.dumps({"cleared": args.clear, "removed": removed}, ensure_ascii=False, indent=2))
+        return
+
+    print(json.dumps(all_stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -167,7 +167,7 @@ def render_markdown(result: dict[str, Any]) -> str:
     return "\n".join(lines).strip() + "\n"
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="审阅知识候选的 deck 适配度")
     parser.add_argument("--query", required=True, help="搜索主题")
     parser.add_argument("--mode", choices=["keyword", "vector", "hybrid"], default="hybrid")
@@ -179,7 +179,7 @@ def main():
     parser.add_argument("--required-term", action="append", help="必须命中的关键词，可重复传入")
     parser.add_argument("--excluded-term", action="append", help="需要排除的关键词，可重复传入")
     parser.add_argument("--output", choices=["json", "markdown"], default="markdown")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = review_candidates(
         query=args.query,
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = []
+# ///
+"""
+常驻守护进程的瘦客户端（只用标准库，导入开销很小）
+memory_recall.py / knowledge_search.py / knowledge_export.py / knowledge_save.py 在导入重依赖之前先调用
+delegate()：守护进程（knowledge_daemon.py --serve）在跑时，把本次命令行参数转给它执行，原样输出结果并以同样的
+退出码退出；守护进程没在跑、连不上或环境不一致（ENV_KEYS 的有效值不同，或守护进程启动后 .env /
+.tune-params.env 被改过）时直接返回，由脚本照常在本进程执行。
+
+环境变量:
+  KNOWLEDGE_DAEMON=0           不转发，总是在本进程执行
+  KNOWLEDGE_DAEMON_STATE=...   守护进程状态文件（端口 / 令牌 / pid），默认 skills/knowledge-skill/.cache/knowledge-daemon.json
+  KNOWLEDGE_DAEMON_TIMEOUT=600 等待守护进程返回的最长秒数（入库要调 LLM，默认给得比较宽）
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import Any
+
+SKILL_DIR = Path(__file__).parent.parent
+STATE_PATH = Path(os.getenv("KNOWLEDGE_DAEMON_STATE", str(SKILL_DIR / ".cache" / "knowledge-daemon.json")))
+TIMEOUT = float(os.getenv("KNOWLEDGE_DAEMON_TIMEOUT", "600"))
+CONNECT_TIMEOUT = 0.5
+
+# 四个命令（及其导入的模块）在导入时读取的全部配置：客户端的有效值（环境变量优先，其次 env 文件）
+# 与守护进程启动时不同就不能转发，否则会按守护进程的设置执行（比如用另一个模型写 embedding）
+ENV_KEYS = (
+    # 数据库 / 存储
+    "DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD", "DB_NAME",
+    "KNOWLEDGE_BACKEND", "KNOWLEDGE_LOCAL_DIR", "KNOWLEDGE_DB_POOL", "KNOWLEDGE_DB_POOL_MIN", "KNOWLEDGE_DB_POOL_MAX",
+    "KNOWLEDGE_STREAM_ITERSIZE",
+    # 本地缓存
+    "KNOWLEDGE_CACHE", "KNOWLEDGE_CACHE_PATH", "MEMORY_RECALL_CACHE_TTL", "MEMORY_RECALL_CACHE_MAX",
+    # embedding
+    "SILICONFLOW_API_KEY", "EMBEDDING_MODEL", "EMBEDDING_CACHE_MAX", "EMBEDDING_BATCH_SIZE", "EMBEDDING_BATCH_TOKENS",
+    # LLM 摘要
+    "AI_SUMMARY_MODEL", "LONGMAO_API_KEY", "LONGCAT_API_KEY", "LONGMAO_BASE_URL",
+    "LLM_MAX_IN_FLIGHT", "LLM_MAX_RETRIES", "LLM_BACKOFF_BASE", "LLM_MAX_RPM",
+    # 混合检索
+    "KNOWLEDGE_RRF_K", "KNOWLEDGE_HYBRID_VECTOR_WEIGHT", "KNOWLEDGE_HYBRID_KEYWORD_WEIGHT",
+)
+
+# 各脚本导入时 load_dotenv 的文件（靠前的优先，已有的环境变量不被覆盖）；
+# 守护进程启动后文件被改过（mtime 不同）也不转发，改动要重启守护进程才生效
+ENV_FILES = (SKILL_DIR / ".env", SKILL_DIR / ".tune-params.env")
+
+
+def _read_env_file(path: Path) -> dict[str, str]:
+    """KEY=VALUE 格式的 env 文件（与 python-dotenv 对常见写法的解析一致：export 前缀、引号、行尾注释）"""
+    values: dict[str, str] = {}
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return values
+    for line in lines:
+        line = line.strip()
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = (part.strip() for part in line.split("=", 1))
+        if value[:1] in ("'", '"') and value[:1] in value[1:]:
+            value = value[1:value.index(value[0], 1)]
+        elif " #" in value:
+            value = value[:value.index(" #")].rstrip()
+        values.setdefault(key, value)
+    return values
+
+
+def effective_env(environ: Any = None) -> dict[str, str]:
+    """ENV_KEYS 的有效值：环境变量，没有时取 env 文件里的（与脚本导入时 load_dotenv 的结果一致）"""
+    environ = os.environ if environ is None else environ
+    values: dict[str, str] = {}
+    for path in ENV_FILES:
+        for key, value in _read_env_file(path).items():
+            values.setdefault(key, value)
+    values.update({key: environ[key] for key in ENV_KEYS if key in environ})
+    return {key: values[key] for key in ENV_KEYS if key in values}
+
+
+def env_fingerprint(environ: Any = None) -> dict[str, str]:
+    """ENV_KEYS 每个有效值的 sha256（未设置为空串，不把原值发出去）+ 各 env 文件的 mtime"""
+    values = effective_env(environ)
+    fingerprint = {
+        key: hashlib.sha256(values[key].encode()).hexdigest() if key in values else ""
+        for key in ENV_KEYS
+    }
+    for path in ENV_FILES:
+        try:
+            fingerprint[f"mtime:{path.name}"] = str(path.stat().st_mtime_ns)
+        except OSError:
+            fingerprint[f"mtime:{path.name}"] = ""
+    return fingerprint
+
+
+def read_state() -> dict[str, Any] | None:
+    try:
+        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _connect(state: dict[str, Any]) -> socket.socket | None:
+    """连上守护进程；没启动或状态文件过期时返回 None"""
+    try:
+        sock = socket.create_connection(("127.0.0.1", int(state.get("port", 0))), timeout=CONNECT_TIMEOUT)
+    except (OSError, ValueError):
+        return None
+    sock.settimeout(TIMEOUT)
+    return sock
+
+
+def _send(sock: socket.socket, state: dict[str, Any], method: str, path: str,
+          body: dict[str, Any] | None) -> tuple[int, dict[str, Any]]:
+    # 手写一次 HTTP/1.0 请求：http.client 连带导入 email / ssl，比整个请求还慢
+    payload = json.dumps(body or {}).encode()
+    sock.sendall(
+        f"{method} {path} HTTP/1.0\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"X-Knowledge-Token: {state.get('token', '')}\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+        + payload
+    )
+    chunks = []
+    while chunk := sock.recv(65536):
+        chunks.append(chunk)
+    head, _, content = b"".join(chunks).partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(content or b"{}")
+
+
+def request(method: str, path: str, body: dict[str, Any] | None = None) -> tuple[int, dict[str, Any]] | None:
+    """向守护进程发一个请求，返回 (HTTP 状态码, JSON 响应)；守护进程不可用时返回 None"""
+    state = read_state()
+    conn = _connect(state) if state else None
+    if conn is None:
+        return None
+    try:
+        return _send(conn, state, method, path, body)
+    finally:
+        conn.close()
+
+
+def delegate(command: str, argv: list[str] | None = None) -> None:
+    """
+    守护进程可用时由它执行 command 并在这里退出进程；否则直接返回。
+    连接阶段失败（没启动、状态文件过期）静默回退；请求已发出后失败则报错退出，避免同一次写入执行两遍。
+    """
+    if os.getenv("KNOWLEDGE_DAEMON", "1") == "0":
+        return
+    state = read_state()
+    conn = _connect(state) if state else None
+    if conn is None:
+        return
+
+    body = {"command": command, "argv": sys.argv[1:] if argv is None else argv, "env": env_fingerprint()}
+    try:
+        status, payload = _send(conn, state, "POST", "/run", body)
+    except (OSError, ValueError, IndexError) as e:
+        print(f"knowledge daemon request failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    # 409：环境与守护进程不一致；403：令牌不对（守护进程已重启）；都回退到本进程执行
+    if status in (403, 409):
+        return
+    if status != 200:
+        print(f"knowledge daemon error {status}: {payload.get('error')}", file=sys.stderr)
+        sys.exit(1)
+
+    sys.stdout.write(payload.get("stdout", ""))
+    sys.stderr.write(payload.get("stderr", ""))
+    sys.stdout.flush()
+    sys.exit(payload.get("exit_code", 0))
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "psycopg2-binary",
+#     "python-dotenv",
+#     "requests",
+# ]
+# ///
+"""
+常驻守护进程：把召回 / 搜索 / 导出 / 入库放在一个长驻进程里执行
+每次 `uv run scripts/memory_recall.py ...` 都要付解释器启动、导入 psycopg2 / NumPy、读 .env、建连接的开销；
+守护进程把这些都只做一次，连接池、全文检索探测、embedding 缓存连接全程保持热状态。
+
+- 只监听 127.0.0.1（端口默认由系统分配），请求需带启动时生成的令牌
+- 端口 / 令牌 / pid 写在状态文件里（权限 0600），CLI 的瘦客户端（knowledge_client.py）据此转发
+- 执行方式就是调用对应脚本的 main(argv)，输出与直接运行脚本完全一致；stdout / stderr 按请求分别收集（命令里线程池
+  任务的输出也归到这次请求），请求可以并发
+- 守护进程使用自己启动时的环境（.env + 环境变量）；客户端的有效配置（knowledge_client.ENV_KEYS：数据库、模型、
+  API key、检索权重等）与之不同，或守护进程启动后 .env / .tune-params.env 被改过时拒绝执行，由客户端回退到本进程
+  （改了配置要重启守护进程才会再走转发）
+
+用法:
+  uv run scripts/knowledge_daemon.py --serve          # 前台运行（可配合 nohup / systemd / launchd）
+  uv run scripts/knowledge_daemon.py --status
+  uv run scripts/knowledge_daemon.py --stop
+
+之后照常调用各脚本，守护进程在跑时自动转发:
+  uv run scripts/memory_recall.py --query "Agent 基础设施"
+
+环境变量:
+  KNOWLEDGE_DAEMON_PORT=0      监听端口，0 表示由系统分配
+  （客户端相关的 KNOWLEDGE_DAEMON / KNOWLEDGE_DAEMON_STATE 见 knowledge_client.py）
+"""
+
+import argparse
+import contextlib
+import contextvars
+import importlib
+import io
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from knowledge_cache import all_stats
+from knowledge_client import STATE_PATH, env_fingerprint, read_state, request
+from knowledge_db import connection, local_backend, stats as db_stats
+from knowledge_fts import FTS_TABLES, fts_ready
+from knowledge_local_store import get_store
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+PORT = int(os.getenv("KNOWLEDGE_DAEMON_PORT", "0"))
+
+# 命令 → 脚本模块（都提供 main(argv)）
+COMMANDS = {
+    "recall": "memory_recall",
+    "search": "knowledge_search",
+    "export": "knowledge_export",
+    "save": "knowledge_save",
+}
+
+
+class ThreadStream(io.TextIOBase):
+    """
+    替换 sys.stdout / sys.stderr：正在执行命令的上下文写进自己的缓冲区，其他线程照常写到原来的流。
+    缓冲区放在 contextvars 里：命令里的线程池（knowledge_llm / knowledge_hybrid）用 contextvars.copy_context().run
+    提交任务，工作线程的输出也算进这次请求；没带上下文的线程写到原来的流
+    """
+
+    def __init__(self, original: Any):
+        self.original = original
+        self.buffer: contextvars.ContextVar[io.StringIO | None] = contextvars.ContextVar(
+            f"thread_stream_{id(self)}", default=None
+        )
+
+    def current(self) -> io.StringIO | None:
+        """当前上下文应写入的缓冲区（不在 capture 中为 None）"""
+        return self.buffer.get()
+
+    def write(self, text: str) -> int:
+        return (self.current() or self.original).write(text)
+
+    def flush(self) -> None:
+        if self.current() is None:
+            self.original.flush()
+
+    def reconfigure(self, **kwargs: Any) -> None:
+        """有的脚本导入时会 reconfigure(line_buffering=True)，转给原来的流（不支持时忽略）"""
+        if hasattr(self.original, "reconfigure"):
+            self.original.reconfigure(**kwargs)
+
+    @contextlib.contextmanager
+    def capture(self):
+        token = self.buffer.set(io.StringIO())
+        try:
+            yield self.buffer.get()
+        finally:
+            self.buffer.reset(token)
+
+
+def run_main(module: Any, argv: list[str], stdout: ThreadStream, stderr: ThreadStream) -> tuple[int, str, str]:
+    """
+    在当前线程执行 module.main(argv)，返回 (退出码, stdout, stderr)。
+    stdout / stderr 须已装到 sys.stdout / sys.stderr 上；SystemExit 和未捕获的异常都转成退出码，与直接运行脚本一致。
+    """
+    exit_code = 0
+    with stdout.capture() as out, stderr.capture() as err:
+        try:
+            module.main(argv)
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+            else:
+                exit_code = e.code or 0
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        return exit_code, out.getvalue(), err.getvalue()
+
+
+class Daemon:
+    def __init__(self):
+        self.token = secrets.token_hex(16)
+        self.started_at = time.time()
+        self.env = env_fingerprint()
+        self.counts: dict[str, int] = {name: 0 for name in COMMANDS}
+        self.modules = {name: importlib.import_module(module) for name, module in COMMANDS.items()}
+        self.stdout = ThreadStream(sys.stdout)
+        self.stderr = ThreadStream(sys.stderr)
+        # 本地 SQLite 后端共用一个连接，命令串行执行；PostgreSQL 走线程安全的连接池，可以并发
+        self.serial = threading.Lock() if local_backend() else contextlib.nullcontext()
+
+    def warm_up(self) -> dict[str, Any]:
+        """预先建好连接、探测全文检索、打开缓存文件，第一个请求也不用等"""
+        all_stats()
+        if local_backend():
+            get_store()
+            return {"backend": "sqlite"}
+        with connection() as conn:
+            fts = {table: fts_ready(conn, table) for table in FTS_TABLES}
+        return {"backend": "postgres", "fts": fts}
+
+    def env_mismatch(self, client_env: dict[str, str]) -> list[str]:
+        """有效配置或 env 文件 mtime 与启动时不同的键（任一边缺的键也算不同）"""
+        return sorted(key for key in set(self.env) | set(client_env) if self.env.get(key) != client_env.get(key))
+
+    def run(self, command: str, argv: list[str]) -> dict[str, Any]:
+        """执行 <脚本>.main(argv)，返回退出码和这次执行写出的 stdout / stderr"""
+        start = time.perf_counter()
+        with self.serial:
+            exit_code, stdout, stderr = run_main(self.modules[command], argv, self.stdout, self.stderr)
+        self.counts[command] += 1
+        return {
+            "exit_code": exit_code,
+            "stdout": stdout,
+            "stderr": stderr,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "requests": dict(self.counts),
+            "db": db_stats(),
+        }
+
+
+def _handler(daemon: Daemon, server_ref: list[ThreadingHTTPServer]) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any) -> None:  # 不往终端刷访问日志
+            pass
+
+        def _reply(self, status: int, payload: dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            self.do_POST()
+
+        def do_POST(self) -> None:
+            if not secrets.compare_digest(self.headers.get("X-Knowledge-Token", ""), daemon.token):
+                self._reply(403, {"error": "bad token"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {"error": "invalid json"})
+                return
+
+            if self.path == "/status":
+                self._reply(200, daemon.status())
+            elif self.path == "/stop":
+                self._reply(200, {"stopping": True, "pid": os.getpid()})
+                threading.Thread(target=server_ref[0].shutdown, daemon=True).start()
+            elif self.path == "/run":
+                command = body.get("command")
+                if command not in COMMANDS:
+                    self._reply(400, {"error": f"unknown command: {command}"})
+                    return
+                mismatch = daemon.env_mismatch(body.get("env") or {})
+                if mismatch:
+                    self._reply(409, {"error": "environment differs from daemon", "keys": mismatch})
+                    return
+                self._reply(200, daemon.run(command, [str(arg) for arg in body.get("argv") or []]))
+            else:
+                self._reply(404, {"error": f"unknown path: {self.path}"})
+
+    return Handler
+
+
+def serve(port: int = PORT) -> None:
+    existing = read_state()
+    if existing and request("GET", "/status") is not None:
+        print(f"knowledge daemon already running (pid {existing.get('pid')})", file=sys.stderr)
+        sys.exit(1)
+
+    daemon = Daemon()
+    warm = daemon.warm_up()
+    server_ref: list[ThreadingHTTPServer] = []
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(daemon, server_ref))
+    server.daemon_threads = True
+    server_ref.append(server)
+
+    sys.stdout, sys.stderr = daemon.stdout, daemon.stderr
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    state = {"pid": os.getpid(), "port": server.server_address[1], "token": daemon.token,
+             "started_at": daemon.started_at}
+    # 令牌只给本用户读
+    fd = os.open(STATE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    print(json.dumps({"listening": f"127.0.0.1:{state['port']}", "pid": state["pid"], **warm},
+                     ensure_ascii=False), file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # 只删自己写的状态文件（避免误删之后启动的新守护进程的）
+        if (read_state() or {}).get("pid") == os.getpid():
+            STATE_PATH.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="knowledge-skill 常驻守护进程")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--serve", action="store_true", help="前台运行守护进程")
+    group.add_argument("--status", action="store_true", help="查看守护进程状态")
+    group.add_argument("--stop", action="store_true", help="停止守护进程")
+    parser.add_argument("--port", type=int, default=PORT, help="监听端口（默认由系统分配）")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    reply = request("POST", "/stop" if args.stop else "/status")
+    if reply is None:
+        print(json.dumps({"running": False}, ensure_ascii=False, indent=2))
+        sys.exit(0 if args.stop else 1)
+    status, payload = reply
+    print(json.dumps({"running": True, **payload}, ensure_ascii=False, indent=2))
+    if status != 200:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
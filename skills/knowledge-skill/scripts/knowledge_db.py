@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "psycopg2-binary",
+#     "python-dotenv",
+# ]
+# ///
+"""
+共享数据库连接层
+所有 knowledge-skill 脚本统一从这里拿 PostgreSQL 连接，进程内复用一个连接池，
+避免每个查询函数各自 psycopg2.connect() 带来的 TCP + 认证握手。
+
+用法:
+  from knowledge_db import connection
+
+  with connection() as conn:
+      cur = conn.cursor()
+      ...
+
+  # 调用方已持有连接时直接复用，不再从池里借
+  def recall_l2_keyword(query, limit, conn=None):
+      with connection(conn) as conn:
+          ...
+
+  # 向量参数用 Vector 包装（float32 紧凑文本），查出的 embedding 是 np.ndarray
+  cur.execute("SELECT id FROM memory_cards ORDER BY embedding <=> %s LIMIT 5", [Vector(embedding)])
+
+环境变量:
+  KNOWLEDGE_BACKEND=sqlite   改用嵌入式本地存储（见 knowledge_local_store.py），不需要 PostgreSQL
+  KNOWLEDGE_DB_POOL=0        关闭连接池，每次 connection() 都新建连接（对照基准用）
+  KNOWLEDGE_DB_POOL_MIN=1    连接池最小连接数
+  KNOWLEDGE_DB_POOL_MAX=8    连接池最大连接数
+  KNOWLEDGE_STREAM_ITERSIZE=500  fetch_iter() 每次从服务端游标取回的行数
+"""
+
+import atexit
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", ""),
+    "port": int(os.getenv("DB_PORT", 5433)),
+    "user": os.getenv("DB_USER", ""),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "dbname": os.getenv("DB_NAME", ""),
+}
+
+# 存储后端：postgres（默认）/ sqlite（嵌入式本地存储，支持检索、入库、整理、压缩）
+BACKEND = os.getenv("KNOWLEDGE_BACKEND", "postgres").lower()
+
+POOL_ENABLED = os.getenv("KNOWLEDGE_DB_POOL", "1") != "0"
+POOL_MIN = int(os.getenv("KNOWLEDGE_DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("KNOWLEDGE_DB_POOL_MAX", "8"))
+STREAM_ITERSIZE = int(os.getenv("KNOWLEDGE_STREAM_ITERSIZE", "500"))
+
+_pool: psycopg2.pool.ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
+_stats = {"connects": 0, "borrows": 0}
+
+
+class Vector:
+    """
+    pgvector 查询参数：cur.execute(sql, [Vector(embedding)])。
+    以 float32 紧凑文本内联成 '[...]'::vector（见 knowledge_vectors.format_vector），
+    比 str(list[float]) 短约 40%，SQL 里也不用再写 ::vector。
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Any):
+        self.values = values
+
+
+def _adapt_vector(vector: Vector) -> psycopg2.extensions.AsIs:
+    # 延迟导入：不碰向量的脚本不必加载 NumPy
+    from knowledge_vectors import format_vector
+    return psycopg2.extensions.AsIs(f"'{format_vector(vector.values)}'::vector")
+
+
+psycopg2.extensions.register_adapter(Vector, _adapt_vector)
+
+
+def _cast_vector(value: str | None, cur: Any) -> Any:
+    if value is None:
+        return None
+    from knowledge_vectors import parse_vector
+    return parse_vector(value)
+
+
+_vector_type_registered = False
+
+
+def _register_vector_type(conn: psycopg2.extensions.connection) -> None:
+    """
+    首次建连时查出 vector 类型的 OID（扩展类型，每个库不同），注册进程级 typecaster：
+    之后 SELECT 出的 embedding 直接是 float32 np.ndarray，而不是 '[...]' 文本
+    """
+    global _vector_type_registered
+    if _vector_type_registered:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regtype('vector')::oid")
+        (oid,) = cur.fetchone()
+    conn.rollback()
+    if oid:
+        psycopg2.extensions.register_type(psycopg2.extensions.new_type((oid,), "VECTOR", _cast_vector))
+    _vector_type_registered = True
+
+
+def _connect() -> psycopg2.extensions.connection:
+    _stats["connects"] += 1
+    conn = psycopg2.connect(**DB_CONFIG)
+    _register_vector_type(conn)
+    return conn
+
+
+class _CountingPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool 的薄包装：统计真实建连次数，新连接上注册 vector 类型"""
+
+    def _connect(self, key=None):
+        _stats["connects"] += 1
+        conn = super()._connect(key)
+        _register_vector_type(conn)
+        return conn
+
+
+def local_backend() -> bool:
+    """是否使用嵌入式本地存储后端"""
+    return BACKEND == "sqlite"
+
+
+def get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """返回进程级连接池（首次调用时懒创建）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _CountingPool(POOL_MIN, max(POOL_MIN, POOL_MAX), **DB_CONFIG)
+    return _pool
+
+
+def close_pool() -> None:
+    """关闭连接池中的所有连接（进程退出时自动调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+atexit.register(close_pool)
+
+
+def _release(conn: psycopg2.extensions.connection, broken: bool) -> None:
+    if not POOL_ENABLED or _pool is None:
+        conn.close()
+        return
+    _pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+@contextmanager
+def connection(conn: psycopg2.extensions.connection | None = None) -> Iterator[psycopg2.extensions.connection]:
+    """
+    借出一个连接，退出时归还。
+    - 传入 conn 时直接复用调用方的连接，不提交也不归还（事务由调用方负责）
+    - 正常退出时提交未结束的事务；异常时回滚
+    """
+    if conn is not None:
+        yield conn
+        return
+
+    _stats["borrows"] += 1
+    own = get_pool().getconn() if POOL_ENABLED else _connect()
+    broken = False
+    try:
+        yield own
+        if not own.closed and own.status != psycopg2.extensions.STATUS_READY:
+            own.commit()
+    except Exception as exc:
+        broken = isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if not own.closed:
+            try:
+                own.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        _release(own, broken)
+
+
+def fetch_all(sql: str, params: Any = None, conn: psycopg2.extensions.connection | None = None) -> list[dict[str, Any]]:
+    """执行只读查询，返回 dict 行列表"""
+    with connection(conn) as c:
+        with c.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql, params)
+            return [dict(row) for row in cur.fetchall()]
+
+
+def fetch_iter(sql: str, params: Any = None, conn: psycopg2.extensions.connection | None = None,
+               itersize: int = STREAM_ITERSIZE) -> Iterator[dict[str, Any]]:
+    """
+    执行只读查询，逐行产出 dict。用服务端命名游标每次取回 itersize 行，
+    结果集再大，进程里也只有一批行（导出 / 体检全库时用，代替 fetch_all）。
+    """
+    with connection(conn) as c:
+        with c.cursor(name=f"knowledge_stream_{uuid.uuid4().hex}", cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.itersize = itersize
+            cur.execute(sql, params)
+            for row in cur:
+                yield dict(row)
+
+
+def stats() -> dict[str, int]:
+    """本进程的建连 / 借出次数（基准测试用）"""
+    return dict(_stats)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "python-dotenv",
+#     "requests",
+# ]
+# ///
+"""
+统一的 embedding 客户端（SiliconFlow）
+所有脚本都从这里拿 embedding，不再各自拷贝一份请求代码。
+结果按 (EMBEDDING_MODEL, sha256(截断后的文本)) 缓存在本地 SQLite（见 knowledge_cache.py），
+同一条 query / 同一段未改动的内容第二次起不再发网络请求。
+
+用法:
+  from knowledge_embedding import get_embedding
+  vec = get_embedding("Agent 基础设施")
+
+  # 批量：自动按条数 / token 预算切成若干次请求，结果按输入顺序返回
+  from knowledge_embedding import get_embeddings
+  vecs = get_embeddings(["文本 1", "文本 2", ...])
+
+  uv run scripts/knowledge_embedding.py --text "Agent 基础设施"   # 调试：输出维度和缓存命中情况
+
+环境变量:
+  EMBEDDING_CACHE_MAX=50000       缓存最多保留的向量条数（LRU 淘汰）
+  EMBEDDING_BATCH_SIZE=32         单次请求最多打包的文本条数
+  EMBEDDING_BATCH_TOKENS=32000    单次请求的估算 token 上限
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from array import array
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+
+from knowledge_cache import LocalCache
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+EMBEDDING_URL = "https://api.siliconflow.cn/v1/embeddings"
+EMBEDDING_MAX_CHARS = 8000
+EMBEDDING_CACHE_MAX = int(os.getenv("EMBEDDING_CACHE_MAX", "50000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "32000"))
+
+embedding_cache = LocalCache("embedding", max_entries=EMBEDDING_CACHE_MAX)
+_warned_missing_key = False
+
+
+def embedding_cache_key(text: str, model: str = EMBEDDING_MODEL) -> str:
+    digest = hashlib.sha256(text[:EMBEDDING_MAX_CHARS].encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+def pack_vector(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：CJK 等非 ASCII 字符按 1 个，ASCII 按 4 字符 1 个"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii) // 4 + 1
+
+
+def _api_key_available() -> bool:
+    global _warned_missing_key
+    if SILICONFLOW_API_KEY:
+        return True
+    if not _warned_missing_key:
+        print("Warning: SILICONFLOW_API_KEY not set, skipping embedding", file=sys.stderr)
+        _warned_missing_key = True
+    return False
+
+
+def _post_embeddings(inputs: str | list[str]) -> list[list[float]]:
+    response = requests.post(
+        EMBEDDING_URL,
+        headers={
+            "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": EMBEDDING_MODEL,
+            "input": inputs,
+            "encoding_format": "float",
+        },
+        timeout=30 if isinstance(inputs, str) else 120,
+    )
+    response.raise_for_status()
+    data = response.json()["data"]
+    # 按 index 对回输入顺序（接口不保证返回顺序）
+    ordered = sorted(data, key=lambda row: row.get("index", 0))
+    return [row["embedding"] for row in ordered]
+
+
+def request_embedding(text: str) -> list[float] | None:
+    """直接调用 SiliconFlow API（不经过缓存）"""
+    if not _api_key_available():
+        return None
+    try:
+        return _post_embeddings(text[:EMBEDDING_MAX_CHARS])[0]
+    except Exception as e:
+        print(f"Error generating embedding: {e}", file=sys.stderr)
+        return None
+
+
+def plan_batches(
+    texts: list[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    token_budget: int = EMBEDDING_BATCH_TOKENS,
+) -> list[list[int]]:
+    """把文本下标切成若干批：每批不超过 batch_size 条，估算 token 不超过 token_budget"""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def request_embeddings(texts: list[str]) -> list[list[float] | None]:
+    """批量调用 SiliconFlow API（不经过缓存），返回与输入一一对应的结果"""
+    if not texts:
+        return []
+    if not _api_key_available():
+        return [None] * len(texts)
+
+    truncated = [text[:EMBEDDING_MAX_CHARS] for text in texts]
+    results: list[list[float] | None] = [None] * len(texts)
+    for batch in plan_batches(truncated):
+        inputs = [truncated[idx] for idx in batch]
+        try:
+            vectors = _post_embeddings(inputs)
+            if len(vectors) != len(inputs):
+                raise ValueError(f"expected {len(inputs)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            # 整批失败时逐条重试，避免一条坏输入拖垮整批
+            print(f"Error generating embeddings for batch of {len(inputs)}: {e}; retrying one by one", file=sys.stderr)
+            vectors = [request_embedding(text) for text in inputs]
+        for idx, vector in zip(batch, vectors):
+            results[idx] = vector
+    return results
+
+
+def get_embedding(text: str) -> list[float] | None:
+    """生成 embedding，优先读本地缓存；失败返回 None（不缓存失败结果）"""
+    key = embedding_cache_key(text)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return unpack_vector(cached)
+
+    embedding = request_embedding(text)
+    if embedding:
+        embedding_cache.set(key, pack_vector(embedding))
+    return embedding
+
+
+def get_embeddings(texts: list[str]) -> list[list[float] | None]:
+    """
+    批量生成 embedding，结果与输入顺序一一对应（失败的位置为 None）。
+    先查缓存，只有未命中且去重后的文本才会打包成批量请求。
+    """
+    keys = [embedding_cache_key(text) for text in texts]
+    cached = embedding_cache.get_many(keys)
+
+    pending: dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in pending:
+            pending[key] = text
+
+    fetched: dict[str, list[float]] = {}
+    if pending:
+        vectors = request_embeddings(list(pending.values()))
+        fetched = {key: vector for key, vector in zip(pending, vectors) if vector}
+        embedding_cache.set_many({key: pack_vector(vector) for key, vector in fetched.items()})
+
+    results: list[list[float] | None] = []
+    for key in keys:
+        if key in cached:
+            results.append(unpack_vector(cached[key]))
+        else:
+            results.append(fetched.get(key))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="embedding 客户端调试")
+    parser.add_argument("--text", required=True, help="要生成 embedding 的文本")
+    args = parser.parse_args()
+
+    embedding = get_embedding(args.text)
+    print(json.dumps({
+        "model": EMBEDDING_MODEL,
+        "dimensions": len(embedding) if embedding else 0,
+        "cache": embedding_cache.stats(),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests"
@@ -12,182 +13,197 @@
 
 与 knowledge_search.py 不同，这个脚本返回完整的决策信息：
 - ai_summary（一句话总结）
-- content 截断（前 1000 字，足够判断结论和价值）
+- content 截断（默认前 1000 字，足够判断结论和价值；--content-chars 调整，0 表示不要正文）
 - metadata（来源、作者等结构化信息）
+- similarity / keyword_score / rrf_score（两路检索的分数和 RRF 融合分）与各阶段耗时 timings_ms
+- --fields 只输出需要的列；--stream 按 NDJSON 逐行输出
+
+不带 --query 的 --stream 导出全部 active 条目：服务端命名游标分批取回、逐行写出，
+正文只取截断长度，内存占用与库的大小无关。
 
 用法：
     python knowledge_export.py --query "Agent Infrastructure" --limit 8
+    python knowledge_export.py --query "RAG" --mode keyword --content-chars 300
+    python knowledge_export.py --stream --days 30 --fields id,title,ai_summary > items.ndjson
 """
 
+
+if __name__ == "__main__":
+    import sys
+
+    # 常驻守护进程（knowledge_daemon.py）在跑时直接转发给它并退出，省掉下面的重依赖导入和建连；否则照常在本进程执行。
+    # --stream 不转发：守护进程会把整段输出缓冲下来再返回，流式就没有意义了
+    if "--stream" not in sys.argv:
+        from knowledge_client import delegate
+        delegate("export")
+
 import argparse
 import json
-import os
 import sys
 from pathlib import Path
+from typing import Any, Iterable, Iterator
 
-import psycopg2
-import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
-load_dotenv(Path(__file__).parent.parent / ".env")
+from knowledge_db import fetch_iter, local_backend
+from knowledge_hybrid import KEYWORD_WEIGHT, VECTOR_WEIGHT, HybridResult, hybrid_search
+from knowledge_local_store import get_store
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
+load_dotenv(Path(__file__).parent.parent / ".env")
 
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
 
 CONTENT_TRUNCATE_LEN = 1000
 
+# 导出行的列（content_preview 由截断后的 content 生成）；带 --query 时还可以选检索分数列
+EXPORT_COLUMNS = (
+    "id", "source_type", "source_id", "source_url", "title", "summary", "ai_summary",
+    "content_preview", "metadata", "created_at", "updated_at",
+)
+SCORE_COLUMNS = ("similarity", "keyword_score", "rrf_score", "search_type")
+MODE_LEGS = {"hybrid": ("vector", "keyword"), "keyword": ("keyword",), "vector": ("vector",)}
 
-def get_embedding(text: str) -> list[float]:
-    """调用 SiliconFlow API 生成 embedding"""
-    if not SILICONFLOW_API_KEY:
-        return None
-    try:
-        response = requests.post(
-            "https://api.siliconflow.cn/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text[:8000],
-                "encoding_format": "float",
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        print(f"Error generating embedding: {e}", file=sys.stderr)
-        return None
+
+def select_columns(content_chars: int, fields: Iterable[str] | None = None, sqlite: bool = False) -> str:
+    """
+    导出查询的 SELECT 列表；content 只取截断判断需要的长度（content_chars + 1），不把整篇正文拉回来。
+    fields 给定时只取这些列（id 总是带上）。
+    """
+    wanted = set(fields) if fields else set(EXPORT_COLUMNS)
+    columns = [column for column in EXPORT_COLUMNS if column != "content_preview" and (column in wanted or column == "id")]
+    if content_chars > 0 and "content_preview" in wanted:
+        prefix = f"substr(content, 1, {int(content_chars) + 1})" if sqlite else f"left(content, {int(content_chars) + 1})"
+        columns.append(f"{prefix} AS content")
+    return ", ".join(columns)
+
+
+def to_export_row(row: dict[str, Any], content_chars: int, fields: list[str] | None = None) -> dict[str, Any]:
+    """content → content_preview（超长截断并加 ...），去掉 status；fields 给定时按其顺序只保留这些列"""
+    content = row.pop("content", None) or ""
+    row.pop("status", None)
+    if content_chars > 0:
+        row["content_preview"] = content[:content_chars] + "..." if len(content) > content_chars else content
+    if fields:
+        return {field: row[field] for field in fields if field in row}
+    return row
+
+
+def export_hybrid(query: str, limit: int = 8, source_type: str = None,
+                  vector_weight: float = VECTOR_WEIGHT, keyword_weight: float = KEYWORD_WEIGHT,
+                  mode: str = "hybrid", content_chars: int = CONTENT_TRUNCATE_LEN) -> HybridResult:
+    """
+    混合搜索（只取 active 条目，关键词也匹配 ai_summary）+ 整理成 agent 决策所需的字段，附带各阶段耗时。
+    mode 为 keyword / vector 时只跑对应的一路。
+    """
+    hybrid = hybrid_search(
+        query, limit=limit, source_type=source_type,
+        active_only=True, fields=select_columns(content_chars, sqlite=local_backend()) + ", status",
+        keyword_columns=("title", "content", "ai_summary"),
+        vector_weight=vector_weight, keyword_weight=keyword_weight, legs=MODE_LEGS[mode],
+    )
+    hybrid.results = [to_export_row(r, content_chars) for r in hybrid.results]
+    return hybrid
 
 
 def export_for_agent(query: str, limit: int = 8, source_type: str = None) -> list[dict]:
     """
     混合搜索 + 返回 agent 决策所需的完整字段
     """
-    embedding = get_embedding(query)
-
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        # 向量搜索部分
-        vector_ids = []
-        if embedding:
-            sql_vec = """
-                SELECT id, 1 - (embedding <=> %s::vector) as similarity
-                FROM knowledge_items
-                WHERE embedding IS NOT NULL AND status = 'active'
-            """
-            params_vec = [str(embedding)]
-            if source_type:
-                sql_vec += " AND source_type = %s"
-                params_vec.append(source_type)
-            sql_vec += " ORDER BY embedding <=> %s::vector LIMIT %s"
-            params_vec.extend([str(embedding), limit * 2])
-            cur.execute(sql_vec, params_vec)
-            vector_ids = [(r["id"], r["similarity"]) for r in cur.fetchall()]
-
-        # 关键词搜索部分
-        words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
-        if not words:
-            words = [query]
-        conditions = []
-        params_kw = []
-        for word in words:
-            conditions.append("(title ILIKE %s OR content ILIKE %s OR ai_summary ILIKE %s)")
-            params_kw.extend([f"%{word}%", f"%{word}%", f"%{word}%"])
-
-        sql_kw = f"""
-            SELECT id FROM knowledge_items
-            WHERE ({" OR ".join(conditions)}) AND status = 'active'
-        """
-        if source_type:
-            sql_kw += " AND source_type = %s"
-            params_kw.append(source_type)
-        sql_kw += " LIMIT %s"
-        params_kw.append(limit * 2)
-        cur.execute(sql_kw, params_kw)
-        keyword_ids = [r["id"] for r in cur.fetchall()]
-
-        # 合并去重，向量结果优先
-        seen = set()
-        ordered_ids = []
-        id_similarity = {}
-        for id_, sim in vector_ids:
-            if id_ not in seen:
-                ordered_ids.append(id_)
-                id_similarity[id_] = sim
-                seen.add(id_)
-        for id_ in keyword_ids:
-            if id_ not in seen:
-                ordered_ids.append(id_)
-                seen.add(id_)
-
-        # 取前 limit 个，然后批量查完整字段
-        target_ids = ordered_ids[:limit]
-        if not target_ids:
-            return []
-
-        sql_full = """
-            SELECT id, source_type, source_id, source_url, title,
-                   summary, ai_summary, content, metadata,
-                   created_at, updated_at
-            FROM knowledge_items
-            WHERE id = ANY(%s)
-        """
-        cur.execute(sql_full, [target_ids])
-        rows = cur.fetchall()
-
-        # 按 ordered_ids 的顺序排列
-        row_map = {r["id"]: r for r in rows}
-        results = []
-        for id_ in target_ids:
-            if id_ not in row_map:
-                continue
-            r = dict(row_map[id_])
-            # 截断 content，避免输出过长
-            if r.get("content") and len(r["content"]) > CONTENT_TRUNCATE_LEN:
-                r["content_preview"] = r["content"][:CONTENT_TRUNCATE_LEN] + "..."
-            else:
-                r["content_preview"] = r.get("content", "")
-            # 不输出完整 content 和 embedding
-            r.pop("content", None)
-            # 补上 similarity（如果有）
-            if id_ in id_similarity:
-                r["similarity"] = id_similarity[id_]
-            results.append(r)
-
-        return results
-    finally:
-        cur.close()
-        conn.close()
-
-
-def main():
-    parser = argparse.ArgumentParser(description="导出知识库内容（面向 agent 的结构化输出）")
-    parser.add_argument("--query", required=True, help="搜索关键词")
-    parser.add_argument("--limit", type=int, default=8, help="返回数量（默认 8）")
-    parser.add_argument("--source-type", help="筛选来源类型")
+    return export_hybrid(query, limit, source_type).results
 
-    args = parser.parse_args()
 
-    results = export_for_agent(args.query, args.limit, args.source_type)
+def export_candidates(query: str, mode: str = "hybrid", limit: int = 8, source_type: str | None = None,
+                      content_chars: int = CONTENT_TRUNCATE_LEN) -> dict[str, Any]:
+    """
+    与 CLI JSON 输出相同的结构 {query, mode, total, results, timings_ms}，给 deck brief / 候选体检直接调用；
+    它们按 content 读正文，所以截断后的正文放在 content（CLI 输出里叫 content_preview）
+    """
+    hybrid = export_hybrid(query, limit, source_type, mode=mode, content_chars=content_chars)
+    for r in hybrid.results:
+        r["content"] = r.pop("content_preview", "")
+    return {
+        "query": query,
+        "mode": mode,
+        "total": len(hybrid.results),
+        "results": hybrid.results,
+        "timings_ms": hybrid.timings,
+    }
+
+
+def iter_export_rows(source_type: str | None = None, days: int | None = None, limit: int | None = None,
+                     content_chars: int = CONTENT_TRUNCATE_LEN, fields: list[str] | None = None) -> Iterator[dict[str, Any]]:
+    """全部 active 条目按 created_at 倒序逐行产出（导出格式同上），不在内存里攒结果"""
+    if local_backend():
+        rows = get_store().iter_knowledge(select_columns(content_chars, fields, sqlite=True), source_type, days)
+        for index, row in enumerate(rows):
+            if limit is not None and index >= limit:
+                return
+            yield to_export_row(row, content_chars, fields)
+        return
+
+    sql = f"SELECT {select_columns(content_chars, fields)} FROM knowledge_items WHERE status = 'active'"
+    params: dict[str, Any] = {"source_type": source_type, "days": days, "limit": limit}
+    if source_type:
+        sql += " AND source_type = %(source_type)s"
+    if days is not None:
+        sql += " AND created_at >= NOW() - make_interval(days => %(days)s)"
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT %(limit)s"
+    for row in fetch_iter(sql, params):
+        yield to_export_row(row, content_chars, fields)
+
+
+def write_ndjson(rows: Iterable[dict[str, Any]]) -> int:
+    """每行一个 JSON 对象写到 stdout，返回行数"""
+    count = 0
+    for row in rows:
+        sys.stdout.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        count += 1
+    sys.stdout.flush()
+    return count
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog=Path(__file__).name, description="导出知识库内容（面向 agent 的结构化输出）")
+    parser.add_argument("--query", help="搜索关键词（只有 --stream 可以省略，表示导出全部 active 条目）")
+    parser.add_argument("--mode", choices=list(MODE_LEGS), default="hybrid", help="搜索模式（默认 hybrid）")
+    parser.add_argument("--limit", type=int, help="返回数量（带 --query 默认 8；全量导出默认不限）")
+    parser.add_argument("--source-type", help="筛选来源类型")
+    parser.add_argument("--days", type=int, help="全量导出时只取最近多少天的条目")
+    parser.add_argument("--content-chars", type=int, default=CONTENT_TRUNCATE_LEN,
+                        help=f"content_preview 截断长度（默认 {CONTENT_TRUNCATE_LEN}，0 表示不要正文）")
+    parser.add_argument("--fields", help="只输出这些列，逗号分隔，如 id,title,ai_summary")
+    parser.add_argument("--stream", action="store_true", help="按 NDJSON 逐行输出（每行一个条目）")
+    parser.add_argument("--vector-weight", type=float, default=VECTOR_WEIGHT, help="向量一路的 RRF 权重")
+    parser.add_argument("--keyword-weight", type=float, default=KEYWORD_WEIGHT, help="关键词一路的 RRF 权重")
+
+    args = parser.parse_args(argv)
+
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()] if args.fields else None
+    allowed = EXPORT_COLUMNS + (SCORE_COLUMNS if args.query else ())
+    unknown = [field for field in fields or [] if field not in allowed]
+    if unknown:
+        parser.error(f"未知的 --fields 列: {', '.join(unknown)}（可选: {', '.join(allowed)}）")
+    if not args.query:
+        if not args.stream:
+            parser.error("需要 --query；不带 --query 时只能配合 --stream 导出全部 active 条目")
+        write_ndjson(iter_export_rows(args.source_type, args.days, args.limit, args.content_chars, fields))
+        return
+
+    hybrid = export_hybrid(args.query, args.limit or 8, args.source_type,
+                           vector_weight=args.vector_weight, keyword_weight=args.keyword_weight,
+                           mode=args.mode, content_chars=args.content_chars)
+    results = [{field: r[field] for field in fields if field in r} for r in hybrid.results] if fields else hybrid.results
+    if args.stream:
+        write_ndjson(results)
+        return
 
     output = {
         "query": args.query,
+        "mode": args.mode,
         "total": len(results),
         "results": results,
+        "timings_ms": hybrid.timings,
     }
 
     print(json.dumps(output, ensure_ascii=False, indent=2, default=str))
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = []
+# ///
+"""
+文件元数据缓存（SQLite，放在被扫描的目录里）
+发布、覆盖率报告、wiki 体检每次都要对每个 Markdown 文件算 sha256 或重新解析 frontmatter。
+这里按 (相对路径, kind) 记下文件指纹（mtime_ns + size）和算出来的结果：指纹没变直接用缓存，
+只有改过的文件才重新读取，大 wiki 上重复运行基本不碰文件内容。
+
+- kind 区分不同用途（如 "publish" 存 sha256 + 标题，"wiki_review" 存页面统计），各自独立失效
+- 刚改过（1 秒内）的文件不写缓存：同一秒内再次修改可能 mtime 不变，下次运行重新计算
+- 已删除文件的条目在 close() 时清掉
+
+用法:
+  from knowledge_file_cache import FileCache
+  with FileCache(wiki_dir) as cache:
+      summary = cache.get(path, "wiki_review", read_page)
+
+  uv run scripts/knowledge_file_cache.py --dir ~/.openclaw/workspace/llm-wiki --stats
+  uv run scripts/knowledge_file_cache.py --dir ~/.openclaw/workspace/llm-wiki --clear
+
+环境变量:
+  KNOWLEDGE_FILE_CACHE=0       关闭（每次都重新计算，不读写缓存文件）
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+CACHE_FILENAME = ".file-cache.sqlite3"
+FILE_CACHE_ENABLED = os.getenv("KNOWLEDGE_FILE_CACHE", "1") != "0"
+# mtime 离现在太近的文件不缓存（文件系统 mtime 精度有限，同一时间片里的第二次修改可能看不出来）
+RACY_SECONDS = 1.0
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS file_entries (
+    path      TEXT NOT NULL,
+    kind      TEXT NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    value     TEXT NOT NULL,
+    PRIMARY KEY (path, kind)
+) WITHOUT ROWID;
+"""
+
+
+class FileCache:
+    """root 目录下文件的派生数据缓存；用 with 打开，退出时批量落盘"""
+
+    def __init__(self, root: Path | str, enabled: bool = FILE_CACHE_ENABLED):
+        self.root = Path(root).expanduser().resolve()
+        self.path = self.root / CACHE_FILENAME
+        self.enabled = enabled and self.root.is_dir()
+        self.db: sqlite3.Connection | None = None
+        self.entries: dict[str, dict[str, tuple[int, int, str]]] = {}
+        self.pending: list[tuple[str, str, int, int, str]] = []
+        self.seen: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "FileCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _open(self) -> sqlite3.Connection | None:
+        if self.db is None and self.enabled:
+            try:
+                self.db = sqlite3.connect(self.path, timeout=10)
+                self.db.executescript(SCHEMA_SQL)
+            except sqlite3.Error:
+                # 目录只读或缓存文件损坏：退化成不缓存
+                self.enabled = False
+                self.db = None
+        return self.db
+
+    def _entries(self, kind: str) -> dict[str, tuple[int, int, str]]:
+        """同一 kind 的条目第一次用到时一次性读进内存"""
+        if kind not in self.entries:
+            db = self._open()
+            rows = db.execute(
+                "SELECT path, mtime_ns, size, value FROM file_entries WHERE kind = ?", (kind,)
+            ).fetchall() if db else []
+            self.entries[kind] = {path: (mtime_ns, size, value) for path, mtime_ns, size, value in rows}
+        return self.entries[kind]
+
+    def _key(self, path: Path) -> str:
+        # 调用方传的通常就是 root 下的绝对路径，直接切字符串；其他情况再 resolve（符号链接等）
+        text = str(path)
+        prefix = str(self.root) + os.sep
+        if not text.startswith(prefix):
+            text = str(path.resolve())
+            if not text.startswith(prefix):
+                return text
+        return text[len(prefix):].replace(os.sep, "/")
+
+    def get(self, path: Path, kind: str, compute: Callable[[Path], Any], stat: os.stat_result | None = None) -> Any:
+        """文件指纹没变时返回缓存的 compute(path) 结果（JSON 可序列化），否则重新计算并记下"""
+        if not self.enabled:
+            return compute(path)
+
+        stat = stat or path.stat()
+        key = self._key(path)
+        self.seen.add(key)
+        cached = self._entries(kind).get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            self.hits += 1
+            return json.loads(cached[2])
+
+        self.misses += 1
+        value = compute(path)
+        if time.time() - stat.st_mtime_ns / 1e9 > RACY_SECONDS:
+            encoded = json.dumps(value, ensure_ascii=False)
+            self.entries[kind][key] = (stat.st_mtime_ns, stat.st_size, encoded)
+            self.pending.append((key, kind, stat.st_mtime_ns, stat.st_size, encoded))
+        return value
+
+    def close(self) -> None:
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                if self.pending:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO file_entries (path, kind, mtime_ns, size, value) VALUES (?, ?, ?, ?, ?)",
+                        self.pending,
+                    )
+                gone = [
+                    (key, kind)
+                    for kind, entries in self.entries.items()
+                    for key in entries
+                    if key not in self.seen and not (self.root / key).exists()
+                ]
+                if gone:
+                    self.db.executemany("DELETE FROM file_entries WHERE path = ? AND kind = ?", gone)
+        except sqlite3.Error:
+            pass
+        finally:
+            self.db.close()
+            self.db = None
+            self.pending = []
+
+    def stats(self) -> dict[str, Any]:
+        db = self._open()
+        kinds = dict(db.execute("SELECT kind, count(*) FROM file_entries GROUP BY kind").fetchall()) if db else {}
+        return {
+            "path": str(self.path),
+            "enabled": self.enabled,
+            "entries": kinds,
+            "size_bytes": self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+    def clear(self, kind: str | None = None) -> int:
+        db = self._open()
+        if not db:
+            return 0
+        with db:
+            if kind:
+                cur = db.execute("DELETE FROM file_entries WHERE kind = ?", (kind,))
+            else:
+                cur = db.execute("DELETE FROM file_entries")
+        self.entries.clear()
+        return cur.rowcount
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="文件元数据缓存管理")
+    parser.add_argument("--dir", required=True, help="被扫描的目录（缓存文件所在目录）")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--stats", action="store_true", help="查看各 kind 的条目数")
+    group.add_argument("--clear", nargs="?", const="", metavar="KIND", help="清空缓存（可只清某个 kind）")
+    args = parser.parse_args(argv)
+
+    with FileCache(args.dir, enabled=True) as cache:
+        if args.stats:
+            result = cache.stats()
+        else:
+            result = {"cleared": cache.clear(args.clear or None), "kind": args.clear or None}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
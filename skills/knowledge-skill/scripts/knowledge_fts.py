@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "psycopg2-binary",
+#     "python-dotenv",
+# ]
+# ///
+"""
+全文检索（PostgreSQL tsvector + GIN，BM25 式打分）
+代替关键词检索里逐词 `title ILIKE '%w%' OR content ILIKE '%w%'` 的全表扫描。
+
+- 分词：英文/数字按词（查询时前缀匹配），中文连续片段切成相邻二字（bigram）
+- 索引：knowledge_items / memory_cards 各加一列 search_tsv（带词频和字段权重的 tsvector）+ GIN 索引。
+  批量写入（knowledge_bulk）在 Python 里分词后直接写入 search_tsv；
+  其他写入路径由触发器用同一套规则在数据库里补算（慢一些，但不会漏）
+- 打分：Σ idf(词) × ts_rank(词)。ts_rank 负责词频饱和、字段权重（标题 > 摘要/关键词 > 正文）和长度归一，
+  idf 按 BM25 公式从 ANALYZE 收集的高频词统计（pg_stats.most_common_elems）估算，查询时不扫表
+- 未执行迁移、查询里没有可检索的词，或含单个汉字的 token（索引里只有二字 bigram，查不到）时，
+  keyword_clause() 回退到原来的逐词 ILIKE
+
+用法:
+  uv run scripts/knowledge_fts.py --migrate            # 建函数/列/触发器/索引，并回填已有数据
+  uv run scripts/knowledge_fts.py --migrate --rebuild  # 分词规则变更后重算所有行
+  uv run scripts/knowledge_fts.py --tokens "pgvector 向量检索"
+"""
+
+import argparse
+import json
+import operator
+import re
+import sys
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+
+from knowledge_db import DB_CONFIG
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+# 表 → 参与检索的文本列，依次对应权重 A / B / D（与触发器里的表达式一一对应）
+FTS_TABLES = {
+    "knowledge_items": ("title", "ai_summary", "content"),
+    "memory_cards": ("title", "keywords", "summary"),
+}
+FTS_WEIGHTS = ("A", "B", "D")
+
+MAX_TEXT_CHARS = 200000
+MAX_POSITIONS_PER_TERM = 256  # 每列每个词最多记录的词频（tsvector 每个词最多 256 个位置）
+BACKFILL_BATCH = 1000
+
+# 与 knowledge_fts_tokens() 里的正则保持一致
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+|[\u3400-\u9fff\uf900-\ufaff]+")
+_CJK_START = "\u3400"
+
+# 权重 → 词频 n 对应的位置串，如 A 列 n=3 为 "1A,2A,3A"（D 是默认权重，字面量里省略）
+_POSITION_RUNS = {
+    weight: [",".join(f"{base + i}{suffix}" for i in range(n)) for n in range(MAX_POSITIONS_PER_TERM + 1)]
+    for weight, base, suffix in (("A", 1, "A"), ("B", 257, "B"), ("D", 513, ""))
+}
+
+FUNCTIONS_SQL = r"""
+-- 分词（触发器兜底用，规则与 knowledge_fts.tokenize() 相同）：
+-- 英文/数字整词，中文连续片段切成相邻二字，单字片段保留单字
+CREATE OR REPLACE FUNCTION knowledge_fts_tokens(txt text) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(g.tok ORDER BY m.ord, g.i), '{}')
+    FROM regexp_matches(lower(left(coalesce(txt, ''), 200000)),
+                        '[a-z0-9_]+|[\u3400-\u9fff\uf900-\ufaff]+', 'g') WITH ORDINALITY AS m(piece, ord)
+    CROSS JOIN LATERAL (
+        SELECT i, CASE WHEN m.piece[1] ~ '^[a-z0-9_]' THEN m.piece[1] ELSE substr(m.piece[1], i, 2) END AS tok
+        FROM generate_series(1, CASE WHEN m.piece[1] ~ '^[a-z0-9_]' THEN 1
+                                     ELSE greatest(char_length(m.piece[1]) - 1, 1) END) AS i
+    ) g
+$$;
+
+-- 三列的词序列 → tsvector（直接拼字面量，不经过 text search parser，中文不会被再切一次）。
+-- 只记词频不记真实位置：A / B / D 列里第 k 次出现分别记为位置 k / 256+k / 512+k，每列每词最多 256 次。
+-- ts_rank 的 OR 打分只看每个词的出现次数和权重，与位置无关
+CREATE OR REPLACE FUNCTION knowledge_fts_document(a text[], b text[], d text[]) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(lexeme, ' '), '')::tsvector
+    FROM (
+        SELECT '''' || f.tok || ''':' || string_agg(
+                   (SELECT string_agg(p::text || f.suffix, ',')
+                    FROM generate_series(f.base, f.base + least(f.n, 256) - 1) AS p),
+                   ',' ORDER BY f.base) AS lexeme
+        FROM (
+            SELECT tok, count(*) AS n, 1 AS base, 'A' AS suffix FROM unnest(a) AS tok GROUP BY tok
+            UNION ALL
+            SELECT tok, count(*), 257, 'B' FROM unnest(b) AS tok GROUP BY tok
+            UNION ALL
+            SELECT tok, count(*), 513, '' FROM unnest(d) AS tok GROUP BY tok
+        ) f
+        GROUP BY f.tok
+    ) s
+$$;
+
+-- BM25 idf：文档频率 = 库大小 × 高频词统计里的频率；不在统计里的词按最低频率的一半估计
+CREATE OR REPLACE FUNCTION knowledge_fts_idf(tbl text, lexemes text[]) RETURNS float8[]
+LANGUAGE sql STABLE AS $$
+    WITH st AS (
+        SELECT most_common_elems::text::text[] AS elems, most_common_elem_freqs AS freqs
+        FROM pg_stats
+        WHERE schemaname = current_schema() AND tablename = tbl AND attname = 'search_tsv'
+    ), n AS (
+        SELECT greatest(reltuples, 1)::float8 AS n FROM pg_class WHERE oid = to_regclass(tbl)
+    )
+    SELECT array_agg(ln(1 + (n.n - d.df + 0.5) / (d.df + 0.5)) ORDER BY l.ord)
+    FROM unnest(lexemes) WITH ORDINALITY AS l(lexeme, ord)
+    CROSS JOIN n
+    LEFT JOIN st ON true
+    CROSS JOIN LATERAL (
+        SELECT n.n * coalesce(st.freqs[array_position(st.elems, l.lexeme)],
+                              st.freqs[array_length(st.elems, 1) + 1] / 2,
+                              0) AS df
+    ) d
+$$;
+
+-- 打分：Σ idf × ts_rank（权重 {D, C, B, A}，按文档长度的对数归一）。
+-- doc 通常是 TOAST 指针，每次 ts_rank 都会重新取一遍；先用不改任何词的 setweight 复制成内存值，整行只取一次
+CREATE OR REPLACE FUNCTION knowledge_fts_rank(doc tsvector, terms tsquery[], idfs float8[]) RETURNS float8
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+DECLARE
+    score float8 := 0;
+    vec tsvector := setweight(doc, 'D', '{}');
+BEGIN
+    FOR i IN 1 .. coalesce(array_length(terms, 1), 0) LOOP
+        score := score + coalesce(idfs[i], 1) * ts_rank('{0.2, 0.2, 0.5, 1.0}', vec, terms[i], 1);
+    END LOOP;
+    RETURN score;
+END
+$$;
+
+-- 触发器兜底：写入方已经带上 search_tsv，或文本列没变时不重算
+CREATE OR REPLACE FUNCTION knowledge_items_fts_refresh() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW.search_tsv IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+    IF TG_OP = 'UPDATE' AND (
+        NEW.search_tsv IS DISTINCT FROM OLD.search_tsv
+        OR (OLD.search_tsv IS NOT NULL
+            AND NEW.title IS NOT DISTINCT FROM OLD.title
+            AND NEW.ai_summary IS NOT DISTINCT FROM OLD.ai_summary
+            AND NEW.content IS NOT DISTINCT FROM OLD.content)
+    ) THEN
+        RETURN NEW;
+    END IF;
+    NEW.search_tsv := knowledge_fts_document(knowledge_fts_tokens(NEW.title),
+                                             knowledge_fts_tokens(NEW.ai_summary),
+                                             knowledge_fts_tokens(NEW.content));
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION memory_cards_fts_refresh() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW.search_tsv IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+    IF TG_OP = 'UPDATE' AND (
+        NEW.search_tsv IS DISTINCT FROM OLD.search_tsv
+        OR (OLD.search_tsv IS NOT NULL
+            AND NEW.title IS NOT DISTINCT FROM OLD.title
+            AND NEW.keywords IS NOT DISTINCT FROM OLD.keywords
+            AND NEW.summary IS NOT DISTINCT FROM OLD.summary)
+    ) THEN
+        RETURN NEW;
+    END IF;
+    NEW.search_tsv := knowledge_fts_document(knowledge_fts_tokens(NEW.title),
+                                             knowledge_fts_tokens(array_to_string(NEW.keywords, ' ')),
+                                             knowledge_fts_tokens(NEW.summary));
+    RETURN NEW;
+END
+$$;
+"""
+
+TABLE_SQL = """
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector;
+DROP TRIGGER IF EXISTS trg_{table}_fts ON {table};
+CREATE TRIGGER trg_{table}_fts
+    BEFORE INSERT OR UPDATE OF {columns} ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_fts_refresh();
+"""
+
+INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_{table}_search_tsv ON {table} USING GIN(search_tsv)"
+
+# 回填：在 Python 里分词后按批写回（search_tsv 不在触发器的列清单里，不会触发重算）
+BACKFILL_SELECT_SQL = "SELECT id, {columns} FROM {table} WHERE search_tsv IS NULL LIMIT %s"
+BACKFILL_UPDATE_SQL = """
+UPDATE {table} t SET search_tsv = v.search_tsv::tsvector
+FROM (VALUES %s) AS v(id, search_tsv)
+WHERE t.id = v.id::{id_type}
+"""
+ID_TYPES = {"knowledge_items": "int", "memory_cards": "uuid"}
+
+_ready: dict[str, bool] = {}
+
+
+@dataclass
+class KeywordClause:
+    """
+    一段可拼进 SQL 的关键词条件（参数全部为 %(name)s 命名占位，需并入执行参数）
+    where:  匹配条件
+    rank:   相关度表达式，越大越相关（ILIKE 回退时为常量 0，排序退化为原来的次级排序）
+    """
+    where: str
+    rank: str
+    params: dict[str, Any] = field(default_factory=dict)
+
+
+def tokenize(text: str | None) -> list[str]:
+    """英文/数字整词（小写），中文连续片段切成相邻二字；与数据库里的 knowledge_fts_tokens() 一致"""
+    tokens: list[str] = []
+    for piece in _TOKEN_PATTERN.findall((text or "")[:MAX_TEXT_CHARS].lower()):
+        if piece[0] < _CJK_START or len(piece) == 1:
+            tokens.append(piece)
+        else:
+            tokens.extend(map(operator.add, piece, piece[1:]))
+    return tokens
+
+
+def search_vector(table: str, row: dict[str, Any]) -> str:
+    """
+    按 FTS_TABLES 的列和权重，把一行数据编码成 tsvector 字面量（写入时 %s::tsvector），
+    与数据库里 knowledge_fts_document() 的结果一致。
+    """
+    entries: dict[str, list[str]] = defaultdict(list)
+    for column, weight in zip(FTS_TABLES[table], FTS_WEIGHTS):
+        value = row.get(column)
+        if isinstance(value, (list, tuple)):
+            value = " ".join(value)
+        runs = _POSITION_RUNS[weight]
+        for token, tf in Counter(tokenize(value)).items():
+            entries[token].append(runs[min(tf, MAX_POSITIONS_PER_TERM)])
+    return " ".join(f"'{token}':{','.join(parts)}" for token, parts in entries.items())
+
+
+def keyword_words(query: str) -> list[str]:
+    """按空格拆词，丢掉单字符词；全部被丢掉时整句作为一个词"""
+    words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
+    return words or [query]
+
+
+def _tsquery_term(token: str) -> str:
+    # 英文/数字词前缀匹配：embed 命中 embedding
+    return f"'{token}':*" if token[0] < _CJK_START else f"'{token}'"
+
+
+def _single_cjk(token: str) -> bool:
+    """单个汉字：索引里只有 bigram，"向" 在 "方向" 里是第二个字，前缀匹配也查不到"""
+    return len(token) == 1 and token >= _CJK_START
+
+
+def build_tsquery(query: str) -> tuple[str, list[str]]:
+    """
+    查询 → (tsquery 文本, 去重后的 token 列表)。词内各 token AND，词与词之间 OR，
+    与原逐词 ILIKE 的语义一致。查询里没有可检索的词时返回 ("", [])。
+    """
+    word_tokens = [tokens for tokens in (tokenize(w) for w in keyword_words(query)) if tokens]
+    tsquery = " | ".join("(" + " & ".join(_tsquery_term(t) for t in tokens) + ")" for tokens in word_tokens)
+    lexemes = list(dict.fromkeys(token for tokens in word_tokens for token in tokens))
+    return tsquery, lexemes
+
+
+def fts_ready(conn, table: str) -> bool:
+    """表上是否已执行全文检索迁移（结果按进程缓存）"""
+    if table not in _ready:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'search_tsv'
+                ) AND to_regprocedure('knowledge_fts_rank(tsvector,tsquery[],double precision[])') IS NOT NULL
+                """,
+                [table],
+            )
+            _ready[table] = bool(cur.fetchone()[0])
+        finally:
+            cur.close()
+    return _ready[table]
+
+
+def keyword_clause(conn, table: str, query: str, columns: tuple[str, ...]) -> KeywordClause:
+    """
+    生成 table 上的关键词条件。已迁移时走 search_tsv @@ tsquery（GIN）+ 相关度打分；
+    否则（或查询里有单个汉字）回退到 columns 上逐词 ILIKE。
+    """
+    tsquery, lexemes = build_tsquery(query)
+    indexable = lexemes and not any(_single_cjk(t) for t in lexemes)
+    if indexable and table in FTS_TABLES and fts_ready(conn, table):
+        return KeywordClause(
+            where="search_tsv @@ %(fts_query)s::tsquery",
+            # idf 放进标量子查询，整条语句只算一次
+            rank=(f"knowledge_fts_rank(search_tsv, %(fts_terms)s::tsquery[], "
+                  f"(SELECT knowledge_fts_idf('{table}', %(fts_lexemes)s::text[])))"),
+            params={
+                "fts_query": tsquery,
+                "fts_terms": [_tsquery_term(t) for t in lexemes],
+                "fts_lexemes": lexemes,
+            },
+        )
+
+    params: dict[str, Any] = {}
+    word_conditions = []
+    for i, word in enumerate(keyword_words(query)):
+        name = f"{table}_kw{i}"
+        params[name] = f"%{word}%"
+        word_conditions.append("(" + " OR ".join(f"{col} ILIKE %({name})s" for col in columns) + ")")
+    return KeywordClause(where="(" + " OR ".join(word_conditions) + ")", rank="0::float8", params=params)
+
+
+def _backfill(cur, table: str) -> int:
+    columns = FTS_TABLES[table]
+    total = 0
+    while True:
+        cur.execute(BACKFILL_SELECT_SQL.format(table=table, columns=", ".join(columns)), [BACKFILL_BATCH])
+        rows = cur.fetchall()
+        if not rows:
+            return total
+        values = [(str(row[0]), search_vector(table, dict(zip(columns, row[1:])))) for row in rows]
+        psycopg2.extras.execute_values(
+            cur, BACKFILL_UPDATE_SQL.format(table=table, id_type=ID_TYPES[table]), values, page_size=len(values),
+        )
+        total += len(rows)
+        print(f"  backfilled {total} rows", file=sys.stderr)
+
+
+def run_migrate(rebuild: bool = False) -> dict[str, Any]:
+    # DDL 走 autocommit 的独立连接，不占用也不污染连接池
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    try:
+        print("Creating full-text search functions...", file=sys.stderr)
+        cur.execute(FUNCTIONS_SQL)
+
+        tables = {}
+        for table, columns in FTS_TABLES.items():
+            print(f"Adding search_tsv column and trigger to {table}...", file=sys.stderr)
+            cur.execute(TABLE_SQL.format(table=table, columns=", ".join(columns)))
+            if rebuild:
+                cur.execute(f"UPDATE {table} SET search_tsv = NULL")
+
+            backfilled = _backfill(cur, table)
+
+            print(f"Creating GIN index on {table}.search_tsv...", file=sys.stderr)
+            cur.execute(INDEX_SQL.format(table=table))
+            # idf 依赖 ANALYZE 收集的高频词统计
+            cur.execute(f"ANALYZE {table}")
+            tables[table] = {"backfilled": backfilled}
+
+        return {"success": True, "tables": tables, "rebuild": rebuild}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文检索：迁移 / 分词调试")
+    parser.add_argument("--migrate", action="store_true", help="创建分词函数、search_tsv 列、触发器和 GIN 索引，并回填")
+    parser.add_argument("--rebuild", action="store_true", help="与 --migrate 一起用：重算所有行的 search_tsv")
+    parser.add_argument("--tokens", help="查看一段文本的分词结果和对应的 tsquery")
+    args = parser.parse_args()
+
+    if args.migrate:
+        result = run_migrate(rebuild=args.rebuild)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        if not result["success"]:
+            sys.exit(1)
+    elif args.tokens is not None:
+        tsquery, _ = build_tsquery(args.tokens)
+        print(json.dumps({"text": args.tokens, "tokens": tokenize(args.tokens), "tsquery": tsquery},
+                         ensure_ascii=False, indent=2))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "psycopg2-binary",
+#     "python-dotenv",
+#     "requests",
+# ]
+# ///
+"""
+混合检索引擎（knowledge_items 的向量 + 关键词两路召回）
+- 并发：查询 embedding（HTTP）在后台线程里请求，同时主线程先跑关键词查询，网络延迟与数据库耗时重叠
+- 融合：两路结果按倒数排名融合（RRF），score = Σ 权重 / (k + 名次)，不依赖两路分数的量纲
+- 计时：每个阶段的耗时（毫秒）随结果一起返回，CLI 输出在 timings_ms 里
+
+knowledge_search.py --mode hybrid 和 knowledge_export.py 都走这里。
+
+用法:
+  from knowledge_hybrid import hybrid_search
+  hybrid = hybrid_search("RAG 技术", limit=10)
+  hybrid.results, hybrid.timings
+
+环境变量:
+  KNOWLEDGE_RRF_K=60                   RRF 平滑常数，越大名次差异的影响越小
+  KNOWLEDGE_HYBRID_VECTOR_WEIGHT=1.0   向量一路的权重
+  KNOWLEDGE_HYBRID_KEYWORD_WEIGHT=1.0  关键词一路的权重
+"""
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import psycopg2.extras
+from dotenv import load_dotenv
+
+from knowledge_db import Vector, connection, local_backend
+from knowledge_embedding import get_embedding
+from knowledge_fts import keyword_clause
+from knowledge_local_store import get_store
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+RRF_K = int(os.getenv("KNOWLEDGE_RRF_K", "60"))
+VECTOR_WEIGHT = float(os.getenv("KNOWLEDGE_HYBRID_VECTOR_WEIGHT", "1.0"))
+KEYWORD_WEIGHT = float(os.getenv("KNOWLEDGE_HYBRID_KEYWORD_WEIGHT", "1.0"))
+CANDIDATE_FACTOR = 2  # 每一路取 limit × 2 个候选再融合
+
+SEARCH_FIELDS = "id, source_type, source_id, source_url, title, summary, created_at, updated_at, status"
+
+
+@dataclass
+class HybridResult:
+    """融合后的结果（按 rrf_score 降序）和各阶段耗时（毫秒）"""
+    results: list[dict[str, Any]]
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def _timed(fn: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, round((time.perf_counter() - start) * 1000, 2)
+
+
+def rrf_fuse(
+    legs: dict[str, list[dict[str, Any]]],
+    weights: dict[str, float],
+    k: int = RRF_K,
+) -> list[dict[str, Any]]:
+    """
+    倒数排名融合。legs: 路名 → 已按相关度排好序的行（以 id 去重合并）。
+    返回合并后的行，带 rrf_score 和 search_type（命中的路名，两路都命中为 "both"）。
+    """
+    fused: dict[Any, dict[str, Any]] = {}
+    hits: dict[Any, list[str]] = {}
+    for leg, rows in legs.items():
+        weight = weights.get(leg, 1.0)
+        for rank, row in enumerate(rows, start=1):
+            merged = fused.setdefault(row["id"], {"rrf_score": 0.0})
+            for key, value in row.items():
+                merged.setdefault(key, value)
+            merged["rrf_score"] += weight / (k + rank)
+            hits.setdefault(row["id"], []).append(leg)
+    for id_, merged in fused.items():
+        merged["search_type"] = hits[id_][0] if len(hits[id_]) == 1 else "both"
+    # sorted 是稳定排序：同分时保持先到的顺序（向量一路在前）
+    return sorted(fused.values(), key=lambda row: row["rrf_score"], reverse=True)
+
+
+def _keyword_rows(conn, query: str, limit: int, source_type: str | None, active_only: bool,
+                  fields: str, keyword_columns: tuple[str, ...]) -> list[dict[str, Any]]:
+    kw = keyword_clause(conn, "knowledge_items", query, keyword_columns)
+    sql = f"SELECT {fields}, {kw.rank} AS keyword_score FROM knowledge_items WHERE {kw.where}"
+    if active_only:
+        sql += " AND status = 'active'"
+    if source_type:
+        sql += " AND source_type = %(source_type)s"
+    sql += " ORDER BY status = 'active' DESC, keyword_score DESC, created_at DESC LIMIT %(limit)s"
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute(sql, dict(kw.params, source_type=source_type, limit=limit))
+        return [dict(row) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def _vector_rows(conn, embedding: list[float], limit: int, source_type: str | None, active_only: bool,
+                 fields: str) -> list[dict[str, Any]]:
+    sql = f"""
+        WITH q AS (SELECT %(embedding)s AS v)
+        SELECT {fields}, 1 - (embedding <=> q.v) AS similarity
+        FROM knowledge_items, q
+        WHERE embedding IS NOT NULL
+    """
+    if active_only:
+        sql += " AND status = 'active'"
+    if source_type:
+        sql += " AND source_type = %(source_type)s"
+    sql += " ORDER BY embedding <=> q.v LIMIT %(limit)s"
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute(sql, {"embedding": Vector(embedding), "source_type": source_type, "limit": limit})
+        return [dict(row) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def _local_rows(query: str, embedding_future, limit: int, source_type: str | None, active_only: bool,
+                fields: str, keyword_columns: tuple[str, ...], use_keyword: bool,
+                timings: dict[str, float]) -> tuple[list[dict], list[dict]]:
+    """本地后端：同样先跑关键词，再等 embedding 跑向量；列、active_only 过滤与 Postgres 两路一致"""
+    store = get_store()
+    keyword_rows: list[dict[str, Any]] = []
+    if use_keyword:
+        keyword_rows, timings["keyword"] = _timed(
+            store.search_keyword, query, limit, source_type, fields, active_only, keyword_columns,
+        )
+    embedding = None
+    if embedding_future is not None:
+        embedding, timings["embedding"] = embedding_future.result()
+    vector_rows: list[dict[str, Any]] = []
+    if embedding:
+        vector_rows, timings["vector"] = _timed(store.search_vector, embedding, limit, source_type, fields, active_only)
+    return vector_rows, keyword_rows
+
+
+def hybrid_search(
+    query: str,
+    limit: int = 10,
+    source_type: str | None = None,
+    *,
+    active_only: bool = False,
+    fields: str = SEARCH_FIELDS,
+    keyword_columns: tuple[str, ...] = ("title", "content"),
+    vector_weight: float = VECTOR_WEIGHT,
+    keyword_weight: float = KEYWORD_WEIGHT,
+    rrf_k: int = RRF_K,
+    legs: tuple[str, ...] = ("vector", "keyword"),
+) -> HybridResult:
+    """
+    向量 + 关键词混合检索。fields 是两路查询共同 SELECT 的列（需含 id；本地后端上须是 SQLite 能执行的表达式）；
+    没有 embedding（未配置 key / 请求失败）时只剩关键词一路。
+    legs 只给一路时（("keyword",) / ("vector",)）不发另一路的请求，结果按该路名次排序，字段与混合时一致。
+    每行附带 similarity（向量一路的余弦相似度）、keyword_score（关键词相关度）、rrf_score、search_type。
+    """
+    start = time.perf_counter()
+    timings: dict[str, float] = {}
+    candidates = limit * CANDIDATE_FACTOR
+    use_keyword = "keyword" in legs
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        # embedding 请求与关键词查询并发，等关键词查完再取结果；
+        # 带上调用方的 contextvars 上下文，在守护进程里输出归到当前请求
+        embedding_future = None
+        if "vector" in legs:
+            embedding_future = pool.submit(contextvars.copy_context().run, _timed, get_embedding, query)
+        if local_backend():
+            vector_rows, keyword_rows = _local_rows(query, embedding_future, candidates, source_type, active_only,
+                                                    fields, keyword_columns, use_keyword, timings)
+        else:
+            with connection() as conn:
+                keyword_rows = []
+                if use_keyword:
+                    keyword_rows, timings["keyword"] = _timed(
+                        _keyword_rows, conn, query, candidates, source_type, active_only, fields, keyword_columns,
+                    )
+                embedding = None
+                if embedding_future is not None:
+                    embedding, timings["embedding"] = embedding_future.result()
+                vector_rows = []
+                if embedding:
+                    vector_rows, timings["vector"] = _timed(
+                        _vector_rows, conn, embedding, candidates, source_type, active_only, fields,
+                    )
+
+    fuse_start = time.perf_counter()
+    results = rrf_fuse(
+        {"vector": vector_rows, "keyword": keyword_rows},
+        {"vector": vector_weight, "keyword": keyword_weight},
+        k=rrf_k,
+    )[:limit]
+    for row in results:
+        row.setdefault("similarity", None)
+        row.setdefault("keyword_score", None)
+    timings["fusion"] = round((time.perf_counter() - fuse_start) * 1000, 2)
+    timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+    return HybridResult(results=results, timings=timings)
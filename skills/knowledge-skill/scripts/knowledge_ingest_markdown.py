@@ -20,7 +20,7 @@ from typing import Any
 
 import yaml
 
-from knowledge_save import save_knowledge
+from knowledge_save import save_knowledge_many
 
 REPO_ROOT = Path(__file__).resolve().parents[3]
 REPO_BLOB_BASE = "https://github.com/hwj123hwj/custom-skills/blob/main"
@@ -160,43 +160,35 @@ def prepare_markdown_doc(path_str: str) -> dict[str, Any]:
 
 
 def ingest_markdown_docs(paths: list[str], dry_run: bool = False) -> list[dict[str, Any]]:
-    results: list[dict[str, Any]] = []
-    for path in paths:
-        payload = prepare_markdown_doc(path)
-        if dry_run:
+    payloads = [prepare_markdown_doc(path) for path in paths]
+    if dry_run:
+        for payload in payloads:
             payload["content_length"] = len(payload["content"])
-            results.append(payload)
-            continue
+        return payloads
 
-        saved = save_knowledge(
-            source_type=payload["source_type"],
-            source_id=payload["source_id"],
-            title=payload["title"],
-            content=payload["content"],
-            source_url=payload["source_url"],
-            metadata=payload["metadata"],
-            ai_summary=payload.get("ai_summary"),
-        )
+    saved = save_knowledge_many(payloads)
+    results: list[dict[str, Any]] = []
+    for payload, result in zip(payloads, saved):
         results.append(
             {
                 "path": payload["source_id"],
                 "title": payload["title"],
-                "success": saved.get("success", False),
-                "id": saved.get("id"),
-                "ai_summary": saved.get("ai_summary"),
-                "has_embedding": saved.get("has_embedding"),
-                "error": saved.get("error"),
+                "success": result.get("success", False),
+                "id": result.get("id"),
+                "ai_summary": result.get("ai_summary"),
+                "has_embedding": result.get("has_embedding"),
+                "error": result.get("error"),
             }
         )
     return results
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="把 Markdown 文档导入知识池")
     parser.add_argument("--path", action="append", required=True, help="Markdown 路径，可重复传入")
     parser.add_argument("--dry-run", action="store_true", help="只解析，不写入数据库")
     parser.add_argument("--output", choices=["json"], default="json")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     results = ingest_markdown_docs(paths=args.path, dry_run=args.dry_run)
     print(json.dumps(results, ensure_ascii=False, indent=2))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "python-dotenv",
+#     "requests",
+# ]
+# ///
+"""
+LLM 调用的公共层（OpenAI 兼容的 /chat/completions，默认龙猫）
+- chat_completion: 单次调用，429 / 5xx / 网络错误按指数退避重试（优先遵守 Retry-After）
+- map_ordered: 有界并发地批量执行摘要等 LLM 任务，结果按输入顺序返回
+- imap_ordered: 同上，但边算边按输入顺序产出，调用方可以拿到一条处理一条（流水线）
+- 全进程共享一个信号量，同时在途的请求数不超过 LLM_MAX_IN_FLIGHT；可选按 LLM_MAX_RPM 限制每分钟请求数
+
+用法:
+  from knowledge_llm import chat_completion, map_ordered
+  text = chat_completion(prompt, api_key=key, base_url=url, model="LongCat-Flash-Lite")
+  summaries = map_ordered(lambda item: summarize(item), items)
+  for item, summary in zip(items, imap_ordered(summarize, items)):
+      ...  # 顺序消费，后面的请求仍在并发进行
+
+环境变量:
+  LLM_MAX_IN_FLIGHT=4      同时在途的 LLM 请求上限
+  LLM_MAX_RPM=0            每分钟最多发出的请求数（含重试），0 表示不限
+  LLM_MAX_RETRIES=4        429 / 5xx 的最大重试次数
+  LLM_BACKOFF_BASE=1.0     退避基数（秒），第 n 次重试等待 base * 2^n（带随机抖动，最长 60 秒）
+"""
+
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+LLM_MAX_IN_FLIGHT = max(1, int(os.getenv("LLM_MAX_IN_FLIGHT", "4")))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_MAX_RPM = float(os.getenv("LLM_MAX_RPM", "0"))
+LLM_BACKOFF_MAX = 60.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_in_flight = threading.BoundedSemaphore(LLM_MAX_IN_FLIGHT)
+
+
+class _RateLimiter:
+    """按固定间隔发放请求名额（60 / rpm 秒一个），多线程共享；rpm <= 0 时不限速"""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = _RateLimiter(LLM_MAX_RPM)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _retry_delay(attempt: int, response: requests.Response | None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+    delay = LLM_BACKOFF_BASE * (2 ** attempt)
+    return min(delay * random.uniform(0.5, 1.5), LLM_BACKOFF_MAX)
+
+
+def chat_completion(
+    prompt: str,
+    *,
+    api_key: str,
+    base_url: str,
+    model: str,
+    max_tokens: int = 300,
+    temperature: float = 0.3,
+    timeout: int = 30,
+) -> str:
+    """调用一次 chat/completions，返回回复文本；重试耗尽后抛出最后一次的异常"""
+    attempt = 0
+    while True:
+        response = None
+        try:
+            with _in_flight:
+                _rate_limiter.wait()
+                response = requests.post(
+                    f"{base_url}/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {api_key}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "max_tokens": max_tokens,
+                        "temperature": temperature,
+                    },
+                    timeout=timeout,
+                )
+            if response.status_code in RETRYABLE_STATUS and attempt < LLM_MAX_RETRIES:
+                raise requests.HTTPError(f"{response.status_code} from LLM API", response=response)
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"].strip()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = response.status_code if response is not None else None
+            retryable = status is None or status in RETRYABLE_STATUS
+            if not retryable or attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt, response)
+            print(f"LLM request failed ({e}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
+            attempt += 1
+
+
+def _submit(pool: ThreadPoolExecutor, fn: Callable[[T], R], item: T) -> Future:
+    """在调用方的 contextvars 上下文里执行 fn（常驻守护进程据此把工作线程的输出归到当前请求）"""
+    return pool.submit(contextvars.copy_context().run, fn, item)
+
+
+def map_ordered(fn: Callable[[T], R], items: Iterable[T], max_workers: int = LLM_MAX_IN_FLIGHT) -> list[R]:
+    """有界并发地对每个元素执行 fn，结果按输入顺序返回；fn 自己负责兜底，异常会直接抛出"""
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = [_submit(pool, fn, item) for item in items]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def imap_ordered(fn: Callable[[T], R], items: Iterable[T], max_workers: int = LLM_MAX_IN_FLIGHT) -> Iterator[R]:
+    """
+    有界并发地对每个元素执行 fn，按输入顺序逐个产出结果：调用方处理第 i 个结果时，后面的任务仍在并发执行。
+    最多提前提交 2 × max_workers 个任务；调用方提前停止（break / 异常）时取消尚未开始的任务。
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        window = deque()
+        try:
+            for item in items:
+                window.append(_submit(pool, fn, item))
+                if len(window) >= 2 * max_workers:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+        finally:
+            for future in window:
+                future.cancel()
@@ -0,0 +1,771 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "python-dotenv",
+# ]
+# ///
+"""
+嵌入式本地存储后端（不需要 PostgreSQL）
+KNOWLEDGE_BACKEND=sqlite 时，检索 / 入库 / 整理 / 压缩都走这里，笔记本、CI、离线环境都能跑。
+
+存储布局（默认 skills/knowledge-skill/.local-store/）:
+  knowledge.sqlite3        knowledge_items / memory_cards 两张表，字段与 Postgres 版一致；
+                           数组、metadata 存 JSON 文本，时间存 'YYYY-MM-DD HH:MM:SS.ffffff'
+                           FTS5（trigram 分词）外部内容表做关键词检索，触发器自动同步
+  knowledge_items.f32      embedding 矩阵，np.memmap 映射的连续 float32 文件（行已归一化）
+  memory_cards.f32         同上；表里的 vec_row 列指向矩阵中的行号，删除卡片空出的行记在 free_vec_rows 里，
+                           新向量优先复用
+
+向量检索是精确的平铺扫描（一次矩阵-向量乘法），结果与 pgvector 的精确扫描一致。
+关键词检索的语义与 Postgres 版的 ILIKE '%词%' 相同：≥3 字的词走 FTS5 trigram 索引，
+更短的词（中文双字词很常见）退回 LIKE 扫描。
+
+用法:
+  KNOWLEDGE_BACKEND=sqlite uv run scripts/memory_recall.py --query "Agent"
+  uv run scripts/knowledge_local_store.py --stats
+
+环境变量:
+  KNOWLEDGE_BACKEND=sqlite        启用本地后端（默认 postgres）
+  KNOWLEDGE_LOCAL_DIR=...         本地存储目录
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+from dotenv import load_dotenv
+
+SKILL_DIR = Path(__file__).parent.parent
+load_dotenv(SKILL_DIR / ".env")
+
+LOCAL_DIR = Path(os.getenv("KNOWLEDGE_LOCAL_DIR", str(SKILL_DIR / ".local-store")))
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS store_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS free_vec_rows (
+    table_name TEXT NOT NULL,
+    vec_row    INTEGER NOT NULL,
+    PRIMARY KEY (table_name, vec_row)
+);
+
+CREATE TABLE IF NOT EXISTS knowledge_items (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_type TEXT NOT NULL,
+    source_id   TEXT NOT NULL,
+    source_url  TEXT,
+    title       TEXT NOT NULL,
+    content     TEXT,
+    summary     TEXT,
+    ai_summary  TEXT,
+    metadata    TEXT DEFAULT '{}',
+    status      TEXT DEFAULT 'active',
+    vec_row     INTEGER,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    UNIQUE (source_type, source_id)
+);
+CREATE INDEX IF NOT EXISTS idx_knowledge_items_created ON knowledge_items(created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_items_fts USING fts5(
+    title, content, content='knowledge_items', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS knowledge_items_ai AFTER INSERT ON knowledge_items BEGIN
+    INSERT INTO knowledge_items_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_items_ad AFTER DELETE ON knowledge_items BEGIN
+    INSERT INTO knowledge_items_fts(knowledge_items_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_items_au AFTER UPDATE OF title, content ON knowledge_items BEGIN
+    INSERT INTO knowledge_items_fts(knowledge_items_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO knowledge_items_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+
+CREATE TABLE IF NOT EXISTS memory_cards (
+    id               TEXT PRIMARY KEY,
+    layer            INTEGER NOT NULL DEFAULT 2,
+    title            TEXT NOT NULL,
+    summary          TEXT NOT NULL,
+    keywords         TEXT DEFAULT '[]',
+    context_tags     TEXT DEFAULT '[]',
+    valid_from       TEXT,
+    valid_until      TEXT,
+    source_item_ids  TEXT DEFAULT '[]',
+    related_card_ids TEXT DEFAULT '[]',
+    vec_row          INTEGER,
+    access_count     INTEGER DEFAULT 0,
+    last_accessed    TEXT,
+    confidence       REAL DEFAULT 0.8,
+    created_at       TEXT NOT NULL,
+    updated_at       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memory_cards_layer ON memory_cards(layer);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS memory_cards_fts USING fts5(
+    title, summary, content='memory_cards', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS memory_cards_ai AFTER INSERT ON memory_cards BEGIN
+    INSERT INTO memory_cards_fts(rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS memory_cards_ad AFTER DELETE ON memory_cards BEGIN
+    INSERT INTO memory_cards_fts(memory_cards_fts, rowid, title, summary)
+    VALUES ('delete', old.rowid, old.title, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS memory_cards_au AFTER UPDATE OF title, summary ON memory_cards BEGIN
+    INSERT INTO memory_cards_fts(memory_cards_fts, rowid, title, summary)
+    VALUES ('delete', old.rowid, old.title, old.summary);
+    INSERT INTO memory_cards_fts(rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+END;
+"""
+
+ITEM_SEARCH_FIELDS = "id, source_type, source_id, source_url, title, summary, created_at, updated_at, status"
+ITEM_RECALL_FIELDS = "id, source_type, source_id, source_url, title, ai_summary, summary, created_at"
+CARD_FIELDS = (
+    "id, layer, title, summary, keywords, context_tags, valid_from, valid_until, "
+    "source_item_ids, confidence, access_count, created_at"
+)
+
+_JSON_FIELDS = {"metadata", "keywords", "context_tags", "source_item_ids", "related_card_ids"}
+_TIME_FIELDS = {"created_at", "updated_at", "valid_from", "valid_until", "last_accessed"}
+
+
+def _now() -> str:
+    return datetime.now().strftime(TIME_FORMAT)
+
+
+def _days_ago(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).strftime(TIME_FORMAT)
+
+
+def _decode_row(row: sqlite3.Row) -> dict[str, Any]:
+    """JSON 列还原成 list / dict，时间列还原成 datetime，和 psycopg2 返回的类型对齐"""
+    result: dict[str, Any] = {}
+    for key in row.keys():
+        value = row[key]
+        if key in _JSON_FIELDS and isinstance(value, str):
+            value = json.loads(value)
+        elif key in _TIME_FIELDS and isinstance(value, str):
+            value = datetime.strptime(value, TIME_FORMAT)
+        result[key] = value
+    return result
+
+
+def _query_words(query: str) -> list[str]:
+    """与 Postgres 版一致：按空格分词，丢掉单字，全被丢掉时整句作为一个词"""
+    words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
+    return words or [query]
+
+
+class _VectorFile:
+    """按行追加的 float32 向量文件（np.memmap），容量按倍数增长"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.dim = 0
+        self._mm: np.memmap | None = None
+
+    def _open(self, dim: int, rows: int) -> None:
+        capacity = max(1024, rows)
+        if self.path.exists():
+            capacity = max(capacity, self.path.stat().st_size // (4 * dim))
+        needed = capacity * dim * 4
+        if not self.path.exists() or self.path.stat().st_size < needed:
+            with open(self.path, "ab") as f:
+                f.truncate(needed)
+        self.dim = dim
+        self._mm = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+    def attach(self, dim: int) -> None:
+        if dim and self._mm is None:
+            self._open(dim, 0)
+
+    def refresh(self, dim: int, used_rows: int) -> None:
+        """
+        其他进程追加后文件可能已经变长：已用行数或文件大小超出当前映射时重新映射，
+        长驻进程（守护进程、进程内 eval）读向量前调用
+        """
+        if self._mm is None:
+            if dim and used_rows:
+                self._open(dim, used_rows)
+            return
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if used_rows > len(self._mm) or size > self._mm.nbytes:
+            self._mm.flush()
+            self._open(self.dim, used_rows)
+
+    def write(self, row: int, vector: np.ndarray) -> None:
+        if self._mm is None:
+            self._open(len(vector), row + 1)
+        elif row >= len(self._mm):
+            capacity = max(row + 1, len(self._mm) * 2)
+            self._mm.flush()
+            self._open(self.dim, capacity)
+        self._mm[row] = vector
+
+    def read(self, rows: Iterable[int]) -> np.ndarray:
+        return np.asarray(self._mm[list(rows)]) if self._mm is not None else np.zeros((0, self.dim), dtype=np.float32)
+
+    def similarities(self, query: np.ndarray, used_rows: int) -> np.ndarray:
+        """对前 used_rows 行做一次矩阵-向量乘法"""
+        if self._mm is None or used_rows == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._mm[:used_rows] @ query
+
+    def flush(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+
+
+class LocalStore:
+    """SQLite + memmap 的本地存储，接口按调用方（search / recall / save / organize / compress）的需要组织"""
+
+    def __init__(self, directory: Path = LOCAL_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(str(self.directory / "knowledge.sqlite3"), check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA_SQL)
+        self.vectors = {
+            "knowledge_items": _VectorFile(self.directory / "knowledge_items.f32"),
+            "memory_cards": _VectorFile(self.directory / "memory_cards.f32"),
+        }
+        for table, vectors in self.vectors.items():
+            vectors.attach(int(self._meta(f"{table}.dim", "0")))
+
+    # ── 内部工具 ──
+
+    def _meta(self, key: str, default: str) -> str:
+        row = self.db.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self.db.execute(
+            "INSERT INTO store_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN … COMMIT；出错（含 KeyboardInterrupt）时 ROLLBACK，不把连接留在打开的事务里"""
+        self.db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def _free_vector(self, table: str, vec_row: int | None) -> None:
+        """行被删除后空出的 vec_row 记下来，由 _store_vector 复用（随当前事务提交 / 回滚）"""
+        if vec_row is not None:
+            self.db.execute("INSERT OR IGNORE INTO free_vec_rows (table_name, vec_row) VALUES (?, ?)", (table, vec_row))
+
+    def _used_rows(self, table: str) -> int:
+        return int(self._meta(f"{table}.rows", "0"))
+
+    def _refresh_vectors(self, table: str) -> int:
+        """按库里记录的维度 / 行数同步本进程的映射（可能是别的进程写的），返回已用行数"""
+        used_rows = self._used_rows(table)
+        self.vectors[table].refresh(int(self._meta(f"{table}.dim", "0")), used_rows)
+        return used_rows
+
+    def _store_vector(self, table: str, vec_row: int | None, embedding: Any) -> int | None:
+        """写入（或原地覆盖）一行向量，返回 vec_row；新向量优先复用空出的行，embedding 为空返回 None"""
+        if embedding is None or len(embedding) == 0:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector = vector / norm
+        vectors = self.vectors[table]
+        if vectors.dim and len(vector) != vectors.dim:
+            raise ValueError(f"expected {vectors.dim} dimensions, not {len(vector)}")
+        if vec_row is None:
+            free = self.db.execute(
+                """
+                DELETE FROM free_vec_rows
+                WHERE table_name = ? AND vec_row = (SELECT min(vec_row) FROM free_vec_rows WHERE table_name = ?)
+                RETURNING vec_row
+                """,
+                (table, table),
+            ).fetchone()
+            if free:
+                vec_row = free[0]
+            else:
+                vec_row = self._used_rows(table)
+                self._set_meta(f"{table}.rows", vec_row + 1)
+        vectors.write(vec_row, vector)
+        self._set_meta(f"{table}.dim", vectors.dim)
+        return vec_row
+
+    def _vector_top(self, table: str, key: str, embedding: list[float], where: str, params: list[Any], limit: int) -> list[tuple[Any, float]]:
+        """在满足 where 的行里按余弦相似度取前 limit 个，返回 [(key, similarity)]"""
+        if limit <= 0:
+            return []
+        used_rows = self._refresh_vectors(table)
+        vectors = self.vectors[table]
+        if not vectors.dim:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query = query / norm
+        candidates = self.db.execute(
+            f"SELECT {key}, vec_row FROM {table} WHERE vec_row IS NOT NULL AND {where}", params
+        ).fetchall()
+        if not candidates:
+            return []
+        sims_all = vectors.similarities(query, used_rows)
+        keys = [row[0] for row in candidates]
+        sims = sims_all[np.fromiter((row[1] for row in candidates), dtype=np.int64, count=len(candidates))]
+        top = np.argsort(-sims, kind="stable")[:limit]
+        return [(keys[i], float(sims[i])) for i in top]
+
+    def _keyword_clause(self, fts_table: str, key: str, columns: tuple[str, str], query: str,
+                        extra_columns: tuple[str, ...] = ()) -> tuple[str, list[Any]]:
+        """
+        (col1 ILIKE %w% OR col2 ILIKE %w%) OR ... 的等价条件；≥3 字走 FTS5 trigram。
+        extra_columns 是 FTS 表之外也要匹配的列（如 ai_summary），逐词 LIKE
+        """
+        conditions: list[str] = []
+        params: list[Any] = []
+        for word in _query_words(query):
+            if len(word) >= 3:
+                conditions.append(f"{key} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)")
+                params.append('"' + word.replace('"', '""') + '"')
+            else:
+                conditions.append(f"({columns[0]} LIKE ? OR {columns[1]} LIKE ?)")
+                params.extend([f"%{word}%", f"%{word}%"])
+            for column in extra_columns:
+                conditions.append(f"{column} LIKE ?")
+                params.append(f"%{word}%")
+        return "(" + " OR ".join(conditions) + ")", params
+
+    def _fetch_by_keys(self, table: str, key: str, fields: str, scored: list[tuple[Any, float]]) -> list[dict[str, Any]]:
+        if not scored:
+            return []
+        placeholders = ",".join("?" * len(scored))
+        rows = {
+            row[key]: _decode_row(row)
+            for row in self.db.execute(f"SELECT {fields} FROM {table} WHERE {key} IN ({placeholders})", [k for k, _ in scored])
+        }
+        results = []
+        for k, similarity in scored:
+            row = rows[k]
+            row["similarity"] = similarity
+            results.append(row)
+        return results
+
+    # ── knowledge_items ──
+
+    def upsert_knowledge_many(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """与 knowledge_bulk.bulk_upsert_knowledge 相同的输入输出"""
+        results: list[dict[str, Any]] = []
+        with self._lock:
+            with self._transaction():
+                for row in rows:
+                    self.db.execute("SAVEPOINT item")
+                    try:
+                        now = _now()
+                        saved = self.db.execute(
+                            """
+                            INSERT INTO knowledge_items
+                            (source_type, source_id, source_url, title, content, summary, ai_summary, metadata,
+                             created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT (source_type, source_id) DO UPDATE
+                            SET title = excluded.title,
+                                content = excluded.content,
+                                summary = excluded.summary,
+                                ai_summary = excluded.ai_summary,
+                                metadata = excluded.metadata,
+                                updated_at = excluded.updated_at
+                            RETURNING id, created_at, vec_row
+                            """,
+                            (
+                                row["source_type"], row["source_id"], row.get("source_url"), row["title"],
+                                row["content"], row.get("summary"), row.get("ai_summary"),
+                                json.dumps(row.get("metadata") or {}, ensure_ascii=False), now, now,
+                            ),
+                        ).fetchone()
+                        vec_row = self._store_vector("knowledge_items", saved["vec_row"], row.get("embedding"))
+                        if vec_row is None:
+                            self._free_vector("knowledge_items", saved["vec_row"])
+                        self.db.execute("UPDATE knowledge_items SET vec_row = ? WHERE id = ?", (vec_row, saved["id"]))
+                        self.db.execute("RELEASE item")
+                        results.append({
+                            "success": True,
+                            "id": str(saved["id"]),
+                            "created_at": datetime.strptime(saved["created_at"], TIME_FORMAT).isoformat(),
+                        })
+                    except Exception as e:
+                        self.db.execute("ROLLBACK TO item")
+                        self.db.execute("RELEASE item")
+                        results.append({"success": False, "error": str(e)})
+            self.vectors["knowledge_items"].flush()
+        return results
+
+    def existing_knowledge_keys(self, keys: list[tuple[str, str]]) -> set[tuple[str, str]]:
+        """与 knowledge_bulk.existing_knowledge_keys 相同；分块是为了不超过 SQLite 的参数个数上限"""
+        found: set[tuple[str, str]] = set()
+        for start in range(0, len(keys), 400):
+            chunk = keys[start:start + 400]
+            rows = self.db.execute(
+                "SELECT source_type, source_id FROM knowledge_items "
+                f"WHERE (source_type, source_id) IN (VALUES {', '.join(['(?, ?)'] * len(chunk))})",
+                [value for key in chunk for value in key],
+            )
+            found.update((row["source_type"], row["source_id"]) for row in rows)
+        return found
+
+    def search_keyword(self, query: str, limit: int = 10, source_type: str | None = None,
+                       fields: str = ITEM_SEARCH_FIELDS, active_only: bool = False,
+                       keyword_columns: tuple[str, ...] = ("title", "content")) -> list[dict[str, Any]]:
+        """fields / active_only / keyword_columns 与 knowledge_hybrid 的 Postgres 查询含义相同，过滤都在 LIMIT 之前"""
+        extra_columns = tuple(column for column in keyword_columns if column not in ("title", "content"))
+        clause, params = self._keyword_clause("knowledge_items_fts", "id", ("title", "content"), query, extra_columns)
+        sql = f"SELECT {fields} FROM knowledge_items WHERE {clause}"
+        if active_only:
+            sql += " AND status = 'active'"
+        if source_type:
+            sql += " AND source_type = ?"
+            params.append(source_type)
+        sql += " ORDER BY (status = 'active') DESC, created_at DESC LIMIT ?"
+        params.append(limit)
+        return [_decode_row(row) for row in self.db.execute(sql, params)]
+
+    def search_vector(self, embedding: list[float], limit: int = 10, source_type: str | None = None,
+                      fields: str = ITEM_SEARCH_FIELDS.replace(", status", ""),
+                      active_only: bool = False) -> list[dict[str, Any]]:
+        clauses, params = ["1 = 1"], []
+        if active_only:
+            clauses.append("status = 'active'")
+        if source_type:
+            clauses.append("source_type = ?")
+            params.append(source_type)
+        scored = self._vector_top("knowledge_items", "id", embedding, " AND ".join(clauses), params, limit)
+        return self._fetch_by_keys("knowledge_items", "id", fields, scored)
+
+    def iter_knowledge(self, fields: str, source_type: str | None = None, days: int | None = None,
+                       active_only: bool = True) -> Iterator[dict[str, Any]]:
+        """按 created_at 倒序逐行产出 knowledge_items（SQLite 游标本身就是流式的，不一次取完）"""
+        sql = f"SELECT {fields} FROM knowledge_items WHERE 1 = 1"
+        params: list[Any] = []
+        if active_only:
+            sql += " AND status = 'active'"
+        if source_type:
+            sql += " AND source_type = ?"
+            params.append(source_type)
+        if days is not None:
+            sql += " AND created_at >= ?"
+            params.append(_days_ago(days))
+        for row in self.db.execute(sql + " ORDER BY created_at DESC, id DESC", params):
+            yield _decode_row(row)
+
+    def recall_l3(self, embedding: list[float], limit: int) -> list[dict[str, Any]]:
+        scored = self._vector_top("knowledge_items", "id", embedding, "status = 'active'", [], limit)
+        return self._fetch_by_keys("knowledge_items", "id", ITEM_RECALL_FIELDS, scored)
+
+    def recall_l3_keyword(self, query: str, limit: int) -> list[dict[str, Any]]:
+        clause, params = self._keyword_clause("knowledge_items_fts", "id", ("title", "content"), query)
+        params.append(limit)
+        return [_decode_row(row) for row in self.db.execute(
+            f"""
+            SELECT {ITEM_RECALL_FIELDS} FROM knowledge_items
+            WHERE {clause} AND status = 'active'
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            params,
+        )]
+
+    def fetch_organize_candidates(
+        self,
+        limit: int,
+        source_type: str | None,
+        min_content_length: int,
+        min_ai_summary_length: int,
+    ) -> list[dict[str, Any]]:
+        """memory_organize.fetch_candidates 的本地版本"""
+        params: list[Any] = [min_ai_summary_length, min_content_length]
+        sql = """
+            SELECT ki.id, ki.source_type, ki.source_id, ki.source_url,
+                   ki.title, ki.content, ki.ai_summary, ki.summary,
+                   ki.metadata, ki.created_at
+            FROM knowledge_items ki
+            WHERE ki.status = 'active'
+              AND ki.ai_summary IS NOT NULL
+              AND length(ki.ai_summary) >= ?
+              AND length(ki.content) >= ?
+              AND ki.vec_row IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM memory_cards mc, json_each(mc.source_item_ids) j
+                  WHERE j.value = CAST(ki.id AS TEXT)
+              )
+        """
+        if source_type:
+            sql += " AND ki.source_type = ?"
+            params.append(source_type)
+        sql += " ORDER BY ki.created_at DESC LIMIT ?"
+        params.append(limit)
+        return [_decode_row(row) for row in self.db.execute(sql, params)]
+
+    # ── memory_cards ──
+
+    def insert_cards(self, cards: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """与 knowledge_bulk.bulk_insert_memory_cards 相同的输入输出"""
+        results: list[dict[str, Any]] = []
+        with self._lock:
+            with self._transaction():
+                for card in cards:
+                    card.setdefault("id", str(uuid.uuid4()))
+                    self.db.execute("SAVEPOINT card")
+                    try:
+                        now = _now()
+                        vec_row = self._store_vector("memory_cards", None, card.get("embedding"))
+                        self.db.execute(
+                            """
+                            INSERT INTO memory_cards
+                            (id, layer, title, summary, keywords, context_tags, valid_from, valid_until,
+                             source_item_ids, vec_row, confidence, created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            """,
+                            (
+                                card["id"], card.get("layer", 2), card["title"], card["summary"],
+                                json.dumps(card.get("keywords") or [], ensure_ascii=False),
+                                json.dumps(card.get("context_tags") or [], ensure_ascii=False),
+                                now, card.get("valid_until"),
+                                json.dumps(card.get("source_item_ids") or [], ensure_ascii=False),
+                                vec_row, card.get("confidence", 0.8), now, now,
+                            ),
+                        )
+                        self.db.execute("RELEASE card")
+                        results.append({
+                            "success": True,
+                            "id": card["id"],
+                            "created_at": datetime.strptime(now, TIME_FORMAT).isoformat(),
+                        })
+                    except Exception as e:
+                        self.db.execute("ROLLBACK TO card")
+                        self.db.execute("RELEASE card")
+                        results.append({"success": False, "error": str(e)})
+            self.vectors["memory_cards"].flush()
+        return results
+
+    def card_vectors(self, where: str = "1 = 1", params: list[Any] | None = None) -> list[tuple[str, np.ndarray]]:
+        """[(card id, 归一化向量)]，按 created_at 升序"""
+        self._refresh_vectors("memory_cards")
+        rows = self.db.execute(
+            f"SELECT id, vec_row FROM memory_cards WHERE vec_row IS NOT NULL AND {where} ORDER BY created_at ASC",
+            params or [],
+        ).fetchall()
+        matrix = self.vectors["memory_cards"].read(row["vec_row"] for row in rows)
+        return [(row["id"], matrix[i]) for i, row in enumerate(rows)]
+
+    def recall_l1_keyword(self, query: str, context_tags: list[str] | None, limit: int) -> list[dict[str, Any]]:
+        clause, params = self._keyword_clause("memory_cards_fts", "rowid", ("title", "summary"), query)
+        conditions = ["layer = 1", "(valid_until IS NULL OR valid_until > ?)"]
+        condition_params: list[Any] = [_now()]
+        for tag in context_tags or []:
+            conditions.append("EXISTS (SELECT 1 FROM json_each(context_tags) WHERE value = ?)")
+            condition_params.append(tag)
+        conditions.append(clause)
+        return [_decode_row(row) for row in self.db.execute(
+            f"""
+            SELECT {CARD_FIELDS} FROM memory_cards
+            WHERE {' AND '.join(conditions)}
+            ORDER BY CASE WHEN valid_until IS NOT NULL THEN 0 ELSE 1 END,
+                     access_count DESC,
+                     created_at DESC
+            LIMIT ?
+            """,
+            condition_params + params + [limit],
+        )]
+
+    def recall_l2_vector(self, embedding: list[float], limit: int) -> list[dict[str, Any]]:
+        scored = self._vector_top("memory_cards", "id", embedding, "layer = 2", [], limit)
+        return self._fetch_by_keys("memory_cards", "id", CARD_FIELDS, scored)
+
+    def recall_l2_keyword(self, query: str, limit: int) -> list[dict[str, Any]]:
+        clause, params = self._keyword_clause("memory_cards_fts", "rowid", ("title", "summary"), query)
+        return [_decode_row(row) for row in self.db.execute(
+            f"""
+            SELECT {CARD_FIELDS} FROM memory_cards
+            WHERE layer = 2 AND {clause}
+            ORDER BY access_count DESC, created_at DESC
+            LIMIT ?
+            """,
+            params + [limit],
+        )]
+
+    def update_access_stats(self, card_ids: list[str]) -> None:
+        if not card_ids:
+            return
+        now = _now()
+        with self._lock:
+            self.db.executemany(
+                "UPDATE memory_cards SET access_count = access_count + 1, last_accessed = ?, updated_at = ? WHERE id = ?",
+                [(now, now, card_id) for card_id in card_ids],
+            )
+
+    def generation(self) -> int:
+        """召回缓存的代数（见 memory_recall_cache.py）"""
+        return int(self._meta("memory.generation", "0"))
+
+    def bump_generation(self) -> int:
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO store_meta (key, value) VALUES ('memory.generation', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            return self.generation()
+
+    def expired_l1(self, expire_days: int) -> list[dict[str, Any]]:
+        return [_decode_row(row) for row in self.db.execute(
+            """
+            SELECT id, title, summary, keywords, context_tags, source_item_ids, access_count, created_at
+            FROM memory_cards
+            WHERE layer = 1
+              AND (valid_until < ? OR (created_at < ? AND access_count < 2))
+            """,
+            (_now(), _days_ago(expire_days)),
+        )]
+
+    def downgrade_l1(self, card_ids: list[str]) -> None:
+        now = _now()
+        with self._lock:
+            self.db.executemany(
+                """
+                UPDATE memory_cards
+                SET layer = 2, valid_until = NULL, confidence = MIN(confidence, 0.7), updated_at = ?
+                WHERE id = ?
+                """,
+                [(now, card_id) for card_id in card_ids],
+            )
+
+    def cold_l2(self, archive_days: int) -> list[dict[str, Any]]:
+        return [_decode_row(row) for row in self.db.execute(
+            """
+            SELECT id, title, access_count, created_at
+            FROM memory_cards
+            WHERE layer = 2 AND confidence > 0 AND created_at < ? AND access_count < 1
+            """,
+            (_days_ago(archive_days),),
+        )]
+
+    def archive_cards(self, card_ids: list[str]) -> None:
+        now = _now()
+        with self._lock:
+            self.db.executemany(
+                "UPDATE memory_cards SET confidence = 0, updated_at = ? WHERE id = ?",
+                [(now, card_id) for card_id in card_ids],
+            )
+
+    def merge_candidates(self) -> list[dict[str, Any]]:
+        """有 embedding、未归档的 L2 卡片（含向量），按 created_at 升序"""
+        vectors = dict(self.card_vectors("layer = 2 AND confidence > 0"))
+        rows = self.db.execute(
+            """
+            SELECT id, title, summary, keywords, context_tags, source_item_ids
+            FROM memory_cards
+            WHERE layer = 2 AND vec_row IS NOT NULL AND confidence > 0
+            ORDER BY created_at ASC
+            """
+        ).fetchall()
+        cards = []
+        for row in rows:
+            card = _decode_row(row)
+            card["embedding"] = vectors[card["id"]]
+            cards.append(card)
+        return cards
+
+    def merge_cards(self, pairs: list[tuple[str, str]]) -> None:
+        """保留 a，把 b 的 source_item_ids 并入 a 后删除 b（与 Postgres 版逐对执行的语义一致），b 的向量行留给新卡片复用"""
+        now = _now()
+        with self._lock:
+            with self._transaction():
+                for id_a, id_b in pairs:
+                    a = self.db.execute("SELECT source_item_ids, confidence FROM memory_cards WHERE id = ?", (id_a,)).fetchone()
+                    b = self.db.execute("SELECT source_item_ids, confidence, vec_row FROM memory_cards WHERE id = ?", (id_b,)).fetchone()
+                    if a and b:
+                        self.db.execute(
+                            "UPDATE memory_cards SET source_item_ids = ?, confidence = ?, updated_at = ? WHERE id = ?",
+                            (
+                                json.dumps(json.loads(a["source_item_ids"]) + json.loads(b["source_item_ids"]), ensure_ascii=False),
+                                max(a["confidence"], b["confidence"]),
+                                now,
+                                id_a,
+                            ),
+                        )
+                    self.db.execute("DELETE FROM memory_cards WHERE id = ?", (id_b,))
+                    if b:
+                        self._free_vector("memory_cards", b["vec_row"])
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": str(self.directory),
+            "knowledge_items": self.db.execute("SELECT count(*) FROM knowledge_items").fetchone()[0],
+            "memory_cards": self.db.execute("SELECT count(*) FROM memory_cards").fetchone()[0],
+            "vector_rows": {table: self._used_rows(table) for table in self.vectors},
+            "free_vector_rows": dict(self.db.execute(
+                "SELECT table_name, count(*) FROM free_vec_rows GROUP BY table_name"
+            ).fetchall()),
+            "dim": {table: vectors.dim for table, vectors in self.vectors.items()},
+        }
+
+    def close(self) -> None:
+        for vectors in self.vectors.values():
+            vectors.flush()
+        self.db.close()
+
+
+_stores: dict[str, LocalStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(directory: Path | str | None = None) -> LocalStore:
+    """进程内每个目录共用一个 LocalStore"""
+    path = str(Path(directory) if directory else LOCAL_DIR)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = LocalStore(Path(path))
+        return _stores[path]
+
+
+def close_store(directory: Path | str | None = None) -> None:
+    path = str(Path(directory) if directory else LOCAL_DIR)
+    with _stores_lock:
+        store = _stores.pop(path, None)
+    if store is not None:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="knowledge-skill 本地存储后端")
+    parser.add_argument("--stats", action="store_true", help="输出条目数、向量行数和维度")
+    parser.parse_args()
+    print(json.dumps(get_store().stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
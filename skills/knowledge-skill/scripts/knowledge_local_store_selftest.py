@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+# ]
+# ///
+"""
+knowledge_local_store.py 的离线自检（临时目录，不需要数据库和 embedding 服务）
+
+重点覆盖多进程共用一个存储目录：本进程先打开存储并写入少量向量（映射只有初始容量），
+另一个进程再追加到超过初始容量，本进程不重开存储也要能查到新写入的向量。
+
+用法:
+  python skills/knowledge-skill/scripts/knowledge_local_store_selftest.py
+"""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from knowledge_local_store import LocalStore
+
+DIM = 16
+FIRST_BATCH = 10
+SECOND_BATCH = 2000
+
+# 子进程：打开同一目录，追加 count 条知识和卡片（向量即最后一条的，输出到 stdout）
+WRITER = """
+import json
+import sys
+import numpy as np
+from knowledge_local_store import LocalStore
+
+store = LocalStore(sys.argv[1])
+start, count, dim = int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+vectors = np.random.default_rng(1).standard_normal((count, dim)).astype(np.float32)
+items = store.upsert_knowledge_many([
+    {"source_type": "selftest", "source_id": f"item-{start + i}", "title": f"item {start + i}",
+     "content": "body", "embedding": vectors[i].tolist()}
+    for i in range(count)
+])
+assert all(row["success"] for row in items), items[:3]
+cards = store.insert_cards([
+    {"title": f"card {start + i}", "summary": "body", "layer": 2, "embedding": vectors[i].tolist()}
+    for i in range(count)
+])
+assert all(row["success"] for row in cards), cards[:3]
+store.close()
+print(json.dumps(vectors[-1].tolist()))
+"""
+
+
+def items(start: int, vectors: np.ndarray) -> list[dict]:
+    return [
+        {"source_type": "selftest", "source_id": f"item-{start + i}", "title": f"item {start + i}",
+         "content": "body", "embedding": vector.tolist()}
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def check_grown_by_other_process(tmp: Path) -> None:
+    store = LocalStore(tmp / "store")
+    first = np.random.default_rng(0).standard_normal((FIRST_BATCH, DIM)).astype(np.float32)
+    assert all(row["success"] for row in store.upsert_knowledge_many(items(0, first)))
+    assert all(row["success"] for row in store.insert_cards(
+        [{"title": f"card {i}", "summary": "body", "layer": 2, "embedding": v.tolist()} for i, v in enumerate(first)]
+    ))
+    assert store.search_vector(first[3].tolist(), limit=1)[0]["title"] == "item 3"
+
+    proc = subprocess.run(
+        [sys.executable, "-c", WRITER, str(tmp / "store"), str(FIRST_BATCH), str(SECOND_BATCH), str(DIM)],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+    )
+    last = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # 本进程的映射仍是初始容量；新行号已超出，查询前应重新映射
+    hits = store.search_vector(last, limit=3)
+    assert hits[0]["title"] == f"item {FIRST_BATCH + SECOND_BATCH - 1}", hits[0]["title"]
+    assert len(store.card_vectors("layer = 2")) == FIRST_BATCH + SECOND_BATCH
+    store.close()
+
+
+def check_dim_set_by_other_process(tmp: Path) -> None:
+    """本进程打开时还没有向量（维度未知），另一个进程写入后也能查到"""
+    store = LocalStore(tmp / "empty")
+    proc = subprocess.run(
+        [sys.executable, "-c", WRITER, str(tmp / "empty"), "0", "5", str(DIM)],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+    )
+    last = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert store.search_vector(last, limit=1)[0]["title"] == "item 4"
+    store.close()
+
+
+def check_merge_reuses_vector_rows(tmp: Path) -> None:
+    """merge_cards 删掉的卡片空出向量行，新卡片复用；出错的事务整体回滚，连接不留在事务里"""
+    store = LocalStore(tmp / "merge")
+    vectors = np.random.default_rng(2).standard_normal((4, DIM)).astype(np.float32)
+    ids = [row["id"] for row in store.insert_cards(
+        [{"title": f"card {i}", "summary": "body", "layer": 2, "embedding": v.tolist()} for i, v in enumerate(vectors[:3])]
+    )]
+    store.merge_cards([(ids[0], ids[1])])
+    assert store.stats()["free_vector_rows"] == {"memory_cards": 1}
+    new_id = store.insert_cards([{"title": "card 3", "summary": "body", "layer": 2, "embedding": vectors[3].tolist()}])[0]["id"]
+    stats = store.stats()
+    assert stats["vector_rows"]["memory_cards"] == 3 and stats["free_vector_rows"] == {}, stats
+    stored = dict(store.card_vectors())
+    assert set(stored) == {ids[0], ids[2], new_id}
+    assert np.allclose(stored[new_id], vectors[3] / np.linalg.norm(vectors[3]), atol=1e-6)
+
+    store.db.execute("UPDATE memory_cards SET source_item_ids = 'not json' WHERE id = ?", (ids[2],))
+    try:
+        store.merge_cards([(ids[0], new_id), (ids[2], ids[0])])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("merge_cards should fail on corrupt source_item_ids")
+    assert not store.db.in_transaction
+    assert set(dict(store.card_vectors())) == {ids[0], ids[2], new_id}
+    assert store.stats()["free_vector_rows"] == {}
+    store.close()
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        check_grown_by_other_process(Path(tmp))
+        check_dim_set_by_other_process(Path(tmp))
+        check_merge_reuses_vector_rows(Path(tmp))
+    print("knowledge_local_store self-test ok")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
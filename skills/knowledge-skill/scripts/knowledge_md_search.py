@@ -2,15 +2,31 @@
 # /// script
 # requires-python = ">=3.10"
 # ///
-"""Search compiled Markdown knowledge with ripgrep-style output."""
+"""Search compiled Markdown knowledge with ripgrep-style output.
+
+Two modes:
+- grep (default): `rg` when available, otherwise a Python line scan. Exact substring matches, file order.
+- index: a persisted inverted index (SQLite, `<root>/.md-index.sqlite3` by default) with BM25 ranking.
+  Tokens follow knowledge_fts: lowercase ASCII words and CJK bigrams; a query token that is not in the index
+  falls back to a prefix match (embed -> embedding, 向 -> 向量).
+  Before each query the index is refreshed incrementally: only files whose mtime/size changed are re-read.
+  Query syntax: space-separated terms are ANDed, `OR` (uppercase) separates alternatives,
+  e.g. `agent memory OR 向量检索`.
+"""
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import math
+import operator
+import os
 import re
 import shutil
+import sqlite3
 import subprocess
+from collections import defaultdict
 from pathlib import Path
 
 
@@ -59,7 +75,256 @@ def run_python_search(root: Path, query: str, limit: int, ignore_case: bool = Tr
     return results
 
 
-def search_markdown(root: Path, query: str, limit: int, use_rg: bool = True) -> list[dict]:
+INDEX_FILENAME = ".md-index.sqlite3"
+INDEX_VERSION = "1"
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_LINES_PER_TERM = 64  # line numbers kept per (term, file); tf is still exact
+MAX_PREFIX_TERMS = 256  # expansions of one prefix token
+
+# Same rules as knowledge_fts.tokenize() (kept here so this script stays dependency-free)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+|[\u3400-\u9fff\uf900-\ufaff]+")
+_CJK_START = "\u3400"
+
+INDEX_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id       INTEGER PRIMARY KEY,
+    path     TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    length   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term    TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    tf      INTEGER NOT NULL,
+    lines   TEXT NOT NULL,
+    PRIMARY KEY (term, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_file ON postings(file_id);
+"""
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for piece in _TOKEN_PATTERN.findall(text.lower()):
+        if piece[0] < _CJK_START or len(piece) == 1:
+            tokens.append(piece)
+        else:
+            tokens.extend(map(operator.add, piece, piece[1:]))
+    return tokens
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """`a b OR c` -> [[a, b], [c]]: tokens within a group are ANDed, groups are ORed."""
+    groups = []
+    for part in re.split(r"\s+OR\s+", query.strip()):
+        tokens = list(dict.fromkeys(tokenize(part)))
+        if tokens:
+            groups.append(tokens)
+    return groups
+
+
+def scan_markdown(root: Path) -> dict[str, tuple[int, int]]:
+    """Relative path -> (mtime_ns, size) for every *.md under root (one stat per file)."""
+    found: dict[str, tuple[int, int]] = {}
+    stack = [str(root)]
+    cut = len(str(root)) + 1
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".md"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found[entry.path[cut:]] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+def scan_fingerprint(found: dict[str, tuple[int, int]]) -> str:
+    listing = "\n".join(f"{path}\t{mtime_ns}\t{size}" for path, (mtime_ns, size) in sorted(found.items()))
+    return hashlib.sha1(listing.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+class MarkdownIndex:
+    """Inverted index over the Markdown files under one root: term -> (file, tf, line numbers)."""
+
+    def __init__(self, root: Path, index_path: Path | None = None):
+        self.root = root
+        self.path = index_path or root / INDEX_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(INDEX_SCHEMA_SQL)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != INDEX_VERSION:
+            self.clear()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def clear(self) -> None:
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM meta")
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", [INDEX_VERSION])
+
+    def refresh(self) -> dict[str, int]:
+        """Re-index files whose mtime/size changed, drop deleted ones. Returns counts."""
+        on_disk = scan_markdown(self.root)
+        fingerprint = scan_fingerprint(on_disk)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row and row[0] == fingerprint:
+            return {"files": len(on_disk), "indexed": 0, "removed": 0}
+
+        known = {path: (file_id, mtime_ns, size) for file_id, path, mtime_ns, size in
+                 self.conn.execute("SELECT id, path, mtime_ns, size FROM files")}
+        changed = [path for path, stat in on_disk.items() if known.get(path, (None,))[1:] != stat]
+        removed = [known[path][0] for path in known.keys() - on_disk.keys()]
+        with self.conn:
+            self.conn.execute("BEGIN")
+            stale = removed + [known[path][0] for path in changed if path in known]
+            for file_id in stale:
+                self.conn.execute("DELETE FROM postings WHERE file_id = ?", [file_id])
+            self.conn.executemany("DELETE FROM files WHERE id = ?", [(file_id,) for file_id in stale])
+            for path in changed:
+                self._index_file(path, *on_disk[path])
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)", [fingerprint])
+        return {"files": len(on_disk), "indexed": len(changed), "removed": len(removed)}
+
+    def _index_file(self, path: str, mtime_ns: int, size: int) -> None:
+        try:
+            text = (self.root / path).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return
+        tf: dict[str, int] = defaultdict(int)
+        lines: dict[str, list[int]] = defaultdict(list)
+        length = 0
+        for lineno, line in enumerate(text.splitlines(), 1):
+            for token in tokenize(line):
+                length += 1
+                tf[token] += 1
+                seen = lines[token]
+                if (not seen or seen[-1] != lineno) and len(seen) < MAX_LINES_PER_TERM:
+                    seen.append(lineno)
+        file_id = self.conn.execute(
+            "INSERT INTO files (path, mtime_ns, size, length) VALUES (?, ?, ?, ?)",
+            [path, mtime_ns, size, length],
+        ).lastrowid
+        self.conn.executemany(
+            "INSERT INTO postings (term, file_id, tf, lines) VALUES (?, ?, ?, ?)",
+            [(token, file_id, count, ",".join(map(str, lines[token]))) for token, count in tf.items()],
+        )
+
+    def _terms(self, token: str) -> list[str]:
+        """Index terms a query token matches: itself if indexed, otherwise up to MAX_PREFIX_TERMS prefix expansions."""
+        if self.conn.execute("SELECT 1 FROM postings WHERE term = ? LIMIT 1", [token]).fetchone():
+            return [token]
+        return [term for (term,) in self.conn.execute(
+            "SELECT DISTINCT term FROM postings WHERE term > ? AND term < ? LIMIT ?",
+            [token, token + "\U0010ffff", MAX_PREFIX_TERMS],
+        )]
+
+    def _postings(self, terms: list[str]) -> dict[int, int]:
+        """file_id -> tf summed over the matched terms."""
+        if not terms:
+            return {}
+        return dict(self.conn.execute(
+            f"SELECT file_id, sum(tf) FROM postings WHERE term IN ({','.join('?' * len(terms))}) GROUP BY file_id",
+            terms,
+        ))
+
+    def _best_line(self, file_id: int, terms: dict[str, list[str]]) -> int:
+        """The line matching the most query tokens (earliest on ties)."""
+        counts: dict[int, int] = defaultdict(int)
+        for matched in terms.values():
+            if not matched:
+                continue
+            rows = self.conn.execute(
+                f"SELECT lines FROM postings WHERE file_id = ? AND term IN ({','.join('?' * len(matched))})",
+                [file_id, *matched],
+            )
+            for lineno in {int(n) for (value,) in rows for n in value.split(",")}:
+                counts[lineno] += 1
+        if not counts:
+            return 1
+        return min(counts, key=lambda lineno: (-counts[lineno], lineno))
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        groups = parse_query(query)
+        if not groups:
+            return []
+        total, avg_length = self.conn.execute("SELECT count(*), coalesce(avg(length), 0) FROM files").fetchone()
+        if not total:
+            return []
+
+        tokens = list(dict.fromkeys(token for group in groups for token in group))
+        terms = {token: self._terms(token) for token in tokens}
+        postings = {token: self._postings(terms[token]) for token in tokens}
+        candidates: set[int] = set()
+        for group in groups:
+            matched = set.intersection(*(set(postings[token]) for token in group))
+            candidates |= matched
+        if not candidates:
+            return []
+
+        lengths = dict(self.conn.execute(
+            f"SELECT id, length FROM files WHERE id IN ({','.join('?' * len(candidates))})", list(candidates)
+        ))
+        scores: dict[int, float] = defaultdict(float)
+        for token in tokens:
+            docs = postings[token]
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for file_id in candidates.intersection(docs):
+                tf = docs[file_id]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[file_id] / (avg_length or 1))
+                scores[file_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        paths = dict(self.conn.execute(
+            f"SELECT id, path FROM files WHERE id IN ({','.join('?' * len(top))})", [file_id for file_id, _ in top]
+        ))
+        results = []
+        for file_id, score in top:
+            path = self.root / paths[file_id]
+            lineno = self._best_line(file_id, terms)
+            try:
+                lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+                text = lines[lineno - 1].strip() if lineno <= len(lines) else ""
+            except OSError:
+                text = ""
+            results.append({"path": str(path), "line": lineno, "text": text, "score": round(score, 4)})
+        return results
+
+
+def run_index_search(root: Path, query: str, limit: int, index_path: Path | None = None, rebuild: bool = False) -> list[dict]:
+    index = MarkdownIndex(root, index_path)
+    try:
+        if rebuild:
+            index.clear()
+        index.refresh()
+        return index.search(query, limit)
+    finally:
+        index.close()
+
+
+def search_markdown(root: Path, query: str, limit: int, use_rg: bool = True, mode: str = "grep") -> list[dict]:
+    if mode == "index":
+        return run_index_search(root, query, limit)
     if use_rg and shutil.which("rg"):
         return run_rg(root, query, limit)
     return run_python_search(root, query, limit)
@@ -81,11 +346,19 @@ def main() -> None:
     parser.add_argument("--root", default=".llm-wiki/wiki", help="Markdown root to search")
     parser.add_argument("--limit", type=int, default=20, help="Maximum matches")
     parser.add_argument("--no-rg", action="store_true", help="Use Python fallback instead of rg")
+    parser.add_argument("--mode", choices=["grep", "index"], default="grep",
+                        help="grep: substring matches in file order; index: inverted index with BM25 ranking")
+    parser.add_argument("--index", help=f"Index file for --mode index (default: <root>/{INDEX_FILENAME})")
+    parser.add_argument("--rebuild", action="store_true", help="Drop and rebuild the index before searching")
     parser.add_argument("--output", choices=["json", "markdown"], default="markdown")
     args = parser.parse_args()
 
     root = Path(args.root).expanduser().resolve()
-    results = search_markdown(root, args.query, args.limit, use_rg=not args.no_rg)
+    if args.mode == "index":
+        index_path = Path(args.index).expanduser().resolve() if args.index else None
+        results = run_index_search(root, args.query, args.limit, index_path=index_path, rebuild=args.rebuild)
+    else:
+        results = search_markdown(root, args.query, args.limit, use_rg=not args.no_rg)
     if args.output == "json":
         print(json.dumps({"query": args.query, "root": str(root), "total": len(results), "results": results}, ensure_ascii=False, indent=2))
     else:
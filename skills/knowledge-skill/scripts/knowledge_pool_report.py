@@ -9,65 +9,65 @@
 # ///
 """
 输出知识池质量快照，帮助判断下一步该补哪些知识源和摘要。
+条目用服务端游标逐行流过汇总，正文只在数据库里算长度、不传回来，知识池再大内存占用也是常数。
 """
 
 import argparse
 import json
-from typing import Any
-
-import psycopg2
-import psycopg2.extras
-
-from knowledge_search import DB_CONFIG
-
-
-def fetch_rows(days: int = 30, source_type: str | None = None) -> list[dict[str, Any]]:
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        params: list[Any] = [days]
-        source_filter = ""
-        if source_type:
-            source_filter = "AND source_type = %s"
-            params.append(source_type)
-
-        cur.execute(
-            f"""
-            SELECT
-                id,
-                source_type,
-                title,
-                ai_summary,
-                summary,
-                content,
-                metadata,
-                created_at,
-                updated_at,
-                status
-            FROM knowledge_items
-            WHERE status = 'active'
-              AND created_at >= NOW() - (%s || ' days')::interval
-              {source_filter}
-            ORDER BY created_at DESC
-            """,
-            params,
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def summarize_rows(rows: list[dict[str, Any]], days: int, source_type: str | None) -> dict[str, Any]:
-    total = len(rows)
+from typing import Any, Iterable, Iterator
+
+from knowledge_db import fetch_iter
+
+WEAK_ITEM_LIMIT = 5
+
+
+def iter_rows(days: int = 30, source_type: str | None = None) -> Iterator[dict[str, Any]]:
+    params: list[Any] = [days]
+    source_filter = ""
+    if source_type:
+        source_filter = "AND source_type = %s"
+        params.append(source_type)
+
+    yield from fetch_iter(
+        f"""
+        SELECT
+            id,
+            source_type,
+            title,
+            ai_summary,
+            char_length(coalesce(content, '')) AS content_length,
+            -- 与 Python 里 bool(metadata) 一致：空对象 / 空数组 / 空串 / 0 / false / null 都算没有
+            CASE jsonb_typeof(metadata)
+                WHEN 'object' THEN metadata <> '{{}}'::jsonb
+                WHEN 'array' THEN jsonb_array_length(metadata) > 0
+                WHEN 'string' THEN metadata <> '""'::jsonb
+                WHEN 'number' THEN (metadata #>> '{{}}')::numeric <> 0
+                WHEN 'boolean' THEN metadata = 'true'::jsonb
+                ELSE false
+            END AS has_metadata,
+            created_at
+        FROM knowledge_items
+        WHERE status = 'active'
+          AND created_at >= NOW() - (%s || ' days')::interval
+          {source_filter}
+        ORDER BY created_at DESC
+        """,
+        params,
+    )
+
+
+def summarize_rows(rows: Iterable[dict[str, Any]], days: int, source_type: str | None) -> dict[str, Any]:
+    """单遍汇总；rows 可以是 iter_rows() 的流，也可以是带 content / metadata 的完整行"""
+    total = 0
     by_source: dict[str, dict[str, Any]] = {}
     weak_items: list[dict[str, Any]] = []
 
     for row in rows:
+        total += 1
         source = str(row.get("source_type") or "unknown")
         ai_summary = str(row.get("ai_summary") or "").strip()
-        metadata = row.get("metadata") or {}
-        content = str(row.get("content") or "")
+        has_metadata = row["has_metadata"] if "has_metadata" in row else bool(row.get("metadata"))
+        content_length = row["content_length"] if "content_length" in row else len(str(row.get("content") or ""))
         title = str(row.get("title") or "")
 
         bucket = by_source.setdefault(
@@ -80,20 +80,20 @@ def summarize_rows(rows: list[dict[str, Any]], days: int, source_type: str | Non
             },
         )
         bucket["count"] += 1
-        bucket["avg_content_length"] += len(content)
+        bucket["avg_content_length"] += content_length
         if ai_summary:
             bucket["ai_summary_count"] += 1
-        if metadata:
+        if has_metadata:
             bucket["metadata_count"] += 1
 
-        if not ai_summary or len(content) < 180:
+        if (not ai_summary or content_length < 180) and len(weak_items) < WEAK_ITEM_LIMIT:
             weak_items.append(
                 {
                     "title": title,
                     "source_type": source,
                     "created_at": row.get("created_at"),
                     "has_ai_summary": bool(ai_summary),
-                    "content_length": len(content),
+                    "content_length": content_length,
                 }
             )
 
@@ -107,7 +107,6 @@ def summarize_rows(rows: list[dict[str, Any]], days: int, source_type: str | Non
         {"source_type": source, **data}
         for source, data in sorted(by_source.items(), key=lambda item: item[1]["count"], reverse=True)
     ]
-    weak_items = weak_items[:5]
 
     actions: list[str] = []
     if total == 0:
@@ -173,15 +172,15 @@ def render_markdown(result: dict[str, Any]) -> str:
     return "\n".join(lines).strip() + "\n"
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="输出知识池质量快照")
     parser.add_argument("--days", type=int, default=30, help="统计最近多少天的数据")
     parser.add_argument("--source-type", help="只看某个来源")
     parser.add_argument("--output", choices=["json", "markdown"], default="markdown")
     parser.add_argument("--write", help="把 markdown 结果写入指定路径")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    rows = fetch_rows(days=args.days, source_type=args.source_type)
+    rows = iter_rows(days=args.days, source_type=args.source_type)
     result = summarize_rows(rows, days=args.days, source_type=args.source_type)
 
     if args.output == "json":
@@ -19,13 +19,18 @@ import json
 import mimetypes
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from knowledge_file_cache import FileCache
 
 
 DEFAULT_BASE_URL = "https://open.feishu.cn"
@@ -34,6 +39,26 @@ IMPORT_POLL_ATTEMPTS = 30
 IMPORT_POLL_INTERVAL = 2.0
 WIKI_MOVE_POLL_ATTEMPTS = 30
 WIKI_MOVE_POLL_INTERVAL = 2.0
+DEFAULT_MAX_IN_FLIGHT = 8
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_CODE = 99991400
+# Requests per second per API family, kept under Feishu's per-app frequency limits
+# (upload_all is 5 QPS; import/wiki task endpoints are limited per minute).
+RATE_LIMITS = {
+    "upload": 5.0,
+    "import_create": 100 / 60,
+    "import_query": 100 / 60,
+    "wiki_move": 100 / 60,
+    "wiki_task": 100 / 60,
+    "default": 5.0,
+}
+RATE_LIMIT_ROUTES = (
+    ("POST", "/open-apis/drive/v1/medias/upload_all", "upload"),
+    ("POST", "/open-apis/drive/v1/import_tasks", "import_create"),
+    ("GET", "/open-apis/drive/v1/import_tasks/", "import_query"),
+    ("POST", "/open-apis/wiki/v2/spaces/", "wiki_move"),
+    ("GET", "/open-apis/wiki/v2/tasks/", "wiki_task"),
+)
 URL_OBJ_TYPES = {
     "docx": "docx",
     "doc": "doc",
@@ -49,6 +74,29 @@ class FeishuError(RuntimeError):
     """Raised when Feishu OpenAPI returns a non-success response."""
 
 
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, at most `burst` banked."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 @dataclass(frozen=True)
 class MarkdownFile:
     path: Path
@@ -59,28 +107,49 @@ class MarkdownFile:
 
 
 class FeishuClient:
-    def __init__(self, app_id: str, app_secret: str, base_url: str = DEFAULT_BASE_URL, timeout: int = 60):
+    def __init__(
+        self,
+        app_id: str,
+        app_secret: str,
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: int = 60,
+        max_connections: int = DEFAULT_MAX_IN_FLIGHT,
+    ):
         self.app_id = app_id
         self.app_secret = app_secret
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
         self._tenant_access_token: str | None = None
+        self._token_lock = threading.Lock()
+        self.limits = {name: TokenBucket(rate) for name, rate in RATE_LIMITS.items()}
+        # One keep-alive pool shared by all worker threads.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, max_connections + 2))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def tenant_access_token(self) -> str:
-        if self._tenant_access_token:
-            return self._tenant_access_token
-
-        data = self._request(
-            "POST",
-            "/open-apis/auth/v3/tenant_access_token/internal",
-            json_body={"app_id": self.app_id, "app_secret": self.app_secret},
-            auth=False,
-        )
-        token = data.get("tenant_access_token")
-        if not token:
-            raise FeishuError("tenant_access_token missing from auth response")
-        self._tenant_access_token = token
-        return token
+        with self._token_lock:
+            if self._tenant_access_token:
+                return self._tenant_access_token
+
+            data = self._request(
+                "POST",
+                "/open-apis/auth/v3/tenant_access_token/internal",
+                json_body={"app_id": self.app_id, "app_secret": self.app_secret},
+                auth=False,
+            )
+            token = data.get("tenant_access_token")
+            if not token:
+                raise FeishuError("tenant_access_token missing from auth response")
+            self._tenant_access_token = token
+            return token
+
+    def _limit(self, method: str, path: str) -> TokenBucket:
+        for route_method, prefix, name in RATE_LIMIT_ROUTES:
+            if method == route_method and path.startswith(prefix):
+                return self.limits[name]
+        return self.limits["default"]
 
     def _request(
         self,
@@ -97,20 +166,30 @@ class FeishuClient:
         if auth:
             headers["Authorization"] = f"Bearer {self.tenant_access_token()}"
 
-        resp = requests.request(
-            method,
-            f"{self.base_url}{path}",
-            params=params,
-            json=json_body,
-            files=files,
-            data=data,
-            headers=headers,
-            timeout=self.timeout,
-        )
-        try:
-            payload = resp.json()
-        except ValueError as exc:
-            raise FeishuError(f"{method} {path} returned non-JSON response: HTTP {resp.status_code}") from exc
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self._limit(method, path).acquire()
+            for spec in (files or {}).values():
+                spec[1].seek(0)
+            resp = self.session.request(
+                method,
+                f"{self.base_url}{path}",
+                params=params,
+                json=json_body,
+                files=files,
+                data=data,
+                headers=headers,
+                timeout=self.timeout,
+            )
+            try:
+                payload = resp.json()
+            except ValueError as exc:
+                raise FeishuError(f"{method} {path} returned non-JSON response: HTTP {resp.status_code}") from exc
+            limited = resp.status_code == 429 or payload.get("code") == RATE_LIMIT_CODE
+            if not limited or attempt == RATE_LIMIT_RETRIES:
+                break
+            # Over quota anyway (e.g. another process shares the app): back off and retry.
+            reset = resp.headers.get("x-ogw-ratelimit-reset", "")
+            time.sleep(float(reset) if reset.isdigit() else 1.0 + attempt)
 
         if resp.status_code >= 400:
             raise FeishuError(f"{method} {path} HTTP {resp.status_code}: {payload}")
@@ -154,21 +233,27 @@ class FeishuClient:
             raise FeishuError(f"ticket missing after creating import task for {md.rel_path}: {result}")
         return ticket
 
+    def check_import_task(self, ticket: str) -> dict[str, Any] | None:
+        """Query an import task once: the result when done, None while still running."""
+        result = self._request("GET", f"/open-apis/drive/v1/import_tasks/{ticket}")
+        status = result.get("result") or result
+        job_status = int(status.get("job_status", status.get("status", 0)) or 0)
+        if job_status == 0 and (status.get("token") or status.get("url")):
+            return status
+        if job_status < 0:
+            raise FeishuError(f"import task failed: ticket={ticket}, result={result}")
+        return None
+
     def poll_import_task(self, ticket: str) -> dict[str, Any]:
-        last: dict[str, Any] = {}
         for _ in range(IMPORT_POLL_ATTEMPTS):
-            result = self._request("GET", f"/open-apis/drive/v1/import_tasks/{ticket}")
-            last = result
-            status = result.get("result") or result
-            job_status = int(status.get("job_status", status.get("status", 0)) or 0)
-            if job_status == 0 and (status.get("token") or status.get("url")):
+            status = self.check_import_task(ticket)
+            if status is not None:
                 return status
-            if job_status < 0:
-                raise FeishuError(f"import task failed: ticket={ticket}, result={result}")
             time.sleep(IMPORT_POLL_INTERVAL)
-        raise FeishuError(f"import task timed out: ticket={ticket}, last={last}")
+        raise FeishuError(f"import task timed out: ticket={ticket}")
 
-    def move_doc_to_wiki(self, doc_token: str, target_space_id: str, parent_token: str = "", apply: bool = False) -> dict[str, Any]:
+    def request_move_doc_to_wiki(self, doc_token: str, target_space_id: str, parent_token: str = "", apply: bool = False) -> dict[str, Any]:
+        """Submit a docs-to-wiki move without waiting; an async move comes back as {"ready": False, "task_id": ...}."""
         body: dict[str, Any] = {"obj_type": "docx", "obj_token": doc_token}
         if parent_token:
             body["parent_wiki_token"] = parent_token
@@ -182,7 +267,13 @@ class FeishuClient:
         task_id = result.get("task_id")
         if not task_id:
             raise FeishuError(f"move_docs_to_wiki returned no wiki_token/task_id/applied: {result}")
-        return self.poll_wiki_move_task(task_id)
+        return {"ready": False, "task_id": task_id, "raw": result}
+
+    def move_doc_to_wiki(self, doc_token: str, target_space_id: str, parent_token: str = "", apply: bool = False) -> dict[str, Any]:
+        moved = self.request_move_doc_to_wiki(doc_token, target_space_id, parent_token=parent_token, apply=apply)
+        if moved.get("task_id"):
+            return self.poll_wiki_move_task(moved["task_id"])
+        return moved
 
     def get_wiki_node(self, token_or_url: str) -> dict[str, Any]:
         token, obj_type = extract_feishu_ref(token_or_url)
@@ -195,23 +286,28 @@ class FeishuClient:
             raise FeishuError(f"could not resolve wiki node from {token_or_url}: {result}")
         return node
 
+    def check_wiki_move_task(self, task_id: str) -> dict[str, Any] | None:
+        """Query a wiki move task once: the moved node when done, None while still running."""
+        result = self._request("GET", f"/open-apis/wiki/v2/tasks/{task_id}", params={"task_type": "move"})
+        task = result.get("task") or result
+        move_results = task.get("move_results") or []
+        if not move_results:
+            return None
+        failed = [item for item in move_results if int(item.get("status", 1)) < 0]
+        if failed:
+            raise FeishuError(f"wiki move task failed: task_id={task_id}, result={result}")
+        if not all(int(item.get("status", 1)) == 0 for item in move_results):
+            return None
+        node = move_results[0].get("node") or {}
+        return {"ready": True, "wiki_token": node.get("node_token") or node.get("wiki_token"), "node": node, "raw": result}
+
     def poll_wiki_move_task(self, task_id: str) -> dict[str, Any]:
-        last: dict[str, Any] = {}
         for _ in range(WIKI_MOVE_POLL_ATTEMPTS):
-            result = self._request("GET", f"/open-apis/wiki/v2/tasks/{task_id}", params={"task_type": "move"})
-            last = result
-            task = result.get("task") or result
-            move_results = task.get("move_results") or []
-            if move_results:
-                failed = [item for item in move_results if int(item.get("status", 1)) < 0]
-                if failed:
-                    raise FeishuError(f"wiki move task failed: task_id={task_id}, result={result}")
-                ready = all(int(item.get("status", 1)) == 0 for item in move_results)
-                if ready:
-                    node = move_results[0].get("node") or {}
-                    return {"ready": True, "wiki_token": node.get("node_token") or node.get("wiki_token"), "node": node, "raw": result}
+            moved = self.check_wiki_move_task(task_id)
+            if moved is not None:
+                return moved
             time.sleep(WIKI_MOVE_POLL_INTERVAL)
-        raise FeishuError(f"wiki move task timed out: task_id={task_id}, last={last}")
+        raise FeishuError(f"wiki move task timed out: task_id={task_id}")
 
     def create_directory_document(self, title: str) -> dict[str, Any]:
         body: dict[str, Any] = {
@@ -233,12 +329,14 @@ class FeishuClient:
 
 def load_state(path: Path) -> dict[str, Any]:
     if not path.exists():
-        return {"version": 1, "directories": {}, "files": {}}
+        return {"version": 1, "directories": {}, "files": {}, "pending": {}}
     with path.open("r", encoding="utf-8") as fh:
         state = json.load(fh)
     state.setdefault("version", 1)
     state.setdefault("directories", {})
     state.setdefault("files", {})
+    # Import/move tickets still in progress when the last run stopped, keyed by rel_path.
+    state.setdefault("pending", {})
     return state
 
 
@@ -268,6 +366,10 @@ def markdown_title(path: Path) -> str:
     return path.stem
 
 
+def publish_fingerprint(path: Path) -> dict[str, str]:
+    return {"sha256": sha256_file(path), "title": markdown_title(path)}
+
+
 def should_exclude(rel_path: str, patterns: list[str]) -> bool:
     return any(fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
 
@@ -282,21 +384,25 @@ def collect_markdown(source: Path, exclude: list[str]) -> list[MarkdownFile]:
         paths = sorted(source.rglob("*.md"))
 
     files: list[MarkdownFile] = []
-    for path in paths:
-        if not path.is_file() or path.suffix.lower() not in (".md", ".markdown", ".mark"):
-            continue
-        rel_path = path.relative_to(base).as_posix()
-        if should_exclude(rel_path, exclude):
-            continue
-        files.append(
-            MarkdownFile(
-                path=path,
-                rel_path=rel_path,
-                title=markdown_title(path),
-                sha256=sha256_file(path),
-                size=path.stat().st_size,
+    # sha256 and title are only recomputed for files whose mtime/size changed since the last scan.
+    with FileCache(base) as cache:
+        for path in paths:
+            if not path.is_file() or path.suffix.lower() not in (".md", ".markdown", ".mark"):
+                continue
+            rel_path = path.relative_to(base).as_posix()
+            if should_exclude(rel_path, exclude):
+                continue
+            stat = path.stat()
+            info = cache.get(path, "publish", publish_fingerprint, stat=stat)
+            files.append(
+                MarkdownFile(
+                    path=path,
+                    rel_path=rel_path,
+                    title=info["title"],
+                    sha256=info["sha256"],
+                    size=stat.st_size,
+                )
             )
-        )
     return files
 
 
@@ -441,6 +547,222 @@ def publish_file(
     return {"path": md.rel_path, "action": "imported_and_moved", "doc_token": doc_token, "wiki_token": wiki_token, "title": md.title}
 
 
+@dataclass
+class _Watch:
+    md: MarkdownFile
+    check: Callable[[], dict[str, Any] | None]
+    on_done: Callable[[dict[str, Any]], None]
+    attempts_left: int
+    label: str
+    drop_pending_on_error: bool = False
+
+
+class ConcurrentPublisher:
+    """Publish many files with several import tasks in flight at once.
+
+    Worker threads upload files and submit import / move tasks; one shared poller
+    checks every outstanding ticket once per tick and hands finished ones back to
+    the pool. Request pacing comes from the client's token buckets. The state file
+    is rewritten atomically after every step, and tickets still in progress are
+    kept under ``state["pending"]`` so an interrupted run resumes them instead of
+    importing the same file twice.
+    """
+
+    def __init__(
+        self,
+        client: FeishuClient,
+        state: dict[str, Any],
+        state_path: Path,
+        *,
+        target_space_id: str,
+        update_existing: bool,
+        force_reimport: bool,
+        apply_move: bool,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        poll_interval: float = IMPORT_POLL_INTERVAL,
+    ):
+        self.client = client
+        self.state = state
+        self.state.setdefault("pending", {})
+        self.state_path = state_path
+        self.target_space_id = target_space_id
+        self.update_existing = update_existing
+        self.force_reimport = force_reimport
+        self.apply_move = apply_move
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_interval = poll_interval
+        self.state_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.watches: list[_Watch] = []
+        self.watch_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.results: dict[str, dict[str, Any]] = {}
+        self.done = threading.Condition()
+        self.pool: ThreadPoolExecutor | None = None
+
+    def publish(self, items: list[tuple[MarkdownFile, str]]) -> list[dict[str, Any]]:
+        """Publish (file, parent_token) pairs; returns one event per file, in input order."""
+        poller = threading.Thread(target=self._poll_loop, name="feishu-poller", daemon=True)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="feishu") as pool:
+            self.pool = pool
+            poller.start()
+            for md, parent_token in items:
+                # A slot is held from upload until the file is recorded, which bounds in-flight tasks.
+                self.slots.acquire()
+                pool.submit(self._guard, md, self._start, md, parent_token)
+            with self.done:
+                self.done.wait_for(lambda: len(self.results) >= len(items))
+            self.stopped.set()
+        poller.join()
+        return [self.results[md.rel_path] for md, _ in items]
+
+    # -- steps ---------------------------------------------------------------
+
+    def _start(self, md: MarkdownFile, parent_token: str) -> None:
+        existing = self.state["files"].get(md.rel_path)
+        if existing and existing.get("sha256") == md.sha256 and not self.force_reimport:
+            self._finish(md, {"path": md.rel_path, "action": "skip_unchanged", "title": md.title})
+            return
+
+        if existing and existing.get("doc_token") and self.update_existing and not self.force_reimport:
+            self.client.overwrite_document_markdown(existing["doc_token"], md)
+            with self.state_lock:
+                existing.update({"sha256": md.sha256, "title": md.title, "updated_at": int(time.time())})
+                save_state(self.state_path, self.state)
+            self._finish(md, {"path": md.rel_path, "action": "updated_existing", "doc_token": existing["doc_token"], "title": md.title})
+            return
+
+        pending = self.state["pending"].get(md.rel_path)
+        if pending and pending.get("sha256") == md.sha256 and not self.force_reimport:
+            parent_token = pending.get("parent_token", parent_token)
+            if pending.get("stage") == "import":
+                self._watch_import(md, parent_token, pending["ticket"])
+            elif pending.get("stage") == "move_task":
+                self._watch_move(md, parent_token, pending["doc_token"], pending.get("url"), pending["task_id"])
+            else:
+                self._move(md, parent_token, pending["doc_token"], pending.get("url"))
+            return
+
+        file_token = self.client.upload_import_media(md)
+        ticket = self.client.create_import_task(md, file_token)
+        self._set_pending(md, {"stage": "import", "ticket": ticket, "parent_token": parent_token})
+        self._watch_import(md, parent_token, ticket)
+
+    def _watch_import(self, md: MarkdownFile, parent_token: str, ticket: str) -> None:
+        self._add_watch(_Watch(
+            md=md,
+            check=lambda: self.client.check_import_task(ticket),
+            on_done=lambda imported: self._imported(md, parent_token, imported),
+            attempts_left=IMPORT_POLL_ATTEMPTS,
+            label=f"import task {ticket}",
+            drop_pending_on_error=True,
+        ))
+
+    def _imported(self, md: MarkdownFile, parent_token: str, imported: dict[str, Any]) -> None:
+        doc_token = imported.get("token")
+        if not doc_token:
+            self._drop_pending(md)
+            raise FeishuError(f"import completed without doc token for {md.rel_path}: {imported}")
+        url = imported.get("url")
+        self._set_pending(md, {"stage": "move", "doc_token": doc_token, "url": url, "parent_token": parent_token})
+        self._move(md, parent_token, doc_token, url)
+
+    def _move(self, md: MarkdownFile, parent_token: str, doc_token: str, url: str | None) -> None:
+        moved = self.client.request_move_doc_to_wiki(
+            doc_token, target_space_id=self.target_space_id, parent_token=parent_token, apply=self.apply_move,
+        )
+        if moved.get("task_id"):
+            self._set_pending(md, {"stage": "move_task", "doc_token": doc_token, "url": url,
+                                   "task_id": moved["task_id"], "parent_token": parent_token})
+            self._watch_move(md, parent_token, doc_token, url, moved["task_id"])
+            return
+        self._record(md, parent_token, doc_token, url, moved.get("wiki_token"))
+
+    def _watch_move(self, md: MarkdownFile, parent_token: str, doc_token: str, url: str | None, task_id: str) -> None:
+        self._add_watch(_Watch(
+            md=md,
+            check=lambda: self.client.check_wiki_move_task(task_id),
+            on_done=lambda moved: self._record(md, parent_token, doc_token, url, moved.get("wiki_token")),
+            attempts_left=WIKI_MOVE_POLL_ATTEMPTS,
+            label=f"wiki move task {task_id}",
+        ))
+
+    def _record(self, md: MarkdownFile, parent_token: str, doc_token: str, url: str | None, wiki_token: str | None) -> None:
+        with self.state_lock:
+            self.state["files"][md.rel_path] = {
+                "title": md.title,
+                "sha256": md.sha256,
+                "doc_token": doc_token,
+                "wiki_token": wiki_token,
+                "url": url,
+                "parent_token": parent_token,
+                "updated_at": int(time.time()),
+            }
+            self.state["pending"].pop(md.rel_path, None)
+            save_state(self.state_path, self.state)
+        self._finish(md, {"path": md.rel_path, "action": "imported_and_moved", "doc_token": doc_token,
+                          "wiki_token": wiki_token, "title": md.title})
+
+    # -- plumbing ------------------------------------------------------------
+
+    def _set_pending(self, md: MarkdownFile, pending: dict[str, Any]) -> None:
+        with self.state_lock:
+            self.state["pending"][md.rel_path] = {"sha256": md.sha256, "updated_at": int(time.time()), **pending}
+            save_state(self.state_path, self.state)
+
+    def _drop_pending(self, md: MarkdownFile) -> None:
+        with self.state_lock:
+            if self.state["pending"].pop(md.rel_path, None) is not None:
+                save_state(self.state_path, self.state)
+
+    def _finish(self, md: MarkdownFile, event: dict[str, Any]) -> None:
+        with self.done:
+            self.results[md.rel_path] = event
+            self.done.notify_all()
+        self.slots.release()
+
+    def _guard(self, md: MarkdownFile, step: Callable[..., None], *args: Any) -> None:
+        try:
+            step(*args)
+        except Exception as exc:
+            self._finish(md, {"path": md.rel_path, "action": "error", "title": md.title, "error": str(exc)})
+
+    def _add_watch(self, watch: _Watch) -> None:
+        with self.watch_lock:
+            self.watches.append(watch)
+
+    def _poll_loop(self) -> None:
+        while not self.stopped.wait(self.poll_interval):
+            with self.watch_lock:
+                watches = list(self.watches)
+            for watch in watches:
+                try:
+                    result = watch.check()
+                except Exception as exc:
+                    if watch.drop_pending_on_error:
+                        self._drop_pending(watch.md)
+                    self._settle(watch, self._raise, exc)
+                    continue
+                if result is not None:
+                    self._settle(watch, watch.on_done, result)
+                    continue
+                watch.attempts_left -= 1
+                if watch.attempts_left <= 0:
+                    # Left in state["pending"]: the task may still finish, and the next run resumes it.
+                    self._settle(watch, self._raise, FeishuError(f"{watch.label} timed out"))
+
+    def _settle(self, watch: _Watch, step: Callable[..., None], *args: Any) -> None:
+        """Stop watching a ticket and run its next step on the worker pool."""
+        with self.watch_lock:
+            self.watches.remove(watch)
+        assert self.pool is not None
+        self.pool.submit(self._guard, watch.md, step, *args)
+
+    @staticmethod
+    def _raise(exc: Exception) -> None:
+        raise exc
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Publish Markdown files to a Feishu/Lark Wiki knowledge space")
     parser.add_argument("--source", default=".llm-wiki/wiki", help="Markdown file or directory to publish")
@@ -457,6 +779,7 @@ def main() -> int:
     parser.add_argument("--flat", action="store_true", help="Do not create directory pages for subdirectories")
     parser.add_argument("--apply-move", action="store_true", help="Submit move request if direct docs-to-wiki move lacks permission")
     parser.add_argument("--exclude", action="append", default=[], help="Glob pattern to exclude, relative to source root; can be repeated")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Files whose import/move tasks may be in progress at once")
     parser.add_argument("--output", choices=["json", "markdown"], default="markdown")
     args = parser.parse_args()
 
@@ -479,7 +802,7 @@ def main() -> int:
             return 2
 
     state = load_state(state_path)
-    client = FeishuClient(args.app_id, args.app_secret, base_url=args.base_url)
+    client = FeishuClient(args.app_id, args.app_secret, base_url=args.base_url, max_connections=args.max_in_flight)
     resolved_target: dict[str, Any] | None = None
     target_space_id = args.target_space_id
     target_parent_token = args.target_parent_token
@@ -496,6 +819,8 @@ def main() -> int:
 
     events: list[dict[str, Any]] = []
 
+    # Directory pages are created up front (few, and children need their tokens); files then publish concurrently.
+    items: list[tuple[MarkdownFile, str]] = []
     for md in md_files:
         parent_token = target_parent_token
         if not args.flat:
@@ -508,22 +833,36 @@ def main() -> int:
                 execute=args.execute,
                 output_events=events,
             )
-        events.append(
-            publish_file(
-                client,
-                md,
-                state,
-                target_space_id=target_space_id,
-                parent_token=parent_token,
-                execute=args.execute,
-                update_existing=args.update_existing,
-                force_reimport=args.force_reimport,
-                apply_move=args.apply_move,
-            )
-        )
+        items.append((md, parent_token))
 
     if args.execute:
         save_state(state_path, state)
+        publisher = ConcurrentPublisher(
+            client,
+            state,
+            state_path,
+            target_space_id=target_space_id,
+            update_existing=args.update_existing,
+            force_reimport=args.force_reimport,
+            apply_move=args.apply_move,
+            max_in_flight=args.max_in_flight,
+        )
+        events.extend(publisher.publish(items))
+    else:
+        for md, parent_token in items:
+            events.append(
+                publish_file(
+                    client,
+                    md,
+                    state,
+                    target_space_id=target_space_id,
+                    parent_token=parent_token,
+                    execute=False,
+                    update_existing=args.update_existing,
+                    force_reimport=args.force_reimport,
+                    apply_move=args.apply_move,
+                )
+            )
 
     result = {
         "dry_run": not args.execute,
@@ -553,8 +892,9 @@ def main() -> int:
         print(f"- markdown files: {len(md_files)}")
         print()
         for event in events:
-            print(f"- {event['action']}: `{event.get('path') or event.get('dir')}`")
-    return 0
+            line = f"- {event['action']}: `{event.get('path') or event.get('dir')}`"
+            print(f"{line} ({event['error']})" if event.get("error") else line)
+    return 1 if any(event["action"] == "error" for event in events) else 0
 
 
 if __name__ == "__main__":
@@ -11,8 +11,11 @@ credentials or network access.
 from __future__ import annotations
 
 import importlib.util
+import json
 import sys
 import tempfile
+import threading
+import time
 from pathlib import Path
 
 
@@ -58,6 +61,105 @@ class FakeClient:
         return {"token": "doc_imported", "url": "https://fake/docx/doc_imported"}
 
 
+class FakeAsyncClient:
+    """Import tasks finish after a few polls; every other move goes through an async wiki task."""
+
+    def __init__(self, error_cls: type[Exception], polls_until_done: int = 2):
+        self.error_cls = error_cls
+        self.polls_until_done = polls_until_done
+        self.lock = threading.Lock()
+        self.uploads: list[str] = []
+        self.checks: dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failing_tickets: set[str] = set()
+
+    def upload_import_media(self, md):
+        with self.lock:
+            self.uploads.append(md.rel_path)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return f"file_{md.rel_path}"
+
+    def create_import_task(self, md, file_token: str, folder_token: str = ""):
+        return f"ticket_{md.rel_path}"
+
+    def check_import_task(self, ticket: str):
+        if ticket in self.failing_tickets:
+            raise self.error_cls(f"import task failed: ticket={ticket}")
+        with self.lock:
+            self.checks[ticket] = self.checks.get(ticket, 0) + 1
+            if self.checks[ticket] < self.polls_until_done:
+                return None
+        name = ticket.removeprefix("ticket_")
+        return {"token": f"doc_{name}", "url": f"https://fake/docx/doc_{name}"}
+
+    def request_move_doc_to_wiki(self, doc_token: str, target_space_id: str, parent_token: str = "", apply: bool = False):
+        if len(doc_token) % 2:
+            return {"ready": False, "task_id": f"task_{doc_token}"}
+        return self._moved(doc_token)
+
+    def check_wiki_move_task(self, task_id: str):
+        return self._moved(task_id.removeprefix("task_"))
+
+    def _moved(self, doc_token: str):
+        with self.lock:
+            self.in_flight -= 1
+        return {"ready": True, "wiki_token": f"wik_{doc_token}"}
+
+
+def check_concurrent_publisher(mod, tmp: Path) -> None:
+    root = tmp / "wiki"
+    root.mkdir()
+    for i in range(12):
+        (root / f"page{i:02d}.md").write_text(f"# Page {i}\n\nBody {i}\n", encoding="utf-8")
+    files = mod.collect_markdown(root, [])
+    state_path = tmp / "state.json"
+
+    # Resume: page00 stopped after its import task was created; page01's task has failed for good.
+    state = mod.load_state(state_path)
+    state["pending"]["page00.md"] = {"stage": "import", "ticket": "ticket_page00.md", "sha256": files[0].sha256,
+                                     "parent_token": "wik_root"}
+    client = FakeAsyncClient(mod.FeishuError)
+    client.failing_tickets.add("ticket_page01.md")
+    publisher = mod.ConcurrentPublisher(
+        client, state, state_path,
+        target_space_id="spc_fake", update_existing=False, force_reimport=False, apply_move=False,
+        max_in_flight=4, poll_interval=0.01,
+    )
+    events = publisher.publish([(md, "wik_root") for md in files])
+
+    assert [event["path"] for event in events] == [md.rel_path for md in files]
+    assert events[1]["action"] == "error"
+    assert all(event["action"] == "imported_and_moved" for i, event in enumerate(events) if i != 1)
+    assert "page00.md" not in client.uploads, "pending ticket should be resumed, not re-uploaded"
+    assert client.max_in_flight <= 4
+    saved = json.loads(state_path.read_text(encoding="utf-8"))
+    assert saved["pending"] == {}
+    assert saved["files"]["page00.md"]["wiki_token"] == "wik_doc_page00.md"
+    assert saved["files"]["page03.md"]["doc_token"] == "doc_page03.md"
+    assert "page01.md" not in saved["files"]
+
+    # A second run only retries the failed file.
+    client = FakeAsyncClient(mod.FeishuError)
+    publisher = mod.ConcurrentPublisher(
+        client, mod.load_state(state_path), state_path,
+        target_space_id="spc_fake", update_existing=False, force_reimport=False, apply_move=False,
+        max_in_flight=4, poll_interval=0.01,
+    )
+    events = publisher.publish([(md, "wik_root") for md in files])
+    assert client.uploads == ["page01.md"]
+    assert sum(event["action"] == "skip_unchanged" for event in events) == 11
+
+
+def check_token_bucket(mod) -> None:
+    bucket = mod.TokenBucket(rate=50.0, burst=1.0)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
 def main() -> int:
     mod = load_module()
 
@@ -109,6 +211,10 @@ def main() -> int:
     assert result["wiki_token"] == "wik_doc_imported"
     assert state["directories"]["topic"]["wiki_token"] == "wik_doc_dir_topic"
     assert state["files"]["topic/note.md"]["doc_token"] == "doc_imported"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_concurrent_publisher(mod, Path(tmp))
+    check_token_bucket(mod)
     print("knowledge_publish_feishu self-test ok")
     return 0
 
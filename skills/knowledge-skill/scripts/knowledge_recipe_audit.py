@@ -217,7 +217,7 @@ def maybe_write(markdown: str, output_path: str | None) -> None:
     path.write_text(markdown, encoding="utf-8")
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="批量审阅 showcase recipes")
     parser.add_argument(
         "--recipes-dir",
@@ -226,7 +226,7 @@ def main():
     )
     parser.add_argument("--write", help="把 markdown 结果写入指定路径")
     parser.add_argument("--output", choices=["json", "markdown"], default="markdown")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     recipes_dir = Path(args.recipes_dir)
     recipe_files = sorted(
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests"
@@ -12,6 +13,12 @@
 将内容保存到知识库，自动生成 embedding 和摘要
 """
 
+
+if __name__ == "__main__":
+    # 常驻守护进程（knowledge_daemon.py）在跑时直接转发给它并退出，省掉下面的重依赖导入和建连；否则照常在本进程执行
+    from knowledge_client import delegate
+    delegate("save")
+
 import argparse
 import json
 import os
@@ -20,62 +27,24 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
-import psycopg2
 import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
+from knowledge_bulk import bulk_upsert_knowledge
+from knowledge_db import Vector, connection, local_backend
+from knowledge_embedding import get_embedding, get_embeddings
+from knowledge_llm import chat_completion, map_ordered
+from memory_recall_cache import bump_generation
+
 # 加载环境变量
 load_dotenv(Path(__file__).parent.parent / ".env")
 
-# 配置
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
 # AI 摘要模型（龙猫，免费）
 AI_SUMMARY_MODEL = os.getenv("AI_SUMMARY_MODEL", "LongCat-Flash-Lite")
 LONGMAO_API_KEY = os.getenv("LONGMAO_API_KEY") or os.getenv("LONGCAT_API_KEY")
 LONGMAO_BASE_URL = os.getenv("LONGMAO_BASE_URL", "https://api.longcat.chat/openai")
 
 
-def get_embedding(text: str) -> list[float]:
-    """调用 SiliconFlow API 生成 embedding"""
-    if not SILICONFLOW_API_KEY:
-        print("Warning: SILICONFLOW_API_KEY not set, skipping embedding", file=sys.stderr)
-        return None
-
-    # 截断超长文本（SiliconFlow 限制约 8000 tokens）
-    max_chars = 8000
-    text = text[:max_chars]
-
-    try:
-        response = requests.post(
-            "https://api.siliconflow.cn/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text,
-                "encoding_format": "float",
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        print(f"Error generating embedding: {e}", file=sys.stderr)
-        return None
-
-
 def generate_summary(title: str, content: str) -> str:
     """生成摘要（内容过长时截断）"""
     if len(content) <= 500:
@@ -123,38 +92,45 @@ def generate_ai_summary(title: str, content: str) -> str:
 一句话总结："""
 
     try:
-        response = requests.post(
-            f"{LONGMAO_BASE_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {LONGMAO_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": AI_SUMMARY_MODEL,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 100,
-                "temperature": 0.3,
-            },
-            timeout=30,
+        return chat_completion(
+            prompt,
+            api_key=LONGMAO_API_KEY,
+            base_url=LONGMAO_BASE_URL,
+            model=AI_SUMMARY_MODEL,
+            max_tokens=100,
+            temperature=0.3,
         )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
     except Exception as e:
         print(f"Error generating AI summary: {e}; using fallback AI summary", file=sys.stderr)
         return fallback_ai_summary(title, content)
 
 
-def save_knowledge(
+UPSERT_KNOWLEDGE_SQL = """
+    INSERT INTO knowledge_items
+    (source_type, source_id, source_url, title, content, summary, ai_summary, embedding, metadata)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (source_type, source_id) DO UPDATE
+    SET title = EXCLUDED.title,
+        content = EXCLUDED.content,
+        summary = EXCLUDED.summary,
+        ai_summary = EXCLUDED.ai_summary,
+        embedding = EXCLUDED.embedding,
+        metadata = EXCLUDED.metadata,
+        updated_at = NOW()
+    RETURNING id, created_at
+"""
+
+
+def prepare_knowledge(
     source_type: str,
     source_id: str,
     title: str,
     content: str,
     source_url: str = None,
     metadata: dict = None,
-    ai_summary: str = None,  # 可选，手动传入 AI 摘要
+    ai_summary: str = None,
 ) -> dict:
-    """保存知识到数据库"""
-
+    """生成摘要和 AI 摘要，返回待入库的字段（embedding 由调用方统一生成）"""
     # 生成摘要
     summary = generate_summary(title, content)
 
@@ -163,51 +139,46 @@ def save_knowledge(
         print("正在生成 AI 摘要...", file=sys.stderr)
         ai_summary = generate_ai_summary(title, content)
 
-    # 生成 embedding（使用 title + ai_summary，语义更精准）
-    embedding_text = f"{title}\n{ai_summary}" if ai_summary else f"{title}\n{summary}"
-    embedding = get_embedding(embedding_text)
-
-    # 连接数据库
-    conn = psycopg2.connect(**DB_CONFIG)
+    return {
+        "source_type": source_type,
+        "source_id": source_id,
+        "source_url": source_url,
+        "title": title,
+        "content": content,
+        "summary": summary,
+        "ai_summary": ai_summary,
+        "metadata": metadata,
+        # 生成 embedding 用 title + ai_summary，语义更精准
+        "embedding_text": f"{title}\n{ai_summary}" if ai_summary else f"{title}\n{summary}",
+    }
+
+
+def upsert_knowledge(conn, prepared: dict, embedding: list[float] | None) -> dict:
+    """写入一条已准备好的知识（单独提交，失败时回滚并返回错误）"""
     cur = conn.cursor()
-
     try:
-        # 构建 SQL（包含 ai_summary）
-        sql = """
-            INSERT INTO knowledge_items
-            (source_type, source_id, source_url, title, content, summary, ai_summary, embedding, metadata)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (source_type, source_id) DO UPDATE
-            SET title = EXCLUDED.title,
-                content = EXCLUDED.content,
-                summary = EXCLUDED.summary,
-                ai_summary = EXCLUDED.ai_summary,
-                embedding = EXCLUDED.embedding,
-                metadata = EXCLUDED.metadata,
-                updated_at = NOW()
-            RETURNING id, created_at
-        """
-        cur.execute(sql, (
-            source_type,
-            source_id,
-            source_url,
-            title,
-            content,
-            summary,
-            ai_summary,
-            str(embedding) if embedding else None,
-            psycopg2.extras.Json(metadata or {}),
+        cur.execute(UPSERT_KNOWLEDGE_SQL, (
+            prepared["source_type"],
+            prepared["source_id"],
+            prepared["source_url"],
+            prepared["title"],
+            prepared["content"],
+            prepared["summary"],
+            prepared["ai_summary"],
+            Vector(embedding) if embedding else None,
+            psycopg2.extras.Json(prepared["metadata"] or {}),
         ))
 
         result = cur.fetchone()
+        bump_generation(conn)
         conn.commit()
 
         return {
             "success": True,
             "id": str(result[0]),
             "created_at": result[1].isoformat(),
-            "summary": summary,
-            "ai_summary": ai_summary,
+            "summary": prepared["summary"],
+            "ai_summary": prepared["ai_summary"],
             "has_embedding": embedding is not None,
         }
     except Exception as e:
@@ -218,11 +189,70 @@ def save_knowledge(
         }
     finally:
         cur.close()
-        conn.close()
 
 
-def main():
-    parser = argparse.ArgumentParser(description="保存知识到知识库")
+def save_knowledge(
+    source_type: str,
+    source_id: str,
+    title: str,
+    content: str,
+    source_url: str = None,
+    metadata: dict = None,
+    ai_summary: str = None,  # 可选，手动传入 AI 摘要
+) -> dict:
+    """保存知识到数据库"""
+    prepared = prepare_knowledge(source_type, source_id, title, content, source_url, metadata, ai_summary)
+    embedding = get_embedding(prepared["embedding_text"])
+
+    if local_backend():
+        result = bulk_upsert_knowledge([{**prepared, "embedding": embedding}])[0]
+        if result["success"]:
+            result.update({
+                "summary": prepared["summary"],
+                "ai_summary": prepared["ai_summary"],
+                "has_embedding": embedding is not None,
+            })
+        return result
+
+    # 连接数据库
+    with connection() as conn:
+        return upsert_knowledge(conn, prepared, embedding)
+
+
+def save_knowledge_many(items: list[dict]) -> list[dict]:
+    """
+    批量保存知识：字段与 save_knowledge 的参数同名。
+    AI 摘要有界并发生成，embedding 打包成少量批量请求，多行 upsert 每批一个事务（见 knowledge_bulk.py），结果与输入顺序一致。
+    """
+    prepared = map_ordered(
+        lambda item: prepare_knowledge(
+            source_type=item["source_type"],
+            source_id=item["source_id"],
+            title=item["title"],
+            content=item["content"],
+            source_url=item.get("source_url"),
+            metadata=item.get("metadata"),
+            ai_summary=item.get("ai_summary"),
+        ),
+        items,
+    )
+    embeddings = get_embeddings([p["embedding_text"] for p in prepared])
+
+    written = bulk_upsert_knowledge([{**p, "embedding": embedding} for p, embedding in zip(prepared, embeddings)])
+    results = []
+    for p, embedding, result in zip(prepared, embeddings, written):
+        if result["success"]:
+            result.update({
+                "summary": p["summary"],
+                "ai_summary": p["ai_summary"],
+                "has_embedding": embedding is not None,
+            })
+        results.append(result)
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog=Path(__file__).name, description="保存知识到知识库")
     parser.add_argument("--source-type", required=True, help="来源类型")
     parser.add_argument("--source-id", required=True, help="来源ID")
     parser.add_argument("--title", required=True, help="标题")
@@ -231,7 +261,7 @@ def main():
     parser.add_argument("--metadata", help="元数据 (JSON)")
     parser.add_argument("--ai-summary", help="AI 摘要（可选，不传则自动生成）")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # 解析 metadata
     metadata = None
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests"
@@ -12,98 +13,60 @@
 支持关键词搜索、向量语义搜索、混合搜索
 """
 
+
+if __name__ == "__main__":
+    # 常驻守护进程（knowledge_daemon.py）在跑时直接转发给它并退出，省掉下面的重依赖导入和建连；否则照常在本进程执行
+    from knowledge_client import delegate
+    delegate("search")
+
 import argparse
 import json
-import os
 import sys
 from pathlib import Path
 
-import psycopg2
 import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
+from knowledge_db import Vector, connection, local_backend
+from knowledge_embedding import get_embedding
+from knowledge_fts import keyword_clause
+from knowledge_hybrid import KEYWORD_WEIGHT, VECTOR_WEIGHT, hybrid_search
+from knowledge_local_store import get_store
+
 # 加载环境变量
 load_dotenv(Path(__file__).parent.parent / ".env")
 
-# 配置
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
-
-
-def get_embedding(text: str) -> list[float]:
-    """调用 SiliconFlow API 生成 embedding"""
-    if not SILICONFLOW_API_KEY:
-        return None
-
-    try:
-        response = requests.post(
-            "https://api.siliconflow.cn/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text[:8000],
-                "encoding_format": "float",
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        print(f"Error generating embedding: {e}", file=sys.stderr)
-        return None
-
 
 def search_keyword(query: str, limit: int = 10, source_type: str = None) -> list[dict]:
-    """关键词搜索（分词后逐词 OR 匹配）"""
-    # 分词：按空格拆分，每词单独匹配
-    words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
-    if not words:
-        words = [query]
-
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        # 每个词生成 OR 条件
-        conditions = []
-        params = []
-        for word in words:
-            conditions.append("(title ILIKE %s OR content ILIKE %s)")
-            params.extend([f"%{word}%", f"%{word}%"])
-
-        sql = f"""
-            SELECT id, source_type, source_id, source_url, title, summary,
-                   created_at, updated_at, status
-            FROM knowledge_items
-            WHERE ({" OR ".join(conditions)})
-        """
-
-        if source_type:
-            sql += " AND source_type = %s"
-            params.append(source_type)
-
-        sql += " ORDER BY status='active' DESC, created_at DESC LIMIT %s"
-        params.append(limit)
-
-        cur.execute(sql, params)
-        results = cur.fetchall()
-
-        return [dict(r) for r in results]
-    finally:
-        cur.close()
-        conn.close()
+    """关键词搜索（分词后逐词 OR 匹配，按 BM25 相关度排序）"""
+    if local_backend():
+        return get_store().search_keyword(query, limit=limit, source_type=source_type)
+
+    with connection() as conn:
+        # 已迁移时走 GIN 全文索引 + BM25 排序，否则回退到逐词 ILIKE
+        kw = keyword_clause(conn, "knowledge_items", query, ("title", "content"))
+        params = dict(kw.params, limit=limit, source_type=source_type)
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            sql = f"""
+                SELECT id, source_type, source_id, source_url, title, summary,
+                       created_at, updated_at, status, {kw.rank} AS score
+                FROM knowledge_items
+                WHERE {kw.where}
+            """
+
+            if source_type:
+                sql += " AND source_type = %(source_type)s"
+
+            sql += " ORDER BY status='active' DESC, score DESC, created_at DESC LIMIT %(limit)s"
+
+            cur.execute(sql, params)
+            results = cur.fetchall()
+
+            return [dict(r) for r in results]
+        finally:
+            cur.close()
 
 
 def search_vector(query: str, limit: int = 10, source_type: str = None) -> list[dict]:
@@ -113,85 +76,68 @@ def search_vector(query: str, limit: int = 10, source_type: str = None) -> list[
         print("Error: Could not generate embedding for query", file=sys.stderr)
         return []
 
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        sql = """
-            SELECT id, source_type, source_id, source_url, title, summary,
-                   created_at, updated_at,
-                   1 - (embedding <=> %s::vector) as similarity
-            FROM knowledge_items
-            WHERE embedding IS NOT NULL
-        """
-        params = [str(embedding)]
-
-        if source_type:
-            sql += " AND source_type = %s"
-            params.append(source_type)
-
-        sql += " ORDER BY embedding <=> %s::vector LIMIT %s"
-        params.extend([str(embedding), limit])
-
-        cur.execute(sql, params)
-        results = cur.fetchall()
-
-        return [dict(r) for r in results]
-    finally:
-        cur.close()
-        conn.close()
+    if local_backend():
+        return get_store().search_vector(embedding, limit=limit, source_type=source_type)
 
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-def search_hybrid(query: str, limit: int = 10, source_type: str = None) -> list[dict]:
-    """混合搜索：关键词 + 向量"""
-    # 向量搜索
-    vector_results = search_vector(query, limit=limit * 2, source_type=source_type)
+        try:
+            # 查询向量只绑定一次：放进内联 CTE，相似度和排序共用（排序仍走向量索引）
+            sql = """
+                WITH q AS (SELECT %s AS v)
+                SELECT id, source_type, source_id, source_url, title, summary,
+                       created_at, updated_at,
+                       1 - (embedding <=> q.v) as similarity
+                FROM knowledge_items, q
+                WHERE embedding IS NOT NULL
+            """
+            params = [Vector(embedding)]
 
-    # 关键词搜索
-    keyword_results = search_keyword(query, limit=limit * 2, source_type=source_type)
+            if source_type:
+                sql += " AND source_type = %s"
+                params.append(source_type)
 
-    # 合并结果（简单的去重和排序）
-    seen_ids = set()
-    combined = []
+            sql += " ORDER BY embedding <=> q.v LIMIT %s"
+            params.append(limit)
 
-    # 优先向量搜索结果
-    for r in vector_results:
-        if r["id"] not in seen_ids:
-            r["search_type"] = "vector"
-            combined.append(r)
-            seen_ids.add(r["id"])
+            cur.execute(sql, params)
+            results = cur.fetchall()
 
-    # 补充关键词搜索结果
-    for r in keyword_results:
-        if r["id"] not in seen_ids:
-            r["search_type"] = "keyword"
-            r["similarity"] = None
-            combined.append(r)
-            seen_ids.add(r["id"])
+            return [dict(r) for r in results]
+        finally:
+            cur.close()
 
-    # 按 similarity 排序（有 similarity 的排前面）
-    combined.sort(key=lambda x: x.get("similarity") or 0, reverse=True)
 
-    return combined[:limit]
+def search_hybrid(query: str, limit: int = 10, source_type: str = None,
+                  vector_weight: float = VECTOR_WEIGHT, keyword_weight: float = KEYWORD_WEIGHT) -> list[dict]:
+    """混合搜索：embedding 请求与关键词查询并发，两路结果按 RRF 融合（见 knowledge_hybrid）"""
+    return hybrid_search(query, limit=limit, source_type=source_type,
+                         vector_weight=vector_weight, keyword_weight=keyword_weight).results
 
 
-def main():
-    parser = argparse.ArgumentParser(description="搜索知识库")
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog=Path(__file__).name, description="搜索知识库")
     parser.add_argument("--query", required=True, help="搜索关键词")
     parser.add_argument("--mode", choices=["keyword", "vector", "hybrid"],
                        default="hybrid", help="搜索模式")
     parser.add_argument("--limit", type=int, default=10, help="返回数量")
     parser.add_argument("--source-type", help="筛选来源类型")
+    parser.add_argument("--vector-weight", type=float, default=VECTOR_WEIGHT, help="混合搜索中向量一路的 RRF 权重")
+    parser.add_argument("--keyword-weight", type=float, default=KEYWORD_WEIGHT, help="混合搜索中关键词一路的 RRF 权重")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # 搜索
+    timings = None
     if args.mode == "keyword":
         results = search_keyword(args.query, args.limit, args.source_type)
     elif args.mode == "vector":
         results = search_vector(args.query, args.limit, args.source_type)
     else:
-        results = search_hybrid(args.query, args.limit, args.source_type)
+        hybrid = hybrid_search(args.query, args.limit, args.source_type,
+                               vector_weight=args.vector_weight, keyword_weight=args.keyword_weight)
+        results, timings = hybrid.results, hybrid.timings
 
     # 格式化输出
     output = {
@@ -200,6 +146,8 @@ def main():
         "total": len(results),
         "results": results,
     }
+    if timings is not None:
+        output["timings_ms"] = timings
 
     print(json.dumps(output, ensure_ascii=False, indent=2, default=str))
 
@@ -14,7 +14,7 @@
 import argparse
 import json
 
-from knowledge_save import save_knowledge
+from knowledge_save import save_knowledge_many
 
 
 DEMO_ITEMS = [
@@ -78,16 +78,21 @@ Weaviate 的优势是自带更多 AI 管道能力，例如对象模型、向量
 
 
 def seed_demo_items() -> dict:
+    saved = save_knowledge_many(
+        [
+            {
+                "source_type": item["source_type"],
+                "source_id": item["source_id"],
+                "title": item["title"],
+                "content": item["content"],
+                "metadata": item["metadata"],
+                "ai_summary": item["ai_summary"],
+            }
+            for item in DEMO_ITEMS
+        ]
+    )
     results = []
-    for item in DEMO_ITEMS:
-        result = save_knowledge(
-            source_type=item["source_type"],
-            source_id=item["source_id"],
-            title=item["title"],
-            content=item["content"],
-            metadata=item["metadata"],
-            ai_summary=item["ai_summary"],
-        )
+    for item, result in zip(DEMO_ITEMS, saved):
         results.append(
             {
                 "source_type": item["source_type"],
@@ -104,9 +109,9 @@ def seed_demo_items() -> dict:
     return {"seeded": len(results), "results": results}
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="写入更厚实的 showcase 演示知识")
-    parser.parse_args()
+    parser.parse_args(argv)
     print(json.dumps(seed_demo_items(), ensure_ascii=False, indent=2))
 
 
@@ -30,11 +30,11 @@ DEFAULT_DOCS = [
 ]
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="导入更适合 wiki 编译线的 docs 知识种子")
     parser.add_argument("--path", action="append", help="额外指定 markdown 路径，可重复传入")
     parser.add_argument("--dry-run", action="store_true", help="只解析，不写库")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     paths = [str(REPO_ROOT / item) for item in DEFAULT_DOCS]
     if args.path:
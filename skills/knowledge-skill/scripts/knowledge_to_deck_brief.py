@@ -451,7 +451,7 @@ def generate_deck_brief(
     }
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="从知识库候选生成知识卡片和 deck brief")
     parser.add_argument("--query", required=True, help="主题或查询词")
     parser.add_argument("--mode", choices=["keyword", "vector", "hybrid"], default="hybrid", help="搜索模式")
@@ -465,7 +465,7 @@ def main():
     parser.add_argument("--excluded-term", action="append", help="需要排除的关键词，可重复传入")
     parser.add_argument("--output", choices=["json", "markdown"], default="json", help="输出格式")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = generate_deck_brief(
         query=args.query,
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+# ]
+# ///
+"""
+进程内向量计算（NumPy）
+把 embedding 一次性读成连续的 float32 矩阵（按行归一化），相似度用矩阵乘法算，
+代替 pgvector 上无法走索引的 O(n²) 自连接。
+
+- parse_vector / embedding_matrix: pgvector 文本 '[0.1,0.2,...]' → float32 向量 / 归一化矩阵
+- format_vector: float32 向量 → 紧凑的 pgvector 文本（SQL 参数用，见 knowledge_db.Vector）
+- similar_pairs: 分块矩阵乘法找出所有相似度 ≥ 阈值的卡片对（精确结果，不是近似）
+- VectorIndex: 可追加的归一化矩阵，一次矩阵-向量乘法找最近邻（整理时批内去重用）
+
+分块大小 2048 时每块相似度矩阵只有 16MB，10 万张卡片也不会一次性占满内存。
+"""
+
+from typing import Any, Iterable
+
+import numpy as np
+
+PAIR_BLOCK_SIZE = 2048
+
+# float32 矩阵乘法的累计误差远小于这个余量；余量内的候选对再用 float64 复核，保证阈值边界与 SQL 一致
+_THRESHOLD_MARGIN = 1e-4
+
+# 维度 → format_vector 的格式串（一次 % 运算格式化整条向量）
+_VECTOR_FORMATS: dict[int, str] = {}
+
+
+def parse_vector(value: Any) -> np.ndarray:
+    """pgvector 的文本表示（或已是序列）→ float32 向量"""
+    if isinstance(value, str):
+        return np.fromstring(value.strip()[1:-1], sep=",", dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def format_vector(values: Any) -> str:
+    """
+    float32 向量 → pgvector 文本 '[...]'。%.9g 足以让 float32 精确往返，
+    比 str(list[float]) 的 float64 全精度短约 40%，服务端解析也更快。
+    """
+    vector = np.asarray(values, dtype=np.float32).ravel()
+    template = _VECTOR_FORMATS.get(len(vector))
+    if template is None:
+        template = _VECTOR_FORMATS[len(vector)] = "[" + ",".join(["%.9g"] * len(vector)) + "]"
+    return template % tuple(vector.tolist())
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def embedding_matrix(values: Iterable[Any], dim: int | None = None) -> np.ndarray:
+    """把一组 embedding 拼成按行归一化的连续 float32 矩阵"""
+    vectors = [parse_vector(value) for value in values]
+    if not vectors:
+        return np.zeros((0, dim or 0), dtype=np.float32)
+    return np.ascontiguousarray(normalize_rows(np.vstack(vectors)), dtype=np.float32)
+
+
+def _exact_similarity(matrix: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    a = matrix[rows].astype(np.float64)
+    b = matrix[cols].astype(np.float64)
+    return np.einsum("ij,ij->i", a, b) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def similar_pairs(
+    matrix: np.ndarray,
+    threshold: float,
+    inclusive: bool = True,
+    block_size: int = PAIR_BLOCK_SIZE,
+) -> list[tuple[int, int, float]]:
+    """
+    找出归一化矩阵中所有 i < j 且相似度 ≥ threshold（inclusive=False 时为 >）的行对。
+    返回 (i, j, similarity)，按相似度降序。
+    """
+    n = len(matrix)
+    found_rows: list[np.ndarray] = []
+    found_cols: list[np.ndarray] = []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = matrix[start:stop]
+        # 只算上三角：列块从当前行块开始
+        for col_start in range(start, n, block_size):
+            col_stop = min(col_start + block_size, n)
+            sims = block @ matrix[col_start:col_stop].T
+            rows, cols = np.nonzero(sims >= threshold - _THRESHOLD_MARGIN)
+            rows += start
+            cols += col_start
+            upper = rows < cols
+            found_rows.append(rows[upper])
+            found_cols.append(cols[upper])
+
+    if not found_rows:
+        return []
+    rows = np.concatenate(found_rows)
+    cols = np.concatenate(found_cols)
+    if rows.size == 0:
+        return []
+
+    exact = _exact_similarity(matrix, rows, cols)
+    keep = exact >= threshold if inclusive else exact > threshold
+    rows, cols, exact = rows[keep], cols[keep], exact[keep]
+    order = np.argsort(-exact, kind="stable")
+    return [(int(rows[k]), int(cols[k]), float(exact[k])) for k in order]
+
+
+class VectorIndex:
+    """
+    可追加的归一化向量矩阵（精确最近邻）。
+    预留容量按倍数增长，追加是摊还 O(1)；查询是一次矩阵-向量乘法。
+    不传 dim 时按第一条向量的长度定维度（不绑定具体的 embedding 模型）。
+    """
+
+    def __init__(self, dim: int | None = None, capacity: int = 1024):
+        self.dim = dim
+        self.ids: list[str] = []
+        self._capacity = max(1, capacity)
+        self._matrix = np.zeros((self._capacity, dim), dtype=np.float32) if dim else None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[str, Any]], dim: int | None = None) -> "VectorIndex":
+        rows = list(rows)
+        index = cls(capacity=max(1024, len(rows) * 2))
+        if rows:
+            matrix = embedding_matrix(value for _, value in rows)
+            index._allocate(matrix.shape[1])
+            index._matrix[:len(rows)] = matrix
+            index.ids = [str(row_id) for row_id, _ in rows]
+        elif dim:
+            index._allocate(dim)
+        return index
+
+    def _allocate(self, dim: int) -> None:
+        self.dim = dim
+        self._matrix = np.zeros((self._capacity, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, row_id: str, vector: Any) -> None:
+        vector = parse_vector(vector)
+        if self._matrix is None:
+            self._allocate(len(vector))
+        if len(vector) != self.dim:
+            raise ValueError(f"向量维度 {len(vector)} 与索引维度 {self.dim} 不一致")
+        if len(self.ids) == len(self._matrix):
+            grown = np.zeros((len(self._matrix) * 2, self.dim), dtype=np.float32)
+            grown[:len(self.ids)] = self._matrix[:len(self.ids)]
+            self._matrix = grown
+        self._matrix[len(self.ids)] = normalize_rows(vector.reshape(1, -1))[0]
+        self.ids.append(str(row_id))
+
+    def nearest(self, vector: Any) -> tuple[str, float] | None:
+        """返回 (最相似的 id, 余弦相似度)；索引为空时返回 None"""
+        query = parse_vector(vector)
+        # 换了 embedding 模型时旧卡片的维度对不上，没法比较，当作没有相似卡片
+        if not self.ids or len(query) != self.dim:
+            return None
+        query = normalize_rows(query.reshape(1, -1))[0]
+        sims = self._matrix[:len(self.ids)] @ query
+        best = int(np.argmax(sims))
+        return self.ids[best], float(sims[best])
@@ -16,7 +16,6 @@ Wiki Coverage Report — 桥接 raw 知识池和 wiki 编译产出的覆盖率
 
 import argparse
 import json
-import os
 import re
 from datetime import datetime
 from pathlib import Path
@@ -24,6 +23,8 @@ from typing import Any
 
 from dotenv import load_dotenv
 
+from knowledge_file_cache import FileCache
+
 load_dotenv(Path(__file__).parent.parent / ".env")
 load_dotenv(Path.home() / ".openclaw" / "secrets.env")
 
@@ -81,9 +82,9 @@ def scan_wiki(wiki_dir: Path) -> dict[str, Any]:
     if not wiki_pages_dir.exists():
         return {"pages": [], "source_pages": [], "concept_pages": [], "entity_pages": []}
 
-    pages = []
-    for path in sorted(wiki_pages_dir.glob("*.md")):
-        pages.append(read_page_summary(path))
+    # 只有 mtime / size 变了的页面才重新读取解析
+    with FileCache(wiki_dir) as cache:
+        pages = [cache.get(path, "wiki_coverage", read_page_summary) for path in sorted(wiki_pages_dir.glob("*.md"))]
 
     source_pages = [p for p in pages if p["type"] == "source"]
     concept_pages = [p for p in pages if p["type"] == "concept"]
@@ -109,58 +110,45 @@ def load_compile_state(wiki_dir: Path) -> dict[str, Any]:
 
 def query_pool_stats(compiled_ids: set[str]) -> dict[str, Any] | None:
     """尝试查询知识池统计。如果 DB 不可用则返回 None。"""
-    db_config = {
-        "host": os.getenv("DB_HOST", ""),
-        "port": int(os.getenv("DB_PORT", 5433)),
-        "user": os.getenv("DB_USER", ""),
-        "password": os.getenv("DB_PASSWORD", ""),
-        "dbname": os.getenv("DB_NAME", ""),
-    }
-
-    if not db_config["host"]:
-        return None
-
     try:
-        import psycopg2
         import psycopg2.extras
+        from knowledge_db import DB_CONFIG, connection
     except ImportError:
         return None
 
-    try:
-        conn = psycopg2.connect(**db_config)
-    except Exception:
+    if not DB_CONFIG["host"]:
         return None
 
     try:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        # 总量和按来源统计
-        cur.execute("""
-            SELECT source_type, count(*) as cnt,
-                   avg(length(content))::int as avg_content,
-                   count(CASE WHEN ai_summary IS NOT NULL AND ai_summary != '' THEN 1 END) as ai_count
-            FROM knowledge_items
-            WHERE status = 'active' OR status IS NULL
-            GROUP BY source_type
-            ORDER BY cnt DESC
-        """)
-        source_stats = [dict(row) for row in cur.fetchall()]
-
-        cur.execute("SELECT count(*) FROM knowledge_items WHERE status = 'active' OR status IS NULL")
-        total = cur.fetchone()["count"]
-
-        # 按 profile_score 分桶看哪些高价值条目还没编译
-        cur.execute("""
-            SELECT id, source_type, title, length(content) as content_len,
-                   ai_summary IS NOT NULL AND ai_summary != '' as has_ai
-            FROM knowledge_items
-            WHERE status = 'active' OR status IS NULL
-            ORDER BY created_at DESC
-        """)
-        all_items = [dict(row) for row in cur.fetchall()]
-
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+            # 总量和按来源统计
+            cur.execute("""
+                SELECT source_type, count(*) as cnt,
+                       avg(length(content))::int as avg_content,
+                       count(CASE WHEN ai_summary IS NOT NULL AND ai_summary != '' THEN 1 END) as ai_count
+                FROM knowledge_items
+                WHERE status = 'active' OR status IS NULL
+                GROUP BY source_type
+                ORDER BY cnt DESC
+            """)
+            source_stats = [dict(row) for row in cur.fetchall()]
+
+            cur.execute("SELECT count(*) FROM knowledge_items WHERE status = 'active' OR status IS NULL")
+            total = cur.fetchone()["count"]
+
+            # 按 profile_score 分桶看哪些高价值条目还没编译
+            cur.execute("""
+                SELECT id, source_type, title, length(content) as content_len,
+                       ai_summary IS NOT NULL AND ai_summary != '' as has_ai
+                FROM knowledge_items
+                WHERE status = 'active' OR status IS NULL
+                ORDER BY created_at DESC
+            """)
+            all_items = [dict(row) for row in cur.fetchall()]
+
+            cur.close()
 
         # 计算 profile_score
         scored_items = []
@@ -17,6 +17,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+from knowledge_file_cache import FileCache
 
 DEFAULT_WIKI_DIR = Path.home() / ".openclaw" / "workspace" / "llm-wiki"
 
@@ -183,7 +184,9 @@ def review_wiki(wiki_dir: Path) -> dict[str, Any]:
             "last_compile": state.get("last_compile"),
         }
 
-    pages = [read_page(path) for path in sorted(wiki_pages_dir.glob("*.md"))]
+    # 只有 mtime / size 变了的页面才重新读取解析
+    with FileCache(wiki_dir) as cache:
+        pages = [cache.get(path, "wiki_review", read_page) for path in sorted(wiki_pages_dir.glob("*.md"))]
     source_pages = [page for page in pages if page["type"] == "source"]
     concept_pages = [page for page in pages if page["type"] == "concept"]
     entity_pages = [page for page in pages if page["type"] == "entity"]
@@ -324,12 +327,12 @@ def maybe_write(content: str, path_str: str | None) -> None:
     path.write_text(content, encoding="utf-8")
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="体检 llm-wiki 编译结果")
     parser.add_argument("--wiki-dir", default=str(DEFAULT_WIKI_DIR), help="llm-wiki 根目录")
     parser.add_argument("--output", choices=["json", "markdown"], default="markdown")
     parser.add_argument("--write", help="把 markdown 结果写到指定路径")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = review_wiki(Path(args.wiki_dir).expanduser())
 
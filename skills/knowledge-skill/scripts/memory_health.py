@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 # ]
@@ -15,219 +16,285 @@
   uv run scripts/memory_health.py
   uv run scripts/memory_health.py --days 30 --output markdown
   uv run scripts/memory_health.py --write docs/wiki/reviews/memory-health.md
+  uv run scripts/memory_health.py --fast        # 只要计数器（定时任务看板）
+
+计数器一次扫描 memory_cards（按层 FILTER 聚合）；疑似重复用随机抽样 + 向量索引最近邻探测估计，不做全表两两比较。
 """
 
 import argparse
 import json
-import os
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
 
+from knowledge_db import connection
+from memory_recall_cache import cache_stats as recall_cache_stats
+
 load_dotenv(Path(__file__).parent.parent / ".env")
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
-
-def fetch_layer_stats() -> dict[str, Any]:
-    """各层卡片统计"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute(
-            """
-            SELECT
-                layer,
-                COUNT(*) AS total,
-                COUNT(*) FILTER (WHERE confidence > 0) AS active,
-                COUNT(*) FILTER (WHERE confidence = 0) AS archived,
-                COUNT(*) FILTER (WHERE embedding IS NOT NULL) AS has_embedding,
-                AVG(access_count)::numeric(10, 2) AS avg_access_count,
-                AVG(confidence)::numeric(10, 2) AS avg_confidence
-            FROM memory_cards
-            GROUP BY layer
-            ORDER BY layer
-            """
-        )
-        rows = [dict(row) for row in cur.fetchall()]
-
-        stats = {}
-        for row in rows:
-            layer = row["layer"]
-            label = {1: "L1-工作记忆", 2: "L2-领域知识", 3: "L3-原始存档"}.get(layer, f"L{layer}")
-            stats[label] = {
-                "total": int(row["total"] or 0),
-                "active": int(row["active"] or 0),
-                "archived": int(row["archived"] or 0),
-                "has_embedding": int(row["has_embedding"] or 0),
-                "avg_access_count": float(row["avg_access_count"] or 0),
-                "avg_confidence": float(row["avg_confidence"] or 0),
-            }
-        return stats
-    finally:
-        cur.close()
-        conn.close()
-
-
-def fetch_l1_expiry() -> list[dict[str, Any]]:
-    """即将过期的 L1 卡片"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute(
-            """
-            SELECT id, title, valid_until, access_count
-            FROM memory_cards
+
+LAYER_LABELS = {1: "L1-工作记忆", 2: "L2-领域知识", 3: "L3-原始存档"}
+
+# 疑似重复：余弦相似度阈值、抽样探测的卡片数、ivfflat 每次探测的聚类数
+DUPLICATE_THRESHOLD = 0.90
+# 10 万张卡片上每次探测约 3ms × probes；100 × 2 时约 0.6 秒，估计误差在几个百分点内
+DUPLICATE_SAMPLE_SIZE = 100
+DUPLICATE_IVFFLAT_PROBES = 2
+
+# 所有计数器一次扫描 memory_cards 算完（按层分组 + FILTER 聚合）
+LAYER_COUNTERS_SQL = """
+    SELECT
+        layer,
+        COUNT(*) AS total,
+        COUNT(*) FILTER (WHERE confidence > 0) AS active,
+        COUNT(*) FILTER (WHERE confidence = 0) AS archived,
+        COUNT(*) FILTER (WHERE embedding IS NOT NULL) AS has_embedding,
+        COUNT(*) FILTER (WHERE confidence > 0 AND embedding IS NOT NULL) AS active_with_embedding,
+        COUNT(*) FILTER (
             WHERE layer = 1 AND confidence > 0
-              AND valid_until IS NOT NULL
-              AND valid_until < NOW() + INTERVAL '3 days'
-            ORDER BY valid_until ASC
-            LIMIT 10
-            """
+              AND valid_until IS NOT NULL AND valid_until < NOW() + INTERVAL '3 days'
+        ) AS expiring,
+        COUNT(*) FILTER (
+            WHERE confidence > 0 AND access_count = 0 AND created_at < NOW() - INTERVAL '30 days'
+        ) AS cold,
+        COUNT(*) FILTER (WHERE created_at >= NOW() - make_interval(days => %(days)s)) AS created_recent,
+        COUNT(*) FILTER (WHERE last_accessed >= NOW() - make_interval(days => %(days)s)) AS accessed_recent,
+        AVG(access_count)::numeric(10, 2) AS avg_access_count,
+        AVG(confidence)::numeric(10, 2) AS avg_confidence
+    FROM memory_cards
+    GROUP BY layer
+    ORDER BY layer
+"""
+
+# 卡片 → 条目的关联先展开成 (card_id, item_id) 再哈希连接，代替 ki.id::text = ANY(mc.source_item_ids) 的嵌套循环
+SOURCE_COVERAGE_SQL = """
+    WITH links AS (
+        SELECT id AS card_id, unnest(source_item_ids) AS item_id
+        FROM memory_cards
+        WHERE confidence > 0
+    )
+    SELECT
+        ki.source_type,
+        COUNT(DISTINCT ki.id) AS total_items,
+        COUNT(DISTINCT links.card_id) AS organized_items
+    FROM knowledge_items ki
+    LEFT JOIN links ON links.item_id = ki.id::text
+    WHERE ki.status = 'active'
+    GROUP BY ki.source_type
+    ORDER BY total_items DESC
+"""
+
+# 随机抽一批卡片，每张用向量索引找最近的另一张卡片（LATERAL + ORDER BY <=> LIMIT 1 走 ANN 索引）。
+# LEFT JOIN：ivfflat 探测的聚类里没有其他卡片时（如空表上建的索引）也保留这张探针，id_b 为 NULL
+DUPLICATE_PROBE_SQL = """
+    WITH probes AS (
+        SELECT id, title, embedding
+        FROM memory_cards
+        WHERE id IN (
+            SELECT id FROM memory_cards
+            WHERE confidence > 0 AND embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT %(sample_size)s
         )
-        return [
-            {
-                "id": str(row["id"]),
-                "title": row["title"][:50],
-                "valid_until": row["valid_until"].isoformat() if row["valid_until"] else None,
-                "access_count": int(row["access_count"] or 0),
-            }
-            for row in cur.fetchall()
-        ]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def fetch_cold_cards() -> list[dict[str, Any]]:
+    )
+    SELECT p.id AS id_a, p.title AS title_a, n.id AS id_b, n.title AS title_b,
+           ROUND((1 - n.distance)::numeric, 4) AS similarity
+    FROM probes p
+    LEFT JOIN LATERAL (
+        SELECT c.id, c.title, c.embedding <=> p.embedding AS distance
+        FROM memory_cards c
+        WHERE c.id <> p.id AND c.confidence > 0 AND c.embedding IS NOT NULL
+        ORDER BY c.embedding <=> p.embedding
+        LIMIT 1
+    ) n ON true
+"""
+
+
+def fetch_layer_stats(conn=None, days: int = 30) -> dict[str, Any]:
+    """各层卡片统计（含即将过期 / 冷门 / 最近新增与被召回的计数），一次扫描"""
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            cur.execute(LAYER_COUNTERS_SQL, {"days": days})
+            stats = {}
+            for row in cur.fetchall():
+                layer = row["layer"]
+                stats[LAYER_LABELS.get(layer, f"L{layer}")] = {
+                    "total": int(row["total"] or 0),
+                    "active": int(row["active"] or 0),
+                    "archived": int(row["archived"] or 0),
+                    "has_embedding": int(row["has_embedding"] or 0),
+                    "active_with_embedding": int(row["active_with_embedding"] or 0),
+                    "expiring": int(row["expiring"] or 0),
+                    "cold": int(row["cold"] or 0),
+                    "created_recent": int(row["created_recent"] or 0),
+                    "accessed_recent": int(row["accessed_recent"] or 0),
+                    "avg_access_count": float(row["avg_access_count"] or 0),
+                    "avg_confidence": float(row["avg_confidence"] or 0),
+                }
+            return stats
+        finally:
+            cur.close()
+
+
+def fetch_l1_expiry(conn=None) -> list[dict[str, Any]]:
+    """即将过期的 L1 卡片"""
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            cur.execute(
+                """
+                SELECT id, title, valid_until, access_count
+                FROM memory_cards
+                WHERE layer = 1 AND confidence > 0
+                  AND valid_until IS NOT NULL
+                  AND valid_until < NOW() + INTERVAL '3 days'
+                ORDER BY valid_until ASC
+                LIMIT 10
+                """
+            )
+            return [
+                {
+                    "id": str(row["id"]),
+                    "title": row["title"][:50],
+                    "valid_until": row["valid_until"].isoformat() if row["valid_until"] else None,
+                    "access_count": int(row["access_count"] or 0),
+                }
+                for row in cur.fetchall()
+            ]
+        finally:
+            cur.close()
+
+
+def fetch_cold_cards(conn=None) -> list[dict[str, Any]]:
     """冷门卡片（access_count = 0 且超过 30 天）"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute(
-            """
-            SELECT id, layer, title, access_count, created_at
-            FROM memory_cards
-            WHERE confidence > 0
-              AND access_count = 0
-              AND created_at < NOW() - INTERVAL '30 days'
-            ORDER BY created_at ASC
-            LIMIT 10
-            """
-        )
-        return [
-            {
-                "id": str(row["id"]),
-                "layer": int(row["layer"]),
-                "title": row["title"][:50],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
-            }
-            for row in cur.fetchall()
-        ]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def fetch_duplicate_candidates() -> list[dict[str, Any]]:
-    """疑似重复卡片（cosine similarity > 0.90）"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute(
-            """
-            SELECT
-                a.id AS id_a, a.title AS title_a,
-                b.id AS id_b, b.title AS title_b,
-                ROUND((1 - (a.embedding <=> b.embedding))::numeric, 4) AS similarity
-            FROM memory_cards a
-            JOIN memory_cards b ON a.id < b.id
-            WHERE a.embedding IS NOT NULL AND b.embedding IS NOT NULL
-              AND a.confidence > 0 AND b.confidence > 0
-              AND 1 - (a.embedding <=> b.embedding) > 0.90
-            ORDER BY similarity DESC
-            LIMIT 10
-            """
-        )
-        return [
-            {
-                "id_a": str(row["id_a"]),
-                "title_a": row["title_a"][:40],
-                "id_b": str(row["id_b"]),
-                "title_b": row["title_b"][:40],
-                "similarity": float(row["similarity"] or 0),
-            }
-            for row in cur.fetchall()
-        ]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def fetch_source_coverage() -> dict[str, Any]:
-    """知识库 → 记忆卡片覆盖率"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute(
-            """
-            SELECT
-                ki.source_type,
-                COUNT(DISTINCT ki.id) AS total_items,
-                COUNT(DISTINCT mc.id) AS organized_items
-            FROM knowledge_items ki
-            LEFT JOIN memory_cards mc
-                ON ki.id::text = ANY(mc.source_item_ids) AND mc.confidence > 0
-            WHERE ki.status = 'active'
-            GROUP BY ki.source_type
-            ORDER BY total_items DESC
-            """
-        )
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            cur.execute(
+                """
+                SELECT id, layer, title, access_count, created_at
+                FROM memory_cards
+                WHERE confidence > 0
+                  AND access_count = 0
+                  AND created_at < NOW() - INTERVAL '30 days'
+                ORDER BY created_at ASC
+                LIMIT 10
+                """
+            )
+            return [
+                {
+                    "id": str(row["id"]),
+                    "layer": int(row["layer"]),
+                    "title": row["title"][:50],
+                    "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                }
+                for row in cur.fetchall()
+            ]
+        finally:
+            cur.close()
+
+
+def estimate_duplicates(conn=None, sample_size: int = DUPLICATE_SAMPLE_SIZE, population: int | None = None) -> dict[str, Any]:
+    """
+    抽样估计疑似重复（cosine similarity > DUPLICATE_THRESHOLD）：随机取 sample_size 张卡片做 ANN 最近邻探测，
+    命中比例 × 有 embedding 的活跃卡片数即估计值；命中的卡片对按相似度取前 10 作为候选。
+    代替全表两两自连接（卡片数平方级）。
+    """
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            # ivfflat 默认只探 1 个聚类，召回偏低；probes 调大后规划器可能改走顺序扫描（每次探测变成全表排序），
+            # 所以固定走索引。两个设置放在保存点里，探测完回滚到保存点即撤销，不影响调用方事务里之后的查询
+            cur.execute("SAVEPOINT duplicate_probe")
+            try:
+                cur.execute("SET LOCAL ivfflat.probes = %s", (DUPLICATE_IVFFLAT_PROBES,))
+                cur.execute("SET LOCAL enable_seqscan = off")
+                cur.execute(DUPLICATE_PROBE_SQL, {"sample_size": sample_size})
+                rows = cur.fetchall()
+            finally:
+                cur.execute("ROLLBACK TO SAVEPOINT duplicate_probe")
+                cur.execute("RELEASE SAVEPOINT duplicate_probe")
+        finally:
+            cur.close()
+
+    # 分母是实际抽到的探针数（含没找到近邻的）
+    hits = [row for row in rows if row["id_b"] is not None and float(row["similarity"]) > DUPLICATE_THRESHOLD]
+    rate = len(hits) / len(rows) if rows else 0.0
+
+    candidates: dict[tuple[str, str], dict[str, Any]] = {}
+    for row in sorted(hits, key=lambda row: row["similarity"], reverse=True):
+        pair = tuple(sorted((str(row["id_a"]), str(row["id_b"]))))
+        candidates.setdefault(pair, {
+            "id_a": str(row["id_a"]),
+            "title_a": row["title_a"][:40],
+            "id_b": str(row["id_b"]),
+            "title_b": row["title_b"][:40],
+            "similarity": float(row["similarity"] or 0),
+        })
 
-        coverage = []
-        for row in cur.fetchall():
-            total = int(row["total_items"] or 0)
-            organized = int(row["organized_items"] or 0)
-            coverage.append({
-                "source_type": row["source_type"],
-                "total_items": total,
-                "organized_items": organized,
-                "coverage_rate": round(organized / total * 100, 1) if total > 0 else 0,
-            })
-
-        return {"sources": coverage}
-    finally:
-        cur.close()
-        conn.close()
-
-
-def generate_health_report(days: int = 30) -> dict[str, Any]:
-    """生成完整的健康度报告"""
-    layer_stats = fetch_layer_stats()
-    expiring = fetch_l1_expiry()
-    cold = fetch_cold_cards()
-    duplicates = fetch_duplicate_candidates()
-    coverage = fetch_source_coverage()
+    return {
+        "sampled": len(rows),
+        "no_neighbour": sum(row["id_b"] is None for row in rows),
+        "hits": len(hits),
+        "rate": round(rate, 4),
+        "estimated_cards": round(rate * population) if population is not None else None,
+        "threshold": DUPLICATE_THRESHOLD,
+        "candidates": list(candidates.values())[:10],
+    }
+
+
+def fetch_source_coverage(conn=None) -> dict[str, Any]:
+    """知识库 → 记忆卡片覆盖率"""
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            cur.execute(SOURCE_COVERAGE_SQL)
+
+            coverage = []
+            for row in cur.fetchall():
+                total = int(row["total_items"] or 0)
+                organized = int(row["organized_items"] or 0)
+                coverage.append({
+                    "source_type": row["source_type"],
+                    "total_items": total,
+                    "organized_items": organized,
+                    "coverage_rate": round(organized / total * 100, 1) if total > 0 else 0,
+                })
+
+            return {"sources": coverage}
+        finally:
+            cur.close()
+
+
+def generate_health_report(days: int = 30, fast: bool = False) -> dict[str, Any]:
+    """
+    生成完整的健康度报告。
+    fast=True（定时任务看板用）只算计数器和覆盖率，跳过即将过期 / 冷门卡片明细和重复抽样探测。
+    """
+    with connection() as conn:
+        layer_stats = fetch_layer_stats(conn=conn, days=days)
+        coverage = fetch_source_coverage(conn=conn)
+        recall_cache = recall_cache_stats(conn=conn)
+        expiring = [] if fast else fetch_l1_expiry(conn=conn)
+        cold = [] if fast else fetch_cold_cards(conn=conn)
+        population = sum(s["active_with_embedding"] for s in layer_stats.values())
+        duplicates = None if fast else estimate_duplicates(conn=conn, population=population)
 
     # 汇总指标
     total_cards = sum(s["total"] for s in layer_stats.values())
     active_cards = sum(s["active"] for s in layer_stats.values())
+    expiring_count = sum(s["expiring"] for s in layer_stats.values())
+    cold_count = sum(s["cold"] for s in layer_stats.values())
     total_coverage = 0
     all_sources = coverage.get("sources", [])
     if all_sources:
@@ -244,11 +311,20 @@ def generate_health_report(days: int = 30) -> dict[str, Any]:
     if l1_stats.get("total", 0) > 20:
         actions.append("L1 工作记忆条目过多，建议运行 memory_compress.py 降级过期条目。")
 
-    if cold:
-        actions.append(f"有 {len(cold)} 张冷门卡片超过 30 天未被召回，考虑归档或补充。")
+    if cold_count:
+        actions.append(f"有 {cold_count} 张冷门卡片超过 30 天未被召回，考虑归档或补充。")
+
+    if duplicates and duplicates["hits"]:
+        actions.append(
+            f"抽样 {duplicates['sampled']} 张卡片中 {duplicates['hits']} 张有疑似重复，"
+            f"估计全库约 {duplicates['estimated_cards']} 张，运行 memory_compress.py 合并。"
+        )
 
-    if duplicates:
-        actions.append(f"有 {len(duplicates)} 对疑似重复卡片，运行 memory_compress.py 合并。")
+    if duplicates and duplicates["sampled"] and duplicates["no_neighbour"] * 2 > duplicates["sampled"]:
+        actions.append(
+            f"抽样 {duplicates['sampled']} 张卡片中 {duplicates['no_neighbour']} 张在向量索引里找不到近邻，"
+            "ivfflat 索引可能建在空表上，数据导入后执行 REINDEX INDEX idx_memory_cards_embedding。"
+        )
 
     if total_coverage < 30:
         actions.append(f"知识库→记忆卡片覆盖率仅 {total_coverage}%，运行 memory_organize.py 扩充 L2。")
@@ -259,17 +335,22 @@ def generate_health_report(days: int = 30) -> dict[str, Any]:
     return {
         "generated_at": datetime.now().isoformat(),
         "days": days,
+        "fast": fast,
         "summary": {
             "total_cards": total_cards,
             "active_cards": active_cards,
             "archived_cards": total_cards - active_cards,
+            "expiring_l1_cards": expiring_count,
+            "cold_cards": cold_count,
             "knowledge_coverage": total_coverage,
         },
         "layer_stats": layer_stats,
         "expiring_l1": expiring,
         "cold_cards": cold,
-        "duplicate_candidates": duplicates,
+        "duplicate_estimate": duplicates and {k: v for k, v in duplicates.items() if k != "candidates"},
+        "duplicate_candidates": duplicates["candidates"] if duplicates else [],
         "source_coverage": coverage,
+        "recall_cache": recall_cache,
         "next_actions": actions,
     }
 
@@ -289,18 +370,20 @@ def render_markdown(result: dict[str, Any]) -> str:
     lines.append(f"| Total cards | {summary.get('total_cards', 0)} |")
     lines.append(f"| Active cards | {summary.get('active_cards', 0)} |")
     lines.append(f"| Archived cards | {summary.get('archived_cards', 0)} |")
+    lines.append(f"| Expiring L1 cards (3 days) | {summary.get('expiring_l1_cards', 0)} |")
+    lines.append(f"| Cold cards (>30 days, 0 accesses) | {summary.get('cold_cards', 0)} |")
     lines.append(f"| Knowledge coverage | {summary.get('knowledge_coverage', 0)}% |")
     lines.append("")
 
     # 分层统计
     lines.append("## Layer Stats")
     lines.append("")
-    lines.append("| Layer | Total | Active | Archived | Has Embedding | Avg Confidence |")
-    lines.append("| --- | ---: | ---: | ---: | ---: | ---: |")
+    lines.append(f"| Layer | Total | Active | Archived | Has Embedding | New ({result['days']}d) | Accessed ({result['days']}d) | Avg Confidence |")
+    lines.append("| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
     for layer_name, stats in result.get("layer_stats", {}).items():
         lines.append(
             f"| {layer_name} | {stats['total']} | {stats['active']} | {stats['archived']} "
-            f"| {stats['has_embedding']} | {stats['avg_confidence']} |"
+            f"| {stats['has_embedding']} | {stats['created_recent']} | {stats['accessed_recent']} | {stats['avg_confidence']} |"
         )
     lines.append("")
 
@@ -315,6 +398,20 @@ def render_markdown(result: dict[str, Any]) -> str:
             lines.append(f"| {s['source_type']} | {s['total_items']} | {s['organized_items']} | {s['coverage_rate']}% |")
         lines.append("")
 
+    # 召回缓存
+    cache = result.get("recall_cache")
+    if cache and cache.get("enabled"):
+        hit_rate = cache.get("hit_rate")
+        lines.append("## Recall Cache")
+        lines.append("")
+        lines.append("| Entries | Hits | Misses | Hit Rate | Generation |")
+        lines.append("| ---: | ---: | ---: | ---: | ---: |")
+        lines.append(
+            f"| {cache.get('entries', 0)} | {cache.get('hits', 0)} | {cache.get('misses', 0)} "
+            f"| {'-' if hit_rate is None else f'{hit_rate:.1%}'} | {cache.get('generation')} |"
+        )
+        lines.append("")
+
     # 过期 L1
     expiring = result.get("expiring_l1", [])
     if expiring:
@@ -334,9 +431,15 @@ def render_markdown(result: dict[str, Any]) -> str:
         lines.append("")
 
     # 疑似重复
+    estimate = result.get("duplicate_estimate")
     duplicates = result.get("duplicate_candidates", [])
-    if duplicates:
-        lines.append("## Duplicate Candidates (similarity > 0.90)")
+    if estimate and estimate["hits"]:
+        lines.append(f"## Duplicate Candidates (similarity > {estimate['threshold']:.2f})")
+        lines.append("")
+        lines.append(
+            f"Sampled {estimate['sampled']} cards, {estimate['hits']} with a near-duplicate "
+            f"(~{estimate['estimated_cards']} cards estimated overall)."
+        )
         lines.append("")
         for pair in duplicates:
             lines.append(f"- **{pair['title_a']}** ↔ **{pair['title_b']}** (sim={pair['similarity']})")
@@ -351,14 +454,15 @@ def render_markdown(result: dict[str, Any]) -> str:
     return "\n".join(lines).strip() + "\n"
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="记忆健康度报告")
     parser.add_argument("--days", type=int, default=30, help="统计最近多少天的数据")
     parser.add_argument("--output", choices=["json", "markdown"], default="json")
     parser.add_argument("--write", help="把 markdown 结果写入指定路径")
-    args = parser.parse_args()
+    parser.add_argument("--fast", action="store_true", help="只算计数器和覆盖率（定时任务看板用），跳过明细列表和重复抽样")
+    args = parser.parse_args(argv)
 
-    result = generate_health_report(days=args.days)
+    result = generate_health_report(days=args.days, fast=args.fast)
 
     if args.output == "markdown" or args.write:
         md = render_markdown(result)
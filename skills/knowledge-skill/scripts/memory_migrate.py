@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 # ]
@@ -14,22 +15,16 @@ memory_cards 表迁移脚本
 
 import argparse
 import json
-import os
 import sys
 from pathlib import Path
 
 import psycopg2
 from dotenv import load_dotenv
 
-load_dotenv(Path(__file__).parent.parent / ".env")
+from knowledge_db import DB_CONFIG
+from memory_recall_cache import CREATE_GENERATION_SQL
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
+load_dotenv(Path(__file__).parent.parent / ".env")
 
 CREATE_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS memory_cards (
@@ -99,6 +94,7 @@ DROP TABLE IF EXISTS memory_cards CASCADE;
 
 
 def run_migrate(drop: bool = False) -> dict:
+    # DDL 走 autocommit 的独立连接，不占用也不污染连接池
     conn = psycopg2.connect(**DB_CONFIG)
     conn.autocommit = True
     cur = conn.cursor()
@@ -114,6 +110,9 @@ def run_migrate(drop: bool = False) -> dict:
         print("Creating indexes...", file=sys.stderr)
         cur.execute(CREATE_INDEXES_SQL)
 
+        # 召回结果缓存的代数计数器（见 memory_recall_cache.py）
+        cur.execute(CREATE_GENERATION_SQL)
+
         # 验证表存在
         cur.execute("""
             SELECT column_name, data_type
@@ -143,10 +142,10 @@ def run_migrate(drop: bool = False) -> dict:
         conn.close()
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="创建 memory_cards 分层记忆表")
     parser.add_argument("--drop", action="store_true", help="先删除已有表（危险操作，会丢失数据）")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = run_migrate(drop=args.drop)
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests",
@@ -23,28 +24,24 @@ import json
 import os
 import re
 import sys
+import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
+from knowledge_bulk import bulk_insert_memory_cards
+from knowledge_db import connection, local_backend
+from knowledge_embedding import get_embeddings
+from knowledge_llm import chat_completion, map_ordered
+from knowledge_local_store import get_store
+from knowledge_vectors import VectorIndex
+
 load_dotenv(Path(__file__).parent.parent / ".env")
 load_dotenv(Path(__file__).parent.parent / ".tune-params.env")
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
 LONGCAT_API_KEY = os.getenv("LONGCAT_API_KEY", "") or os.getenv("LONGMAO_API_KEY", "")
 LONGCAT_BASE_URL = os.getenv("LONGCAT_BASE_URL", "") or os.getenv("LONGMAO_BASE_URL", "https://api.longcat.chat/openai")
 AI_SUMMARY_MODEL = os.getenv("AI_SUMMARY_MODEL", "LongCat-Flash-Lite")
@@ -54,32 +51,8 @@ MIN_CONTENT_LENGTH = int(os.getenv("MEMORY_ORGANIZE_MIN_CONTENT", "180"))
 MIN_AI_SUMMARY_LENGTH = 10                                                              # AI 摘要最短长度
 DEDUP_SIMILARITY_THRESHOLD = float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.95"))       # 去重相似度阈值
 
-
-def get_embedding(text: str) -> list[float] | None:
-    """调用 SiliconFlow API 生成 embedding"""
-    if not SILICONFLOW_API_KEY:
-        print("Warning: SILICONFLOW_API_KEY not set, skipping embedding", file=sys.stderr)
-        return None
-
-    try:
-        response = requests.post(
-            "https://api.siliconflow.cn/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text[:8000],
-                "encoding_format": "float",
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        print(f"Error generating embedding: {e}", file=sys.stderr)
-        return None
+# dry-run 不生成卡片，去重索引里用 "dry_run:<来源条目 id>" 代替卡片 id
+DRY_RUN_PREFIX = "dry_run:"
 
 
 def generate_structured_summary(title: str, content: str, ai_summary: str) -> dict[str, str]:
@@ -103,22 +76,14 @@ AI 摘要：{ai_summary}
 只输出 JSON，不要其他文字。"""
 
     try:
-        response = requests.post(
-            f"{LONGCAT_BASE_URL}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {LONGCAT_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": AI_SUMMARY_MODEL,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 300,
-                "temperature": 0.2,
-            },
-            timeout=30,
+        raw = chat_completion(
+            prompt,
+            api_key=LONGCAT_API_KEY,
+            base_url=LONGCAT_BASE_URL,
+            model=AI_SUMMARY_MODEL,
+            max_tokens=300,
+            temperature=0.2,
         )
-        response.raise_for_status()
-        raw = response.json()["choices"][0]["message"]["content"].strip()
 
         # 提取 JSON（兼容 markdown 包裹）
         json_match = re.search(r'\{[\s\S]+\}', raw)
@@ -159,117 +124,84 @@ def fetch_candidates(
     min_content_length: int = MIN_CONTENT_LENGTH,
 ) -> list[dict[str, Any]]:
     """从 knowledge_items 中筛选高质量条目"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        clauses = [
-            "ki.status = 'active'",
-            "ki.ai_summary IS NOT NULL",
-            f"length(ki.ai_summary) >= {MIN_AI_SUMMARY_LENGTH}",
-            f"length(ki.content) >= {min_content_length}",
-            "ki.embedding IS NOT NULL",
-            # 排除已整理过的条目（ki.id 是 integer，mc.source_item_ids 是 text[]）
-            "NOT EXISTS (SELECT 1 FROM memory_cards mc WHERE ki.id::text = ANY(mc.source_item_ids))",
-        ]
-        params: list[Any] = []
-
-        if source_type:
-            clauses.append("ki.source_type = %s")
-            params.append(source_type)
-
-        params.append(limit)
-
-        cur.execute(
-            f"""
-            SELECT
-                ki.id, ki.source_type, ki.source_id, ki.source_url,
-                ki.title, ki.content, ki.ai_summary, ki.summary,
-                ki.metadata, ki.created_at
-            FROM knowledge_items ki
-            WHERE {' AND '.join(clauses)}
-            ORDER BY ki.created_at DESC
-            LIMIT %s
-            """,
-            params,
+    if local_backend():
+        return get_store().fetch_organize_candidates(
+            limit=limit,
+            source_type=source_type,
+            min_content_length=min_content_length,
+            min_ai_summary_length=MIN_AI_SUMMARY_LENGTH,
         )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
 
-def check_duplicate(embedding: list[float], threshold: float = DEDUP_SIMILARITY_THRESHOLD) -> str | None:
-    """检查是否已有相似的记忆卡片"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    try:
-        cur.execute(
-            """
-            SELECT id, title, 1 - (embedding <=> %s::vector) AS similarity
-            FROM memory_cards
-            WHERE embedding IS NOT NULL AND layer = 2
-            ORDER BY embedding <=> %s::vector
-            LIMIT 1
-            """,
-            [str(embedding), str(embedding)],
-        )
-        row = cur.fetchone()
-        if row and row[2] >= threshold:
-            return str(row[0])  # 返回已有 card id
-        return None
-    finally:
-        cur.close()
-        conn.close()
-
-
-def insert_memory_card(
-    title: str,
-    summary: str,
-    keywords: list[str],
-    context_tags: list[str],
-    source_item_ids: list[str],
-    embedding: list[float] | None,
-    confidence: float = 0.8,
-) -> dict[str, Any]:
-    """写入一张 L2 记忆卡片"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            clauses = [
+                "ki.status = 'active'",
+                "ki.ai_summary IS NOT NULL",
+                f"length(ki.ai_summary) >= {MIN_AI_SUMMARY_LENGTH}",
+                f"length(ki.content) >= {min_content_length}",
+                "ki.embedding IS NOT NULL",
+                # 排除已整理过的条目（ki.id 是 integer，mc.source_item_ids 是 text[]）
+                "NOT EXISTS (SELECT 1 FROM memory_cards mc WHERE ki.id::text = ANY(mc.source_item_ids))",
+            ]
+            params: list[Any] = []
+
+            if source_type:
+                clauses.append("ki.source_type = %s")
+                params.append(source_type)
+
+            params.append(limit)
+
+            cur.execute(
+                f"""
+                SELECT
+                    ki.id, ki.source_type, ki.source_id, ki.source_url,
+                    ki.title, ki.content, ki.ai_summary, ki.summary,
+                    ki.metadata, ki.created_at
+                FROM knowledge_items ki
+                WHERE {' AND '.join(clauses)}
+                ORDER BY ki.created_at DESC
+                LIMIT %s
+                """,
+                params,
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def load_dedup_index() -> VectorIndex:
+    """一次性读出所有 L2 卡片的 embedding，建成进程内的归一化矩阵"""
+    if local_backend():
+        return VectorIndex.from_rows(get_store().card_vectors("layer = 2"))
+
+    with connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            cur.execute(
+                """
+                SELECT id, embedding
+                FROM memory_cards
+                WHERE embedding IS NOT NULL AND layer = 2
+                """
+            )
+            return VectorIndex.from_rows(cur.fetchall())
+        finally:
+            cur.close()
 
-    try:
-        cur.execute(
-            """
-            INSERT INTO memory_cards
-            (layer, title, summary, keywords, context_tags,
-             source_item_ids, embedding, confidence)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, created_at
-            """,
-            (
-                2,  # L2 领域知识
-                title,
-                summary,
-                keywords,
-                context_tags,
-                source_item_ids,
-                str(embedding) if embedding else None,
-                confidence,
-            ),
-        )
-        result = cur.fetchone()
-        conn.commit()
 
-        return {
-            "id": str(result[0]),
-            "created_at": result[1].isoformat(),
-        }
-    except Exception as e:
-        conn.rollback()
-        return {"error": str(e)}
-    finally:
-        cur.close()
-        conn.close()
+def check_duplicate(
+    index: VectorIndex,
+    embedding: list[float],
+    threshold: float = DEDUP_SIMILARITY_THRESHOLD,
+) -> str | None:
+    """检查是否已有相似的记忆卡片（含本批次刚写入的卡片）"""
+    match = index.nearest(embedding)
+    if match and match[1] >= threshold:
+        return match[0]  # 返回已有 card id
+    return None
 
 
 def organize_items(
@@ -277,7 +209,7 @@ def organize_items(
     source_type: str | None = None,
     dry_run: bool = False,
 ) -> dict[str, Any]:
-    """主流程：筛选 → 生成结构化摘要 → 去重 → 写入 memory_cards"""
+    """主流程：筛选 → 生成结构化摘要 → 去重 → 批量写入 memory_cards"""
     candidates = fetch_candidates(limit=limit, source_type=source_type)
 
     if not candidates:
@@ -293,47 +225,58 @@ def organize_items(
     organized: list[dict[str, Any]] = []
     skipped = 0
 
-    for item in candidates:
-        item_id = str(item["id"])
+    # 1-2. 有界并发地为所有候选生成结构化摘要并拼接摘要文本（结果按候选顺序返回）
+    def summarize(item: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any], str]:
         title = item["title"] or ""
         content = item["content"] or ""
         ai_summary = item["ai_summary"] or ""
-        source_type_val = item.get("source_type", "")
 
         print(f"  Processing: {title[:50]}...", file=sys.stderr)
 
-        # 1. 生成结构化摘要
         structured = generate_structured_summary(title, content, ai_summary)
 
-        # 2. 拼接摘要文本
         summary_parts = [structured["conclusion"]]
         if structured["premise"]:
             summary_parts.append(f"前提: {structured['premise']}")
         if structured["validity"]:
             summary_parts.append(f"时效: {structured['validity']}")
-        full_summary = " | ".join(summary_parts)
+        return item, structured, " | ".join(summary_parts)
+
+    prepared = map_ordered(summarize, candidates)
+
+    # 3. 批量生成 embedding（按条数 / token 预算打包，几次请求覆盖全部候选）
+    embeddings = get_embeddings([f"{item['title'] or ''}\n{full_summary}" for item, _, full_summary in prepared])
 
-        # 3. 生成 embedding
-        embedding_text = f"{title}\n{full_summary}"
-        embedding = get_embedding(embedding_text)
+    # 已有 L2 卡片只读一次，之后的去重都是进程内的矩阵-向量乘法
+    dedup_index = load_dedup_index()
+    pending_cards: list[dict[str, Any]] = []
+
+    for (item, structured, full_summary), embedding in zip(prepared, embeddings):
+        item_id = str(item["id"])
+        title = item["title"] or ""
+        source_type_val = item.get("source_type", "")
 
         # 4. 去重检查
         if embedding:
-            dup_id = check_duplicate(embedding)
+            dup_id = check_duplicate(dedup_index, embedding)
             if dup_id:
-                print(f"    → 跳过（与已有卡片 {dup_id[:8]}... 重复）", file=sys.stderr)
                 skipped += 1
-                organized.append({
-                    "source_id": item_id,
-                    "title": title,
-                    "action": "skipped_duplicate",
-                    "duplicate_of": dup_id,
-                    "structured_summary": structured,
-                })
+                entry = {"source_id": item_id, "title": title, "action": "skipped_duplicate"}
+                if dup_id.startswith(DRY_RUN_PREFIX):
+                    # dry-run 里与本批前面某条重复：那条还没有卡片 id，报它的来源条目 id
+                    entry["duplicate_of_source_id"] = dup_id[len(DRY_RUN_PREFIX):]
+                    print(f"    → 跳过（与本批条目 {entry['duplicate_of_source_id']} 重复）", file=sys.stderr)
+                else:
+                    entry["duplicate_of"] = dup_id
+                    print(f"    → 跳过（与已有卡片 {dup_id[:8]}... 重复）", file=sys.stderr)
+                organized.append({**entry, "structured_summary": structured})
                 continue
 
         # 5. 写入（或 dry-run）
         if dry_run:
+            # dry-run 也加入索引，预览结果与真实运行一样能发现批内重复
+            if embedding:
+                dedup_index.add(f"{DRY_RUN_PREFIX}{item_id}", embedding)
             organized.append({
                 "source_id": item_id,
                 "title": title,
@@ -347,33 +290,42 @@ def organize_items(
             if source_type_val:
                 context_tags.append(f"source:{source_type_val}")
 
-            result = insert_memory_card(
-                title=title,
-                summary=full_summary,
-                keywords=structured["keywords"],
-                context_tags=context_tags,
-                source_item_ids=[item_id],
-                embedding=embedding,
-                confidence=0.8,
-            )
+            # 卡片 id 先在本地生成，立刻加入去重索引；真正写入在循环结束后批量完成
+            card = {
+                "id": str(uuid.uuid4()),
+                "title": title,
+                "summary": full_summary,
+                "keywords": structured["keywords"],
+                "context_tags": context_tags,
+                "source_item_ids": [item_id],
+                "embedding": embedding,
+                "confidence": 0.8,
+            }
+            if embedding:
+                dedup_index.add(card["id"], embedding)
+            pending_cards.append(card)
+            organized.append({
+                "source_id": item_id,
+                "card_id": card["id"],
+                "title": title,
+                "action": "created",
+                "keywords": structured["keywords"],
+                "summary_preview": full_summary[:100],
+            })
 
-            if "error" in result:
-                organized.append({
-                    "source_id": item_id,
-                    "title": title,
-                    "action": "error",
-                    "error": result["error"],
-                })
+    # 6. 批量写入 memory_cards（多行 INSERT，每批一个事务）
+    if pending_cards:
+        written = {card["id"]: result for card, result in zip(pending_cards, bulk_insert_memory_cards(pending_cards))}
+        for entry in organized:
+            result = written.get(entry.get("card_id"))
+            if result is None:
+                continue
+            if result["success"]:
+                entry["created_at"] = result["created_at"]
             else:
-                organized.append({
-                    "source_id": item_id,
-                    "card_id": result["id"],
-                    "title": title,
-                    "action": "created",
-                    "keywords": structured["keywords"],
-                    "summary_preview": full_summary[:100],
-                    "created_at": result["created_at"],
-                })
+                entry.update({"action": "error", "error": result["error"]})
+                for key in ("card_id", "keywords", "summary_preview"):
+                    entry.pop(key, None)
 
     return {
         "success": True,
@@ -385,14 +337,14 @@ def organize_items(
     }
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="记忆整理器：从 knowledge_items 提取 L2 领域知识卡片")
     parser.add_argument("--limit", type=int, default=10, help="最多处理多少条")
     parser.add_argument("--source-type", help="只处理某个来源类型")
     parser.add_argument("--dry-run", action="store_true", help="只预览，不写入数据库")
     parser.add_argument("--min-content-length", type=int, default=MIN_CONTENT_LENGTH,
                         help="正文最短长度阈值")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = organize_items(
         limit=args.limit,
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests",
@@ -15,243 +16,410 @@
   uv run scripts/memory_recall.py --query "Agent 基础设施"
   uv run scripts/memory_recall.py --query "知识库" --context-tags "source:bilibili"
   uv run scripts/memory_recall.py --query "RAG" --limit 5 --mode hybrid
+  uv run scripts/memory_recall.py --query "RAG" --fused   # 单条 SQL 完成全部分层召回
+  uv run scripts/memory_recall.py --query "RAG" --no-cache   # 跳过结果缓存（见 memory_recall_cache.py）
 """
 
+
+if __name__ == "__main__":
+    # 常驻守护进程（knowledge_daemon.py）在跑时直接转发给它并退出，省掉下面的重依赖导入和建连；否则照常在本进程执行
+    from knowledge_client import delegate
+    delegate("recall")
+
 import argparse
 import json
-import os
-import sys
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
+from knowledge_cache import CACHE_ENABLED
+from knowledge_db import Vector, connection, local_backend
+from knowledge_embedding import get_embedding
+from knowledge_fts import KeywordClause, keyword_clause
+from knowledge_local_store import get_store
+from memory_recall_cache import current_generation, get_cached, put_cached, recall_cache_key
+
 load_dotenv(Path(__file__).parent.parent / ".env")
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
-
-
-def get_embedding(text: str) -> list[float] | None:
-    """调用 SiliconFlow API 生成 embedding"""
-    if not SILICONFLOW_API_KEY:
-        return None
-    try:
-        response = requests.post(
-            "https://api.siliconflow.cn/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text[:8000],
-                "encoding_format": "float",
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        print(f"Error generating embedding: {e}", file=sys.stderr)
-        return None
-
-
-def update_access_stats(card_ids: list[str]) -> None:
+
+def update_access_stats(card_ids: list[str], conn=None) -> None:
     """更新命中卡片的访问计数和最后访问时间"""
     if not card_ids:
         return
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            UPDATE memory_cards
-            SET access_count = access_count + 1,
-                last_accessed = NOW(),
-                updated_at = NOW()
-            WHERE id = ANY(%s::uuid[])
-            """,
-            [card_ids],
-        )
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
-
-
-def recall_l1_keyword(query: str, context_tags: list[str] | None, limit: int) -> list[dict[str, Any]]:
+    if local_backend():
+        return get_store().update_access_stats(card_ids)
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE memory_cards
+                SET access_count = access_count + 1,
+                    last_accessed = NOW(),
+                    updated_at = NOW()
+                WHERE id = ANY(%s::uuid[])
+                """,
+                [card_ids],
+            )
+        finally:
+            cur.close()
+
+
+def recall_l1_keyword(query: str, context_tags: list[str] | None, limit: int, conn=None) -> list[dict[str, Any]]:
     """L1 工作记忆 — 关键词 + context_tags 精确匹配"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
-        if not words:
-            words = [query]
-
-        conditions = ["layer = 1", "valid_until IS NULL OR valid_until > NOW()"]
-        params: list[Any] = []
-
-        # context_tags 精确匹配（如果提供了）
-        if context_tags:
-            conditions.append("context_tags @> %s")
-            params.append(context_tags)
-
-        # 关键词搜索
-        word_conditions = []
-        for word in words:
-            word_conditions.append("(title ILIKE %s OR summary ILIKE %s)")
-            params.extend([f"%{word}%", f"%{word}%"])
-        conditions.append(f"({ ' OR '.join(word_conditions) })")
-
-        params.append(limit)
-
-        cur.execute(
-            f"""
-            SELECT id, layer, title, summary, keywords, context_tags,
-                   valid_from, valid_until, source_item_ids, confidence,
-                   access_count, created_at
-            FROM memory_cards
-            WHERE {' AND '.join(conditions)}
-            ORDER BY
-                CASE WHEN valid_until IS NOT NULL THEN 0 ELSE 1 END,
-                access_count DESC,
-                created_at DESC
-            LIMIT %s
-            """,
-            params,
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def recall_l2_vector(query_embedding: list[float], limit: int) -> list[dict[str, Any]]:
+    if local_backend():
+        return get_store().recall_l1_keyword(query, context_tags, limit)
+    with connection(conn) as conn:
+        kw = keyword_clause(conn, "memory_cards", query, ("title", "summary"))
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            conditions = ["layer = 1", "(valid_until IS NULL OR valid_until > NOW())"]
+            params: dict[str, Any] = dict(kw.params, limit=limit, context_tags=context_tags)
+
+            # context_tags 精确匹配（如果提供了）
+            if context_tags:
+                conditions.append("context_tags @> %(context_tags)s")
+
+            # 关键词搜索
+            conditions.append(kw.where)
+
+            cur.execute(
+                f"""
+                SELECT id, layer, title, summary, keywords, context_tags,
+                       valid_from, valid_until, source_item_ids, confidence,
+                       access_count, created_at
+                FROM memory_cards
+                WHERE {' AND '.join(conditions)}
+                ORDER BY
+                    CASE WHEN valid_until IS NOT NULL THEN 0 ELSE 1 END,
+                    access_count DESC,
+                    created_at DESC
+                LIMIT %(limit)s
+                """,
+                params,
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def recall_l2_vector(query_embedding: list[float], limit: int, conn=None) -> list[dict[str, Any]]:
     """L2 领域知识 — 向量语义搜索"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute(
-            """
-            SELECT id, layer, title, summary, keywords, context_tags,
-                   valid_from, valid_until, source_item_ids, confidence,
-                   1 - (embedding <=> %s::vector) AS similarity,
-                   access_count, created_at
-            FROM memory_cards
-            WHERE layer = 2 AND embedding IS NOT NULL
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-            """,
-            [str(query_embedding), str(query_embedding), limit],
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def recall_l2_keyword(query: str, limit: int) -> list[dict[str, Any]]:
+    if local_backend():
+        return get_store().recall_l2_vector(query_embedding, limit)
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute(
+                """
+                WITH q AS (SELECT %s AS v)
+                SELECT id, layer, title, summary, keywords, context_tags,
+                       valid_from, valid_until, source_item_ids, confidence,
+                       1 - (embedding <=> q.v) AS similarity,
+                       access_count, created_at
+                FROM memory_cards, q
+                WHERE layer = 2 AND embedding IS NOT NULL
+                ORDER BY embedding <=> q.v
+                LIMIT %s
+                """,
+                [Vector(query_embedding), limit],
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def recall_l2_keyword(query: str, limit: int, conn=None) -> list[dict[str, Any]]:
     """L2 领域知识 — 关键词搜索"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
-        if not words:
-            words = [query]
-
-        word_conditions = []
-        params: list[Any] = []
-        for word in words:
-            word_conditions.append("(title ILIKE %s OR summary ILIKE %s)")
-            params.extend([f"%{word}%", f"%{word}%"])
-
-        params.append(limit)
-
-        cur.execute(
-            f"""
-            SELECT id, layer, title, summary, keywords, context_tags,
-                   valid_from, valid_until, source_item_ids, confidence,
-                   access_count, created_at
-            FROM memory_cards
-            WHERE layer = 2 AND ({' OR '.join(word_conditions)})
-            ORDER BY access_count DESC, created_at DESC
-            LIMIT %s
-            """,
-            params,
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def recall_l3(query_embedding: list[float], limit: int) -> list[dict[str, Any]]:
+    if local_backend():
+        return get_store().recall_l2_keyword(query, limit)
+    with connection(conn) as conn:
+        kw = keyword_clause(conn, "memory_cards", query, ("title", "summary"))
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute(
+                f"""
+                SELECT id, layer, title, summary, keywords, context_tags,
+                       valid_from, valid_until, source_item_ids, confidence,
+                       access_count, created_at
+                FROM memory_cards
+                WHERE layer = 2 AND {kw.where}
+                ORDER BY {kw.rank} DESC, access_count DESC, created_at DESC
+                LIMIT %(limit)s
+                """,
+                dict(kw.params, limit=limit),
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def recall_l3(query_embedding: list[float], limit: int, conn=None) -> list[dict[str, Any]]:
     """L3 原始存档 — 回退到 knowledge_items"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute(
-            """
-            SELECT id, source_type, source_id, source_url, title,
-                   ai_summary, summary, created_at,
-                   1 - (embedding <=> %s::vector) AS similarity
-            FROM knowledge_items
-            WHERE embedding IS NOT NULL AND status = 'active'
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-            """,
-            [str(query_embedding), str(query_embedding), limit],
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def recall_l3_keyword(query: str, limit: int) -> list[dict[str, Any]]:
+    if local_backend():
+        return get_store().recall_l3(query_embedding, limit)
+    with connection(conn) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute(
+                """
+                WITH q AS (SELECT %s AS v)
+                SELECT id, source_type, source_id, source_url, title,
+                       ai_summary, summary, created_at,
+                       1 - (embedding <=> q.v) AS similarity
+                FROM knowledge_items, q
+                WHERE embedding IS NOT NULL AND status = 'active'
+                ORDER BY embedding <=> q.v
+                LIMIT %s
+                """,
+                [Vector(query_embedding), limit],
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def recall_l3_keyword(query: str, limit: int, conn=None) -> list[dict[str, Any]]:
     """L3 原始存档 — 关键词回退"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
-        if not words:
-            words = [query]
-
-        word_conditions = []
-        params: list[Any] = []
-        for word in words:
-            word_conditions.append("(title ILIKE %s OR content ILIKE %s)")
-            params.extend([f"%{word}%", f"%{word}%"])
-
-        params.append(limit)
-
-        cur.execute(
-            f"""
-            SELECT id, source_type, source_id, source_url, title,
-                   ai_summary, summary, created_at
-            FROM knowledge_items
-            WHERE ({' OR '.join(word_conditions)}) AND status = 'active'
-            ORDER BY created_at DESC
-            LIMIT %s
-            """,
-            params,
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
+    if local_backend():
+        return get_store().recall_l3_keyword(query, limit)
+    with connection(conn) as conn:
+        kw = keyword_clause(conn, "knowledge_items", query, ("title", "content"))
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute(
+                f"""
+                SELECT id, source_type, source_id, source_url, title,
+                       ai_summary, summary, created_at
+                FROM knowledge_items
+                WHERE {kw.where} AND status = 'active'
+                ORDER BY {kw.rank} DESC, created_at DESC
+                LIMIT %(limit)s
+                """,
+                dict(kw.params, limit=limit),
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+CARD_FIELDS = [
+    "id", "layer", "title", "summary", "keywords", "context_tags",
+    "valid_from", "valid_until", "source_item_ids", "confidence",
+    "access_count", "created_at",
+]
+ITEM_FIELDS = [
+    "id", "source_type", "source_id", "source_url", "title",
+    "ai_summary", "summary", "created_at",
+]
+
+# 融合召回的单条 SQL：各层 CTE 自带 LIMIT，后一层的 LIMIT 由前几层的命中数推出，
+# 与逐层召回的 remaining 逻辑一致；访问计数更新以 data-modifying CTE 写在同一语句里。
+FUSED_CARD_SELECT = """
+    SELECT {rank} AS layer_rank, {search_type} AS search_type,
+           row_number() OVER (ORDER BY {order}) AS sub_rank,
+           id AS card_id, NULL::int AS item_id,
+           layer, title, summary, keywords, context_tags,
+           valid_from, valid_until, source_item_ids, confidence, access_count,
+           NULL::varchar AS source_type, NULL::varchar AS source_id, NULL::text AS source_url,
+           NULL::text AS ai_summary, {similarity} AS similarity, created_at
+    FROM memory_cards
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT {limit}
+"""
+
+FUSED_ITEM_SELECT = """
+    SELECT {rank} AS layer_rank, {search_type} AS search_type,
+           row_number() OVER (ORDER BY {order}) AS sub_rank,
+           NULL::uuid AS card_id, id AS item_id,
+           3::smallint AS layer, title, summary, NULL::text[] AS keywords, NULL::text[] AS context_tags,
+           NULL::timestamp AS valid_from, NULL::timestamp AS valid_until,
+           NULL::text[] AS source_item_ids, NULL::real AS confidence, NULL::int AS access_count,
+           source_type, source_id, source_url,
+           ai_summary, {similarity} AS similarity, created_at
+    FROM knowledge_items
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT {limit}
+"""
+
+# 逐层召回里"前几层用完后剩余名额"的 SQL 表达
+REMAINING_AFTER_L1 = "(%(limit)s - (SELECT count(*) FROM l1))"
+REMAINING_AFTER_L2 = "(%(limit)s - (SELECT count(*) FROM l1) - (SELECT count(DISTINCT card_id) FROM l2_hits))"
+
+
+def _vector_limit(remaining: str) -> str:
+    return f"GREATEST({remaining}, 0)"
+
+
+def _keyword_limit(remaining: str) -> str:
+    # 逐层召回的关键词分支用 max(remaining, 5)，且只在 remaining > 0 时执行
+    return f"CASE WHEN {remaining} > 0 THEN GREATEST({remaining}, 5) ELSE 0 END"
+
+
+def build_fused_recall_sql(
+    mode: str,
+    has_embedding: bool,
+    has_context_tags: bool,
+    card_keyword: KeywordClause,
+    item_keyword: KeywordClause,
+) -> str:
+    """
+    拼出融合召回 SQL（参数用 %(name)s 命名占位）。
+    card_keyword / item_keyword 是 memory_cards / knowledge_items 上的关键词条件，参数需并入执行参数。
+    """
+    use_vector = mode in ("vector", "hybrid") and has_embedding
+    use_keyword = mode in ("keyword", "hybrid")
+
+    l1_where = "layer = 1 AND (valid_until IS NULL OR valid_until > NOW())"
+    if has_context_tags:
+        l1_where += " AND context_tags @> %(context_tags)s"
+    l1_where += f" AND {card_keyword.where}"
+
+    ctes = []
+    if use_vector:
+        ctes.append("q AS (SELECT %(embedding)s AS v)")
+    ctes.append("l1 AS (" + FUSED_CARD_SELECT.format(
+        rank=1, search_type="NULL::text", similarity="NULL::float8",
+        where=l1_where,
+        order="CASE WHEN valid_until IS NOT NULL THEN 0 ELSE 1 END, access_count DESC, created_at DESC",
+        limit="LEAST(%(limit)s, 5)",
+    ) + ")")
+
+    l2_parts = []
+    if use_vector:
+        ctes.append("l2v AS (" + FUSED_CARD_SELECT.format(
+            rank=2, search_type="'vector'::text",
+            similarity="1 - (embedding <=> (SELECT v FROM q))",
+            where="layer = 2 AND embedding IS NOT NULL",
+            order="embedding <=> (SELECT v FROM q)",
+            limit=_vector_limit(REMAINING_AFTER_L1),
+        ) + ")")
+        l2_parts.append("SELECT * FROM l2v")
+    if use_keyword:
+        ctes.append("l2k AS (" + FUSED_CARD_SELECT.format(
+            rank=3, search_type="'keyword'::text", similarity="NULL::float8",
+            where=f"layer = 2 AND {card_keyword.where}",
+            order=f"{card_keyword.rank} DESC, access_count DESC, created_at DESC",
+            limit=_keyword_limit(REMAINING_AFTER_L1),
+        ) + ")")
+        l2_parts.append("SELECT * FROM l2k")
+    if not l2_parts:
+        l2_parts.append("SELECT * FROM l1 WHERE false")
+    ctes.append("l2_hits AS (" + " UNION ALL ".join(l2_parts) + ")")
+
+    l3_parts = []
+    if use_vector:
+        ctes.append("l3v AS (" + FUSED_ITEM_SELECT.format(
+            rank=4, search_type="'vector'::text",
+            similarity="1 - (embedding <=> (SELECT v FROM q))",
+            where="embedding IS NOT NULL AND status = 'active'",
+            order="embedding <=> (SELECT v FROM q)",
+            limit=_vector_limit(REMAINING_AFTER_L2),
+        ) + ")")
+        l3_parts.append("SELECT * FROM l3v")
+    if use_keyword:
+        ctes.append("l3k AS (" + FUSED_ITEM_SELECT.format(
+            rank=5, search_type="'keyword'::text", similarity="NULL::float8",
+            where=f"{item_keyword.where} AND status = 'active'",
+            order=f"{item_keyword.rank} DESC, created_at DESC",
+            limit=_keyword_limit(REMAINING_AFTER_L2),
+        ) + ")")
+        l3_parts.append("SELECT * FROM l3k")
+
+    hits = ["SELECT * FROM l1", "SELECT * FROM l2_hits"] + l3_parts
+    ctes.append("hits AS (" + " UNION ALL ".join(hits) + ")")
+    # 同一条目只保留最先出现的一次（L2 关键词去重 L2 向量，L3 关键词去重 L3 向量）
+    ctes.append("""ranked AS (
+    SELECT hits.*,
+           row_number() OVER (
+               PARTITION BY COALESCE('c:' || card_id::text, 'i:' || item_id::text)
+               ORDER BY layer_rank, sub_rank
+           ) AS dup_rank
+    FROM hits
+)""")
+    ctes.append("""bump AS (
+    UPDATE memory_cards m
+    SET access_count = m.access_count + 1,
+        last_accessed = NOW(),
+        updated_at = NOW()
+    FROM ranked r
+    WHERE r.dup_rank = 1 AND m.id = r.card_id
+    RETURNING m.id
+)""")
+
+    return "WITH " + ",\n".join(ctes) + """
+SELECT * FROM ranked
+WHERE dup_rank = 1
+ORDER BY layer_rank, sub_rank
+"""
+
+
+def recall_fused(
+    query: str,
+    mode: str = "hybrid",
+    limit: int = 10,
+    context_tags: list[str] | None = None,
+    conn=None,
+) -> dict[str, Any]:
+    """
+    融合召回：L1/L2/L3 各层查询 + 访问计数更新合并成一条 SQL，一次往返。
+    结果、layer_stats 和被更新访问计数的卡片与 recall() 逐层召回一致。
+    """
+    query_embedding = get_embedding(query) if mode in ("vector", "hybrid") else None
+
+    with connection(conn) as conn:
+        card_keyword = keyword_clause(conn, "memory_cards", query, ("title", "summary"))
+        item_keyword = keyword_clause(conn, "knowledge_items", query, ("title", "content"))
+        sql = build_fused_recall_sql(mode, has_embedding=bool(query_embedding), has_context_tags=bool(context_tags),
+                                     card_keyword=card_keyword, item_keyword=item_keyword)
+        params: dict[str, Any] = {
+            **card_keyword.params,
+            **item_keyword.params,
+            "limit": limit,
+            "context_tags": context_tags,
+            "embedding": Vector(query_embedding) if query_embedding else None,
+        }
+
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+
+    results: list[dict[str, Any]] = []
+    layer_stats = {"l1": 0, "l2": 0, "l3": 0}
+    for row in rows:
+        if row["card_id"] is not None:
+            r = {field: row[field] for field in CARD_FIELDS[1:]}
+            r["id"] = row["card_id"]
+        else:
+            r = {field: row[field] for field in ITEM_FIELDS[1:]}
+            r["id"] = row["item_id"]
+        if row["similarity"] is not None:
+            r["similarity"] = row["similarity"]
+        layer = 1 if row["layer_rank"] == 1 else 2 if row["layer_rank"] in (2, 3) else 3
+        r["layer"] = layer
+        r["source"] = {1: "L1-工作记忆", 2: "L2-领域知识", 3: "L3-原始存档"}[layer]
+        if row["search_type"]:
+            r["search_type"] = row["search_type"]
+        results.append(r)
+        layer_stats[f"l{layer}"] += 1
+
+    results = results[:limit]
+
+    return {
+        "query": query,
+        "mode": mode,
+        "total": len(results),
+        "layer_stats": layer_stats,
+        "results": results,
+    }
 
 
 def recall(
@@ -259,89 +427,125 @@ def recall(
     mode: str = "hybrid",
     limit: int = 10,
     context_tags: list[str] | None = None,
+    fused: bool = False,
+    use_cache: bool = True,
 ) -> dict[str, Any]:
     """
     分层检索主函数
     L1 → L2 → L3 逐层召回，每层命中后更新 access_count
+    所有层的查询在同一个数据库连接上执行；fused=True 时走单条 SQL 的融合召回
+    结果按 (规范化 query, context_tags, mode, limit, 代数) 缓存，写入方 bump 代数即失效（见 memory_recall_cache.py）；
+    命中时只给返回结果里的 L1/L2 卡片更新访问计数
     """
+    if not (use_cache and CACHE_ENABLED):
+        return recall_uncached(query, mode=mode, limit=limit, context_tags=context_tags, fused=fused)
+
+    with (nullcontext() if local_backend() else connection()) as conn:
+        generation = current_generation(conn)
+        key = recall_cache_key(query, context_tags, mode, limit, generation) if generation is not None else None
+        cached = get_cached(key) if key else None
+        if cached is not None:
+            update_access_stats([str(r["id"]) for r in cached["results"] if r.get("layer") in (1, 2)], conn=conn)
+            return {**cached, "query": query}
+
+    result = recall_uncached(query, mode=mode, limit=limit, context_tags=context_tags, fused=fused)
+    if key:
+        put_cached(key, result)
+    return result
+
+
+def recall_uncached(
+    query: str,
+    mode: str = "hybrid",
+    limit: int = 10,
+    context_tags: list[str] | None = None,
+    fused: bool = False,
+) -> dict[str, Any]:
+    """不经过结果缓存的分层召回"""
+    if fused and not local_backend():
+        return recall_fused(query, mode=mode, limit=limit, context_tags=context_tags)
+
     results: list[dict[str, Any]] = []
     hit_card_ids: list[str] = []
     layer_stats = {"l1": 0, "l2": 0, "l3": 0}
 
-    # ── L1 工作记忆 ──
-    l1_results = recall_l1_keyword(query, context_tags=context_tags, limit=min(limit, 5))
-    for r in l1_results:
-        r["layer"] = 1
-        r["source"] = "L1-工作记忆"
-        results.append(r)
-        hit_card_ids.append(str(r["id"]))
-    layer_stats["l1"] = len(l1_results)
-
-    remaining = limit - len(results)
-
-    # ── L2 领域知识 ──
-    if remaining > 0:
-        if mode in ("vector", "hybrid"):
-            query_embedding = get_embedding(query)
-            if query_embedding:
-                l2_vector = recall_l2_vector(query_embedding, limit=remaining)
+    # 本地后端没有数据库连接，各层函数直接走 knowledge_local_store
+    with (nullcontext() if local_backend() else connection()) as conn:
+
+        # ── L1 工作记忆 ──
+        l1_results = recall_l1_keyword(query, context_tags=context_tags, limit=min(limit, 5), conn=conn)
+        for r in l1_results:
+            r["layer"] = 1
+            r["source"] = "L1-工作记忆"
+            results.append(r)
+            hit_card_ids.append(str(r["id"]))
+        layer_stats["l1"] = len(l1_results)
+
+        remaining = limit - len(results)
+
+        # ── L2 领域知识 ──
+        if remaining > 0:
+            if mode in ("vector", "hybrid"):
+                query_embedding = get_embedding(query)
+                if query_embedding:
+                    l2_vector = recall_l2_vector(query_embedding, limit=remaining, conn=conn)
+                    seen_ids = {r["id"] for r in results}
+                    for r in l2_vector:
+                        if r["id"] not in seen_ids:
+                            r["layer"] = 2
+                            r["source"] = "L2-领域知识"
+                            r["search_type"] = "vector"
+                            results.append(r)
+                            hit_card_ids.append(str(r["id"]))
+                            seen_ids.add(r["id"])
+                    layer_stats["l2"] = len([r for r in results if r.get("layer") == 2])
+
+            if mode in ("keyword", "hybrid"):
+                l2_keyword = recall_l2_keyword(query, limit=max(remaining, 5), conn=conn)
                 seen_ids = {r["id"] for r in results}
-                for r in l2_vector:
+                for r in l2_keyword:
                     if r["id"] not in seen_ids:
                         r["layer"] = 2
                         r["source"] = "L2-领域知识"
-                        r["search_type"] = "vector"
+                        r["search_type"] = "keyword"
                         results.append(r)
                         hit_card_ids.append(str(r["id"]))
                         seen_ids.add(r["id"])
                 layer_stats["l2"] = len([r for r in results if r.get("layer") == 2])
 
-        if mode in ("keyword", "hybrid"):
-            l2_keyword = recall_l2_keyword(query, limit=max(remaining, 5))
-            seen_ids = {r["id"] for r in results}
-            for r in l2_keyword:
-                if r["id"] not in seen_ids:
-                    r["layer"] = 2
-                    r["source"] = "L2-领域知识"
-                    r["search_type"] = "keyword"
-                    results.append(r)
-                    hit_card_ids.append(str(r["id"]))
-                    seen_ids.add(r["id"])
-            layer_stats["l2"] = len([r for r in results if r.get("layer") == 2])
-
-    remaining = limit - len(results)
-
-    # ── L3 原始存档（回退） ──
-    if remaining > 0:
-        if mode in ("vector", "hybrid"):
-            if query_embedding if mode == "hybrid" else get_embedding(query):
-                emb = query_embedding if mode == "hybrid" else get_embedding(query)
-                if emb:
-                    l3_vector = recall_l3(emb, limit=remaining)
-                    for r in l3_vector:
+        remaining = limit - len(results)
+
+        # ── L3 原始存档（回退） ──
+        if remaining > 0:
+            if mode in ("vector", "hybrid"):
+                if query_embedding if mode == "hybrid" else get_embedding(query):
+                    emb = query_embedding if mode == "hybrid" else get_embedding(query)
+                    if emb:
+                        l3_vector = recall_l3(emb, limit=remaining, conn=conn)
+                        for r in l3_vector:
+                            r["layer"] = 3
+                            r["source"] = "L3-原始存档"
+                            r["search_type"] = "vector"
+                            results.append(r)
+                        layer_stats["l3"] = len([r for r in results if r.get("layer") == 3])
+
+            if mode in ("keyword", "hybrid"):
+                l3_keyword = recall_l3_keyword(query, limit=max(remaining, 5), conn=conn)
+                seen_l3_ids = {r["id"] for r in results if r.get("layer") == 3}
+                for r in l3_keyword:
+                    if r["id"] not in seen_l3_ids:
                         r["layer"] = 3
                         r["source"] = "L3-原始存档"
-                        r["search_type"] = "vector"
+                        r["search_type"] = "keyword"
                         results.append(r)
-                    layer_stats["l3"] = len([r for r in results if r.get("layer") == 3])
-
-        if mode in ("keyword", "hybrid"):
-            l3_keyword = recall_l3_keyword(query, limit=max(remaining, 5))
-            seen_l3_ids = {r["id"] for r in results if r.get("layer") == 3}
-            for r in l3_keyword:
-                if r["id"] not in seen_l3_ids:
-                    r["layer"] = 3
-                    r["source"] = "L3-原始存档"
-                    r["search_type"] = "keyword"
-                    results.append(r)
-                    seen_l3_ids.add(r["id"])
-            layer_stats["l3"] = len([r for r in results if r.get("layer") == 3])
-
-    # 截断到 limit
-    results = results[:limit]
+                        seen_l3_ids.add(r["id"])
+                layer_stats["l3"] = len([r for r in results if r.get("layer") == 3])
+
+        # 截断到 limit
+        results = results[:limit]
 
-    # 更新 L1/L2 卡片的访问计数
-    update_access_stats(hit_card_ids)
+        # 更新 L1/L2 卡片的访问计数
+        update_access_stats(hit_card_ids, conn=conn)
 
     return {
         "query": query,
@@ -352,21 +556,26 @@ def recall(
     }
 
 
-def main():
-    parser = argparse.ArgumentParser(description="分层记忆检索：L1 工作记忆 → L2 领域知识 → L3 原始存档")
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog=Path(__file__).name, description="分层记忆检索：L1 工作记忆 → L2 领域知识 → L3 原始存档")
     parser.add_argument("--query", required=True, help="搜索关键词")
     parser.add_argument("--mode", choices=["keyword", "vector", "hybrid"],
                         default="hybrid", help="搜索模式")
     parser.add_argument("--limit", type=int, default=10, help="返回数量")
     parser.add_argument("--context-tags", nargs="*", help="上下文标签（如 source:bilibili）")
+    parser.add_argument("--fused", action="store_true",
+                        help="融合召回：各层查询和访问计数更新合并成一条 SQL（一次数据库往返）")
+    parser.add_argument("--no-cache", action="store_true", help="跳过召回结果缓存，总是重新检索")
     parser.add_argument("--output", choices=["json", "markdown"], default="json")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = recall(
         query=args.query,
         mode=args.mode,
         limit=args.limit,
         context_tags=args.context_tags,
+        fused=args.fused,
+        use_cache=not args.no_cache,
     )
 
     if args.output == "markdown":
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "numpy",
+#     "psycopg2-binary",
+#     "python-dotenv",
+# ]
+# ///
+"""
+分层召回的结果缓存
+Agent 在一次会话里经常反复问几乎相同的问题，memory_recall.recall() 每次都要重算 embedding 查询和各层检索。
+这里把整份召回结果缓存在本地 SQLite（knowledge_cache.py 的 "recall" namespace，LRU + TTL）：
+
+- key = 存储后端标识 + 规范化 query（NFKC、折叠空白、忽略大小写）+ 排序后的 context_tags + mode + limit + 代数
+- 代数（generation）是存在数据库里的一个计数器：memory_save_working / memory_organize / memory_compress /
+  knowledge_save 等写入时在同一事务里 +1，之前缓存的结果自然全部失效，不用逐条清理
+- Postgres 存在 memory_generation 表（memory_migrate.py 创建，第一次写入时也会自动建）；
+  本地后端存在 store_meta 的 memory.generation
+- 表还不存在时（旧库、只读库）不走缓存
+
+用法:
+  from memory_recall_cache import bump_generation, recall_cache
+  with connection() as conn:
+      ...写 memory_cards / knowledge_items...
+      bump_generation(conn)
+
+  uv run scripts/memory_recall_cache.py            # 当前代数和命中率
+  uv run scripts/memory_recall_cache.py --bump     # 手动让缓存失效（直接改过库之后）
+
+环境变量:
+  MEMORY_RECALL_CACHE_TTL=300     结果最长保留秒数（访问计数等非内容变化不算写入，靠 TTL 兜底）
+  MEMORY_RECALL_CACHE_MAX=2000    最多保留的结果条数（LRU 淘汰）
+  KNOWLEDGE_CACHE=0               与其他本地缓存一起关闭
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+from knowledge_cache import LocalCache
+from knowledge_db import DB_CONFIG, connection, local_backend
+from knowledge_local_store import LOCAL_DIR, get_store
+
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+RECALL_CACHE_TTL = float(os.getenv("MEMORY_RECALL_CACHE_TTL", "300"))
+RECALL_CACHE_MAX = int(os.getenv("MEMORY_RECALL_CACHE_MAX", "2000"))
+
+recall_cache = LocalCache("recall", max_entries=RECALL_CACHE_MAX, ttl_seconds=RECALL_CACHE_TTL)
+
+CREATE_GENERATION_SQL = """
+CREATE TABLE IF NOT EXISTS memory_generation (
+    id          SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation  BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMP DEFAULT NOW()
+);
+"""
+
+BUMP_GENERATION_SQL = """
+INSERT INTO memory_generation (id, generation, updated_at) VALUES (1, 1, NOW())
+ON CONFLICT (id) DO UPDATE
+SET generation = memory_generation.generation + 1, updated_at = NOW()
+RETURNING generation
+"""
+
+_table_ready = False
+
+
+def _generation_table_exists(conn: psycopg2.extensions.connection) -> bool:
+    """memory_generation 是否存在；存在的结论按进程缓存，不存在则每次重新探测（之后可能被写入方建出来）"""
+    global _table_ready
+    if not _table_ready:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('memory_generation') IS NOT NULL")
+            _table_ready = bool(cur.fetchone()[0])
+    return _table_ready
+
+
+def _ensure_generation_table() -> None:
+    """
+    memory_generation 不存在时建表。DDL 走 autocommit 的独立连接，立即提交：
+    不放进调用方的事务（回滚会连表一起撤掉，而本进程已记下"表已就绪"），也不占用连接池
+    """
+    global _table_ready
+    if _table_ready:
+        return
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_GENERATION_SQL)
+    finally:
+        conn.close()
+    _table_ready = True
+
+
+def current_generation(conn=None) -> int | None:
+    """当前代数；Postgres 上还没有 memory_generation 表时返回 None（不走缓存）"""
+    if local_backend():
+        return get_store().generation()
+    with connection(conn) as conn:
+        if not _generation_table_exists(conn):
+            return None
+        with conn.cursor() as cur:
+            cur.execute("SELECT generation FROM memory_generation WHERE id = 1")
+            row = cur.fetchone()
+        return row[0] if row else 0
+
+
+def bump_generation(conn=None) -> int:
+    """
+    代数 +1，让已缓存的召回结果全部失效。
+    传入 conn 时在调用方的事务里执行（与写入一起提交 / 回滚），否则单独借一个连接提交。
+    """
+    if local_backend():
+        return get_store().bump_generation()
+    _ensure_generation_table()
+    with connection(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(BUMP_GENERATION_SQL)
+            return cur.fetchone()[0]
+
+
+def normalize_query(query: str) -> str:
+    """近似相同的问法落到同一个 key：NFKC（全角 → 半角）、折叠空白、忽略大小写"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+def _scope() -> str:
+    """同一个缓存文件可能被多个库 / 本地存储共用，key 里带上后端标识"""
+    if local_backend():
+        return f"sqlite:{LOCAL_DIR}"
+    return f"postgres:{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
+
+
+def recall_cache_key(query: str, context_tags: list[str] | None, mode: str, limit: int, generation: int) -> str:
+    payload = json.dumps(
+        [_scope(), normalize_query(query), sorted(context_tags or []), mode, limit, generation],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# 缓存里存 JSON（不用 pickle：缓存文件能被改写时，反序列化 pickle 等于执行任意代码）。
+# datetime / date / UUID / Decimal 带类型标记存，命中时还原成原类型，输出与重算完全一致
+_TAGGED_TYPES: dict[str, Any] = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "uuid": uuid.UUID,
+    "decimal": Decimal,
+}
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    return str(value)
+
+
+def _decode_object(obj: dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        (tag, value), = obj.items()
+        if tag.startswith("$") and tag[1:] in _TAGGED_TYPES:
+            return _TAGGED_TYPES[tag[1:]](value)
+    return obj
+
+
+def get_cached(key: str) -> dict[str, Any] | None:
+    cached = recall_cache.get(key)
+    if cached is None:
+        return None
+    try:
+        return json.loads(cached, object_hook=_decode_object)
+    except ValueError:
+        # 旧版本写的 pickle 条目或损坏的条目：当作未命中，重算后覆盖
+        return None
+
+
+def put_cached(key: str, result: dict[str, Any]) -> None:
+    recall_cache.set(key, json.dumps(result, ensure_ascii=False, default=_encode_value).encode("utf-8"))
+
+
+def cache_stats(conn=None) -> dict[str, Any]:
+    """命中率（本进程 + 缓存文件累计）和当前代数，memory_health 输出用"""
+    return {**recall_cache.stats(), "ttl_seconds": RECALL_CACHE_TTL, "generation": current_generation(conn)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分层召回结果缓存")
+    parser.add_argument("--bump", action="store_true", help="代数 +1，让已缓存的召回结果全部失效")
+    args = parser.parse_args()
+
+    if args.bump:
+        print(json.dumps({"generation": bump_generation()}, ensure_ascii=False, indent=2))
+        return
+    print(json.dumps(cache_stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
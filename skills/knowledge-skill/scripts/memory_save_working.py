@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests",
@@ -26,59 +27,23 @@ Agent 在任务中产出的关键决策、中间结论写入 L1。
 
 import argparse
 import json
-import os
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
-import psycopg2
-import psycopg2.extras
-import requests
 from dotenv import load_dotenv
 
-load_dotenv(Path(__file__).parent.parent / ".env")
+from knowledge_db import Vector, connection
+from knowledge_embedding import get_embedding
+from memory_recall_cache import bump_generation
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
+load_dotenv(Path(__file__).parent.parent / ".env")
 
-SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
 
 # L1 默认过期时间
 DEFAULT_TTL_DAYS = 7
 
 
-def get_embedding(text: str) -> list[float] | None:
-    """调用 SiliconFlow API 生成 embedding"""
-    if not SILICONFLOW_API_KEY:
-        print("Warning: SILICONFLOW_API_KEY not set, skipping embedding", file=sys.stderr)
-        return None
-    try:
-        response = requests.post(
-            "https://api.siliconflow.cn/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": EMBEDDING_MODEL,
-                "input": text[:8000],
-                "encoding_format": "float",
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        print(f"Error generating embedding: {e}", file=sys.stderr)
-        return None
-
-
 def save_working_memory(
     title: str,
     summary: str,
@@ -96,55 +61,56 @@ def save_working_memory(
     # 计算 valid_until
     valid_until = datetime.now() + timedelta(days=ttl_days)
 
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    try:
-        cur.execute(
-            """
-            INSERT INTO memory_cards
-            (layer, title, summary, keywords, context_tags,
-             source_item_ids, embedding, valid_from, valid_until, confidence)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, created_at
-            """,
-            (
-                1,  # L1 工作记忆
-                title,
-                summary,
-                keywords or [],
-                context_tags or [],
-                source_item_ids or [],
-                str(embedding) if embedding else None,
-                datetime.now(),  # valid_from
-                valid_until,
-                0.9,  # L1 默认高可信度（刚产出的知识）
-            ),
-        )
-        result = cur.fetchone()
-        conn.commit()
-
-        return {
-            "success": True,
-            "id": str(result[0]),
-            "layer": 1,
-            "created_at": result[1].isoformat(),
-            "valid_until": valid_until.isoformat(),
-            "ttl_days": ttl_days,
-            "has_embedding": embedding is not None,
-        }
-    except Exception as e:
-        conn.rollback()
-        return {
-            "success": False,
-            "error": str(e),
-        }
-    finally:
-        cur.close()
-        conn.close()
-
-
-def main():
+    with connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            cur.execute(
+                """
+                INSERT INTO memory_cards
+                (layer, title, summary, keywords, context_tags,
+                 source_item_ids, embedding, valid_from, valid_until, confidence)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id, created_at
+                """,
+                (
+                    1,  # L1 工作记忆
+                    title,
+                    summary,
+                    keywords or [],
+                    context_tags or [],
+                    source_item_ids or [],
+                    Vector(embedding) if embedding else None,
+                    datetime.now(),  # valid_from
+                    valid_until,
+                    0.9,  # L1 默认高可信度（刚产出的知识）
+                ),
+            )
+            result = cur.fetchone()
+            # 与写入同一事务让召回缓存失效
+            bump_generation(conn)
+            conn.commit()
+
+            return {
+                "success": True,
+                "id": str(result[0]),
+                "layer": 1,
+                "created_at": result[1].isoformat(),
+                "valid_until": valid_until.isoformat(),
+                "ttl_days": ttl_days,
+                "has_embedding": embedding is not None,
+            }
+        except Exception as e:
+            conn.rollback()
+            return {
+                "success": False,
+                "error": str(e),
+            }
+        finally:
+            cur.close()
+
+
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="写入 L1 工作记忆（Agent 任务中的关键决策和中间结论）")
     parser.add_argument("--title", required=True, help="记忆标题（如：决定使用 X 方案）")
     parser.add_argument("--summary", required=True, help="记忆内容/结论")
@@ -153,7 +119,7 @@ def main():
     parser.add_argument("--ttl-days", type=int, default=DEFAULT_TTL_DAYS,
                         help=f"有效期天数，默认 {DEFAULT_TTL_DAYS}")
     parser.add_argument("--source-item-ids", nargs="*", help="关联的 knowledge_items ID")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     keywords = [k.strip() for k in args.keywords.split(",") if k.strip()] if args.keywords else []
     context_tags = args.context_tags or []
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "psycopg2-binary",
 #     "python-dotenv",
 #     "requests",
@@ -21,16 +22,17 @@
 import argparse
 import json
 import math
-import os
 import sys
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
 
+from knowledge_db import connection
+from knowledge_vectors import embedding_matrix, similar_pairs
+
 sys.stdout.reconfigure(line_buffering=True)
 sys.stderr.reconfigure(line_buffering=True)
 
@@ -42,14 +44,6 @@ def log(msg: str = ""):
     """所有进度信息走 stderr，stdout 只输出 JSON"""
     print(msg, file=sys.stderr)
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
 SKILL_DIR = Path(__file__).parent.parent
 STATE_FILE = SKILL_DIR / ".tune-state.json"
 TSV_FILE = SKILL_DIR / "tune-results.tsv"
@@ -119,14 +113,13 @@ DIAGNOSTIC_QUERIES = [
 # ==================== 指标采集 ====================
 
 def _db_query(sql: str, params: list | None = None) -> list[dict]:
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cur.execute(sql, params)
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute(sql, params)
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
 
 
 def _count_active_cards() -> int:
@@ -191,17 +184,12 @@ def collect_metrics() -> dict[str, float]:
     metrics["cold_ratio"] = cold_count / total_cards if total_cards > 0 else 0.0
 
     # 疑似重复率：similarity > 0.90 的卡片对数 / 总卡片数
-    dup_rows = _db_query(
-        """
-        SELECT COUNT(*) AS n
-        FROM memory_cards a
-        JOIN memory_cards b ON a.id < b.id
-        WHERE a.embedding IS NOT NULL AND b.embedding IS NOT NULL
-          AND a.confidence > 0 AND b.confidence > 0
-          AND 1 - (a.embedding <=> b.embedding) > 0.90
-        """
+    # 进程内分块矩阵乘法，代替 O(n²) 的 SQL 自连接
+    embedding_rows = _db_query(
+        "SELECT embedding FROM memory_cards WHERE embedding IS NOT NULL AND confidence > 0"
     )
-    dup_pairs = int(dup_rows[0]["n"]) if dup_rows else 0
+    matrix = embedding_matrix(row["embedding"] for row in embedding_rows)
+    dup_pairs = len(similar_pairs(matrix, 0.90, inclusive=False))
     metrics["duplicate_ratio"] = dup_pairs / total_cards if total_cards > 0 else 0.0
 
     return metrics
@@ -540,12 +528,12 @@ def tune(dry_run: bool = False, force: bool = False) -> dict:
     }
 
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="记忆自进化调优器（紫金花机制）")
     parser.add_argument("--dry-run", action="store_true", help="只采集指标，不调参")
     parser.add_argument("--force", action="store_true", help="即使综合分 >= 80 也强制调优")
     parser.add_argument("--output", choices=["json", "markdown"], default="json")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     result = tune(dry_run=args.dry_run, force=args.force)
 
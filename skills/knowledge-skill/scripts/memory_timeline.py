@@ -18,67 +18,58 @@
 
 import argparse
 import json
-import os
 import sys
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
 
-load_dotenv(Path(__file__).parent.parent / ".env")
+from knowledge_db import connection
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
+load_dotenv(Path(__file__).parent.parent / ".env")
 
 
 def fetch_timeline(query: str, limit: int = 20, layer: int | None = None) -> list[dict[str, Any]]:
     """按时间顺序查询记忆卡片"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        conditions = ["confidence > 0"]
-        params: list[Any] = []
-
-        if layer is not None:
-            conditions.append("layer = %s")
-            params.append(layer)
-
-        # 关键词搜索：匹配 title、summary 或 keywords
-        words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
-        if not words:
-            words = [query]
-
-        word_conditions = []
-        for word in words:
-            word_conditions.append("(title ILIKE %s OR summary ILIKE %s)")
-            params.extend([f"%{word}%", f"%{word}%"])
-        conditions.append(f"({' OR '.join(word_conditions)})")
-
-        params.append(limit)
-
-        cur.execute(
-            f"""
-            SELECT id, layer, title, summary, keywords, context_tags,
-                   valid_from, valid_until, confidence, access_count, created_at
-            FROM memory_cards
-            WHERE {' AND '.join(conditions)}
-            ORDER BY valid_from ASC, created_at ASC
-            LIMIT %s
-            """,
-            params,
-        )
-        return [dict(row) for row in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            conditions = ["confidence > 0"]
+            params: list[Any] = []
+
+            if layer is not None:
+                conditions.append("layer = %s")
+                params.append(layer)
+
+            # 关键词搜索：匹配 title、summary 或 keywords
+            words = [w.strip() for w in query.split() if len(w.strip()) >= 2]
+            if not words:
+                words = [query]
+
+            word_conditions = []
+            for word in words:
+                word_conditions.append("(title ILIKE %s OR summary ILIKE %s)")
+                params.extend([f"%{word}%", f"%{word}%"])
+            conditions.append(f"({' OR '.join(word_conditions)})")
+
+            params.append(limit)
+
+            cur.execute(
+                f"""
+                SELECT id, layer, title, summary, keywords, context_tags,
+                       valid_from, valid_until, confidence, access_count, created_at
+                FROM memory_cards
+                WHERE {' AND '.join(conditions)}
+                ORDER BY valid_from ASC, created_at ASC
+                LIMIT %s
+                """,
+                params,
+            )
+            return [dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
 
 
 def build_timeline_events(cards: list[dict[str, Any]]) -> list[dict[str, Any]]:
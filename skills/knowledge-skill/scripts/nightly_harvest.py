@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
+#     "numpy",
 #     "python-dotenv",
 #     "requests",
 #     "psycopg2-binary"
@@ -19,11 +20,13 @@
 import argparse
 import json
 import os
+import queue
 import random
 import re
 import shutil
 import subprocess
 import sys
+import threading
 import time
 import requests
 
@@ -34,18 +37,31 @@ from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
+from knowledge_bulk import existing_knowledge_keys
+from knowledge_save import save_knowledge_many
+
 load_dotenv(Path(__file__).parent.parent / ".env")
 
 # 配置
-SCRIPTS = str(Path(__file__).parent)
-VENV = str(Path(__file__).parent.parent / ".venv" / "bin" / "python3")
 RESULTS_FILE = str(Path(__file__).parent.parent / "harvest_log.tsv")
+RESULTS_HEADER = [
+    "timestamp", "saved", "skipped", "failed", "total_found",
+    "crawl_s", "asr_s", "save_s", "wall_s", "asr_queue_max", "save_queue_max",
+]
 
 DEFAULT_KEYWORDS = ["像素范", "水球泡", "一人公司", "AI焦虑", "AI Agent"]
 PER_KEYWORD_LIMIT = 3
 DELAY_SEARCH = (3, 8)
 DELAY_READ = (2, 5)
 DELAY_KEYWORD = (5, 10)
+DELAY_ASR = (10, 20)
+
+# 流水线各阶段的并发数和队列容量（队列满时上游阻塞等待）
+ASR_WORKERS = 2
+ASR_QUEUE_SIZE = 8
+SAVE_WORKERS = 1
+SAVE_QUEUE_SIZE = 32
+SAVE_BATCH_SIZE = 20
 PROXY_ENV = {"http_proxy": "http://127.0.0.1:7890", "https_proxy": "http://127.0.0.1:7890"}
 
 # 飞书通知配置
@@ -155,28 +171,28 @@ def harvest_xhs(keyword, limit=3):
     return results
 
 
-def asr_video(bvid, title):
-    """下载B站视频音频并用SiliconFlow ASR转录"""
+def download_audio(bvid):
+    """下载B站视频音频，返回 (临时目录, 音频文件)；失败返回 None（调用方负责删除临时目录）"""
     import tempfile
-    import requests
 
-    # 1. 下载音频
     audio_dir = tempfile.mkdtemp(prefix="bili_asr_")
-    audio_file = os.path.join(audio_dir, "audio.m4a")
-
     ok, out, err = run(f"bili audio {bvid} --no-split -o {audio_dir} 2>&1", timeout=120)
     if not ok:
         print(f"      音频下载失败: {err[:50]}")
+        shutil.rmtree(audio_dir, ignore_errors=True)
         return None
 
     # 找实际文件名
     actual_files = [f for f in os.listdir(audio_dir) if f.endswith(".m4a")]
     if not actual_files:
         print(f"      音频文件不存在")
+        shutil.rmtree(audio_dir, ignore_errors=True)
         return None
-    audio_file = os.path.join(audio_dir, actual_files[0])
+    return audio_dir, os.path.join(audio_dir, actual_files[0])
 
-    # 2. SiliconFlow ASR
+
+def transcribe_audio(audio_file):
+    """SiliconFlow ASR 转录，失败返回 None"""
     api_key = os.environ.get("SILICONFLOW_API_KEY")
     if not api_key:
         print(f"      无SILICONFLOW_API_KEY")
@@ -204,12 +220,23 @@ def asr_video(bvid, title):
     except Exception as e:
         print(f"      ASR异常: {e}")
         return None
+
+
+def asr_video(bvid, title):
+    """下载B站视频音频并用SiliconFlow ASR转录"""
+    downloaded = download_audio(bvid)
+    if not downloaded:
+        return None
+    audio_dir, audio_file = downloaded
+    try:
+        return transcribe_audio(audio_file)
     finally:
         # 清理临时文件
         shutil.rmtree(audio_dir, ignore_errors=True)
 
 
-def harvest_bili(keyword, limit=3, use_asr=True):
+def harvest_bili(keyword, limit=3, use_asr=True, defer_asr=False):
+    """defer_asr=True 时不在这里转录，需要 ASR 的条目带 needs_asr=True 返回，交给流水线的 ASR 阶段"""
     ok, out, _ = run(f"bili search --type video --json -n {limit * 2} '{keyword}' 2>/dev/null")
     if not ok or not out:
         return []
@@ -245,22 +272,27 @@ def harvest_bili(keyword, limit=3, use_asr=True):
 
         content = f"作者: {item.get('author', '?')} | 播放: {item.get('play', 0)} | 时长: {duration_str}"
 
-        # ASR转录（只对时长<30分钟的）
-        if use_asr and duration_min > 0 and duration_min < 30:
-            if idx > 0:
-                safe_sleep(10, 20)  # ASR间隔长一些
-
-            asr_text = asr_video(bvid, title)
-            if asr_text:
-                content = asr_text
-
-        results.append({
+        result = {
             "source_type": "bilibili",
             "source_id": bvid,
             "title": title,
             "content": content,
             "source_url": f"https://www.bilibili.com/video/{bvid}",
-        })
+        }
+
+        # ASR转录（只对时长<30分钟的）
+        if use_asr and duration_min > 0 and duration_min < 30:
+            if defer_asr:
+                result["needs_asr"] = True
+            else:
+                if idx > 0:
+                    safe_sleep(*DELAY_ASR)  # ASR间隔长一些
+
+                asr_text = asr_video(bvid, title)
+                if asr_text:
+                    result["content"] = asr_text
+
+        results.append(result)
 
         if len(results) >= limit:
             break
@@ -269,49 +301,126 @@ def harvest_bili(keyword, limit=3, use_asr=True):
 
 
 def save_to_knowledge(items):
-    saved = 0
-    skipped = 0
-    for item in items:
-        ok, out, _ = run(
-            f'{VENV} {SCRIPTS}/knowledge_search.py '
-            f'--query "{item["source_id"]}" --mode keyword --limit 1',
-            timeout=15
-        )
-        if ok and out:
-            try:
-                data = json.loads(out)
-                if any(r.get("source_id") == item["source_id"] for r in data.get("results", [])):
-                    skipped += 1
-                    continue
-            except json.JSONDecodeError:
-                pass
-
-        escaped_title = item["title"].replace('"', '\\"').replace("'", "\\'")
-        escaped_content = item["content"].replace('"', '\\"').replace("'", "\\'")[:2000]
-
-        ok, out, _ = run(
-            f'{VENV} {SCRIPTS}/knowledge_save.py '
-            f'--source-type {item["source_type"]} '
-            f'--source-id {item["source_id"]} '
-            f'--title "{escaped_title}" '
-            f'--content "{escaped_content}" '
-            f'--source-url "{item.get("source_url", "")}"',
-            timeout=30
-        )
-
-        if ok:
-            try:
-                data = json.loads(out)
-                if data.get("success"):
-                    saved += 1
-                else:
-                    skipped += 1
-            except json.JSONDecodeError:
-                skipped += 1
+    """
+    在本进程批量入库：整批一次 (source_type, source_id) 查询去重（批内重复也只留第一条），
+    AI 摘要 / embedding 批量生成，按页多行 upsert，每页一个事务（见 knowledge_save.save_knowledge_many），
+    某页失败不影响已提交的页。
+    返回 (新增, 重复跳过, 写入失败)
+    """
+    keys = [(item["source_type"], item["source_id"]) for item in items]
+    seen = existing_knowledge_keys(keys)
+    fresh = []
+    for key, item in zip(keys, items):
+        if key in seen:
+            continue
+        seen.add(key)
+        fresh.append({**item, "source_url": item.get("source_url") or None})
+    skipped = len(items) - len(fresh)
+
+    saved = failed = 0
+    for item, result in zip(fresh, save_knowledge_many(fresh) if fresh else []):
+        if result["success"]:
+            saved += 1
         else:
-            skipped += 1
-
-    return saved, skipped
+            failed += 1
+            print(f"    入库失败 [{item['source_type']}] {item['source_id']}: {result.get('error')}", file=sys.stderr)
+
+    return saved, skipped, failed
+
+
+_DONE = object()
+
+
+class Stage:
+    """
+    流水线的一个阶段：有界队列 + 固定数量的工作线程。
+    队列满时 put 阻塞，上游自然被限速；记录处理条数、各线程累计耗时和队列最大深度。
+    batch_size > 1 时工作线程一次最多取 batch_size 条交给 fn（入库按批写更省）。
+    fn 抛异常时整批记为失败（failed），不影响后续条目。
+    """
+
+    def __init__(self, name, fn, workers=1, maxsize=8, batch_size=1):
+        self.name = name
+        self.fn = fn
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.lock = threading.Lock()
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self.threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, item):
+        self.queue.put(item)
+        with self.lock:
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _work(self):
+        # 每个线程各收一个 _DONE 后退出；_DONE 在所有条目之后入队，不会丢条目
+        while True:
+            batch, done = [], False
+            item = self.queue.get()
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._run(batch)
+            if done:
+                return
+
+    def _run(self, batch):
+        start = time.perf_counter()
+        failed = 0
+        try:
+            self.fn(batch if self.batch_size > 1 else batch[0])
+        except Exception as e:
+            failed = len(batch)
+            print(f"    [{self.name}] 出错，{failed} 条记为失败: {e}", file=sys.stderr)
+        with self.lock:
+            self.items += len(batch)
+            self.failed += failed
+            self.busy += time.perf_counter() - start
+
+    def close(self):
+        """等队列里的条目处理完，工作线程退出"""
+        for _ in self.threads:
+            self.queue.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        return {f"{self.name}_s": round(self.busy, 1), f"{self.name}_queue_max": self.max_depth}
+
+
+def append_results(row):
+    """追加一行收割结果；旧版日志表头列少，先把表头和旧行补齐到 RESULTS_HEADER 再追加"""
+    path = Path(RESULTS_FILE)
+    lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+    if not lines or lines[0].split("\t") != RESULTS_HEADER:
+        old_header = lines[0].split("\t") if lines else []
+        migrated = ["\t".join(RESULTS_HEADER)]
+        for line in lines[1:]:
+            old = dict(zip(old_header, line.split("\t")))
+            migrated.append("\t".join(old.get(column, "") for column in RESULTS_HEADER))
+        tmp = path.with_suffix(".tsv.tmp")
+        tmp.write_text("\n".join(migrated) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\t".join(str(row.get(column, "")) for column in RESULTS_HEADER) + "\n")
 
 
 def main():
@@ -319,11 +428,14 @@ def main():
     parser.add_argument("--dry-run", action="store_true")
     parser.add_argument("--keywords", help="逗号分隔")
     parser.add_argument("--limit", type=int, default=PER_KEYWORD_LIMIT)
+    parser.add_argument("--asr-workers", type=int, default=ASR_WORKERS, help="并发 ASR 转录的线程数")
+    parser.add_argument("--save-workers", type=int, default=SAVE_WORKERS, help="并发入库的线程数")
     args = parser.parse_args()
 
     keywords = args.keywords.split(",") if args.keywords else DEFAULT_KEYWORDS
     limit = args.limit
     ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    wall_start = time.perf_counter()
 
     print(f"{'='*50}")
     print(f"🌙 夜间知识收割 v3 — {ts}")
@@ -333,8 +445,72 @@ def main():
     print(f"搜索延迟: {DELAY_SEARCH[0]}~{DELAY_SEARCH[1]}秒")
     print(f"读取延迟: {DELAY_READ[0]}~{DELAY_READ[1]}秒")
 
-    print(f"\n📡 Step 1: 爬取内容")
+    # 流水线：爬取（本线程，按平台节奏延迟）→ ASR（线程池）→ 入库（线程池，按批写）
+    # 一个关键词爬完就把条目交给后面的阶段，ASR 和入库与下一个关键词的爬取同时进行
     all_items = []
+    seen = set()
+    totals = {"saved": 0, "skipped": 0, "failed": 0}
+    totals_lock = threading.Lock()
+
+    def save_batch(batch):
+        saved, skipped, failed = save_to_knowledge(batch)
+        with totals_lock:
+            totals["saved"] += saved
+            totals["skipped"] += skipped
+            totals["failed"] += failed
+
+    saver = None if args.dry_run else Stage(
+        "save", save_batch, workers=args.save_workers, maxsize=SAVE_QUEUE_SIZE, batch_size=SAVE_BATCH_SIZE)
+
+    def forward(item):
+        if saver:
+            saver.put(item)
+
+    # 音频下载打的是B站，仍按 DELAY_ASR 间隔逐个下载；转录打 SiliconFlow，多个线程并发
+    download_lock = threading.Lock()
+    downloads = [0]
+
+    def transcribe(item):
+        try:
+            with download_lock:
+                if downloads[0]:
+                    safe_sleep(*DELAY_ASR)
+                downloads[0] += 1
+                downloaded = download_audio(item["source_id"])
+            if downloaded:
+                audio_dir, audio_file = downloaded
+                try:
+                    text = transcribe_audio(audio_file)
+                finally:
+                    shutil.rmtree(audio_dir, ignore_errors=True)
+                if text:
+                    item["content"] = text
+        finally:
+            forward(item)
+
+    asr = Stage("asr", transcribe, workers=args.asr_workers, maxsize=ASR_QUEUE_SIZE)
+
+    found = [0]
+
+    def route(items):
+        found[0] += len(items)
+        for item in items:
+            needs_asr = item.pop("needs_asr", False)
+            key = (item["source_type"], item["source_id"])
+            # 不同关键词搜到同一条时只处理一次
+            if key in seen:
+                with totals_lock:
+                    totals["skipped"] += 1
+                continue
+            seen.add(key)
+            all_items.append(item)
+            if needs_asr:
+                asr.put(item)
+            else:
+                forward(item)
+
+    print("\n📡 Step 1: 爬取内容（ASR / 入库并行进行）")
+    crawl_start = time.perf_counter()
 
     for kw_idx, kw in enumerate(keywords):
         if kw_idx > 0:
@@ -343,16 +519,29 @@ def main():
         print(f"\n  小红书 '{kw}':")
         xhs_items = harvest_xhs(kw, limit)
         print(f"    找到 {len(xhs_items)} 条")
-        all_items.extend(xhs_items)
+        route(xhs_items)
 
         safe_sleep(*DELAY_SEARCH)
 
         print(f"  B站 '{kw}':")
-        bili_items = harvest_bili(kw, limit)
+        bili_items = harvest_bili(kw, limit, defer_asr=True)
         print(f"    找到 {len(bili_items)} 条")
-        all_items.extend(bili_items)
+        route(bili_items)
+
+    crawl_s = time.perf_counter() - crawl_start
+    print(f"\n  总计: {len(all_items)} 条，等待 ASR / 入库收尾...")
+
+    asr.close()
+    if saver:
+        saver.close()
 
-    print(f"\n  总计: {len(all_items)} 条")
+    timings = {
+        "crawl_s": round(crawl_s, 1),
+        **asr.stats(),
+        **(saver.stats() if saver else {}),
+        "wall_s": round(time.perf_counter() - wall_start, 1),
+    }
+    print(f"  阶段耗时: {json.dumps(timings, ensure_ascii=False)}")
 
     if args.dry_run:
         print(f"\n爬取结果 ({len(all_items)} 条):")
@@ -369,16 +558,20 @@ def main():
         print(f"\n结果已保存: {result_path}")
         return
 
-    print(f"\n💾 Step 2: 入库")
-    saved, skipped = save_to_knowledge(all_items)
-    print(f"  新增: {saved}, 跳过: {skipped}")
+    # 整批出错（如数据库断开）的条目由 Stage 计入 failed
+    saved, skipped, failed = totals["saved"], totals["skipped"], totals["failed"] + saver.failed
+    print(f"\n💾 入库: 新增 {saved}, 跳过 {skipped}, 失败 {failed}")
 
-    with open(RESULTS_FILE, "a") as f:
-        if os.stat(RESULTS_FILE).st_size == 0:
-            f.write("timestamp\tsaved\tskipped\ttotal_found\n")
-        f.write(f"{ts}\t{saved}\t{skipped}\t{len(all_items)}\n")
+    append_results({
+        "timestamp": ts,
+        "saved": saved,
+        "skipped": skipped,
+        "failed": failed,
+        "total_found": found[0],
+        **timings,
+    })
 
-    print(f"\n✅ 收割完成! 入库: {saved} 条 | 跳过: {skipped} 条")
+    print(f"\n✅ 收割完成! 入库: {saved} 条 | 跳过: {skipped} 条 | 失败: {failed} 条")
 
 
 if __name__ == "__main__":
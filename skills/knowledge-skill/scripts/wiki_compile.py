@@ -11,45 +11,52 @@
 Wiki 编译脚本 (Karpathy LLM-Wiki 模式)
 从知识库提取条目，利用 LLM 提取概念与实体，编译成带双向链接的结构化 wiki 页面。
 
-用法: python skills/knowledge-skill/scripts/wiki_compile.py [--limit 10] [--dry-run]
+增量编译：.compile-manifest.json 记录每个条目的内容哈希和 LLM 提取结果、每个生成页面的内容哈希。
+- 只有新增 / 内容变化的条目才会送去 LLM；未变化的条目直接复用上次的提取结果
+- 页面内容与清单里的哈希一致时不重写；条目变化时只改它涉及的 concept/entity 页面（去掉旧提及、加上新提及）
+- 没有任何页面变化时不重写 index.md；未变化的 wiki 跑一遍 --recompile 不调用 LLM
+
+流水线：需要 LLM 的条目并发提取（knowledge_llm 的在途上限 LLM_MAX_IN_FLIGHT + 限速 LLM_MAX_RPM），
+写页面、关联 memory_cards 仍按顺序在主线程里逐条进行，结果到一条处理一条。
+每条提取结果一完成就追加到 .compile-checkpoint.jsonl，每处理完一条就保存清单；
+中途中断后重跑，已完成的提取直接从检查点读取，不再调用 LLM。
+
+用法: python skills/knowledge-skill/scripts/wiki_compile.py [--limit 10] [--dry-run] [--recompile [--force]]
 """
 
 import argparse
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
-import psycopg2
 import psycopg2.extras
 
 psycopg2.extras.register_uuid()
 import requests
 
+from knowledge_db import connection
+from knowledge_llm import chat_completion, imap_ordered
+
 sys.stdout.reconfigure(line_buffering=True)
 
 # 加载环境变量
 load_dotenv(Path(__file__).parent.parent / ".env")
 load_dotenv(Path.home() / ".openclaw" / "secrets.env")
 
-# 配置
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", ""),
-    "port": int(os.getenv("DB_PORT", 5433)),
-    "user": os.getenv("DB_USER", ""),
-    "password": os.getenv("DB_PASSWORD", ""),
-    "dbname": os.getenv("DB_NAME", ""),
-}
-
 LONGCAT_API_KEY = os.getenv("LONGCAT_API_KEY")
 LONGCAT_BASE_URL = "https://api.longcat.chat/openai"
 
 # 切换到 LLM-Wiki 规范的目录结构
 WIKI_DIR = Path.home() / ".openclaw" / "workspace" / "llm-wiki"
 STATE_FILE = WIKI_DIR / ".compile-state.json"
+MANIFEST_FILE = WIKI_DIR / ".compile-manifest.json"
+CHECKPOINT_FILE = WIKI_DIR / ".compile-checkpoint.jsonl"
 INDEX_FILE = WIKI_DIR / "index.md"
 WIKI_PAGES_DIR = WIKI_DIR / "wiki"
 
@@ -61,50 +68,73 @@ USER_PROFILE_KEYWORDS = [
     "python", "工程", "框架", "开源", "rag", "karpathy"
 ]
 
-def get_uncompiled_entries(limit=20):
-    """查询未编译的条目"""
-    state = load_state()
-    compiled_ids = set(state.get("compiled_ids", []))
+# 提取 prompt / 页面模板改动时加一，清单里已缓存的提取结果随之全部失效
+COMPILER_VERSION = 1
 
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute("""
-            SELECT id, source_type, source_id, source_url, title, content, summary,
-                   ai_summary, created_at, metadata
-            FROM knowledge_items
-            ORDER BY created_at DESC
-            LIMIT %s
-        """, [limit * 5])
+ENTRY_FIELDS = """
+    k.id, k.source_type, k.source_id, k.source_url, k.title, k.content, k.summary,
+    k.ai_summary, k.created_at, k.metadata, h.content_hash
+"""
 
-        entries = cur.fetchall()
-        # 过滤已编译的 (使用 id 和 source_id 双重判断防止重复)
-        uncompiled = [e for e in entries if str(e["id"]) not in compiled_ids and str(e["source_id"]) not in compiled_ids]
+# 条目内容哈希：只包含会影响编译结果的字段，在数据库里算好，不用把全文拉回来比较
+CONTENT_HASH_SQL = """
+    CROSS JOIN LATERAL (
+        SELECT md5(concat_ws(chr(31), k.source_type, k.source_url, k.title, k.content,
+                             k.summary, k.ai_summary, k.created_at::date::text)) AS content_hash
+    ) h
+"""
 
-        return [dict(e) for e in uncompiled]
-    finally:
-        cur.close()
-        conn.close()
+def get_uncompiled_entries(limit=20, manifest=None):
+    """
+    查询需要编译的条目：清单里没有的新条目，或内容哈希与清单不一致的已编译条目。
+    清单之前（只有 compiled_ids）编译过的条目按 id / source_id 视为已编译。过滤都在 SQL 里完成。
+    """
+    state = load_state()
+    records = (manifest or load_manifest())["entries"]
+
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            cur.execute(f"""
+                WITH m(id, hash) AS (SELECT * FROM unnest(%(ids)s::text[], %(hashes)s::text[]))
+                SELECT {ENTRY_FIELDS}
+                FROM knowledge_items k
+                {CONTENT_HASH_SQL}
+                LEFT JOIN m ON m.id = k.id::text
+                WHERE CASE
+                    WHEN m.id IS NOT NULL THEN m.hash <> h.content_hash
+                    ELSE NOT (k.id::text = ANY(%(compiled)s) OR k.source_id = ANY(%(compiled)s))
+                END
+                ORDER BY k.created_at DESC
+                LIMIT %(limit)s
+            """, {
+                "ids": list(records),
+                "hashes": [record["hash"] for record in records.values()],
+                "compiled": [str(i) for i in state.get("compiled_ids", [])],
+                "limit": limit * 5,
+            })
+            return [dict(e) for e in cur.fetchall()]
+        finally:
+            cur.close()
 
 
 def get_all_entries(limit=50):
     """查询所有条目（用于 --recompile 模式）"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        cur.execute("""
-            SELECT id, source_type, source_id, source_url, title, content, summary,
-                   ai_summary, created_at, metadata
-            FROM knowledge_items
-            ORDER BY created_at DESC
-            LIMIT %s
-        """, [limit])
-        return [dict(e) for e in cur.fetchall()]
-    finally:
-        cur.close()
-        conn.close()
+    with connection() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        try:
+            cur.execute(f"""
+                SELECT {ENTRY_FIELDS}
+                FROM knowledge_items k
+                {CONTENT_HASH_SQL}
+                ORDER BY k.created_at DESC
+                LIMIT %s
+            """, [limit])
+            return [dict(e) for e in cur.fetchall()]
+        finally:
+            cur.close()
 
 def filter_by_profile(entries):
     """根据用户画像筛选高价值条目"""
@@ -153,7 +183,7 @@ def boost_by_targets(entries, target_concepts=None, target_entities=None):
 def analyze_article_with_llm(title, content):
     """用 LLM 提取摘要、概念、实体和关键论点 (Karpathy 降维法)"""
     if not LONGCAT_API_KEY:
-        return {"summary": "API 未配置", "concepts": [], "entities": [], "key_points": []}
+        return {"summary": "API 未配置", "concepts": [], "entities": [], "key_points": [], "error": "no_api_key"}
 
     text = re.sub(r'<[^>]+>', ' ', content)
     text = re.sub(r'\s+', ' ', text).strip()[:4000]
@@ -184,46 +214,83 @@ def analyze_article_with_llm(title, content):
 4. concept_details 和 entity_details 是对应概念/实体在本文语境下的具体含义，帮助生成更稠密的 wiki 页面。
 """
     try:
-        resp = requests.post(
-            f"{LONGCAT_BASE_URL}/chat/completions",
-            headers={"Authorization": f"Bearer {LONGCAT_API_KEY}", "Content-Type": "application/json"},
-            json={
-                "model": "LongCat-Flash-Lite",
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 500,
-                "temperature": 0.1,
-            },
+        # 走 knowledge_llm：并发上限、限速、429 / 5xx 退避重试都在那里
+        result_text = chat_completion(
+            prompt,
+            api_key=LONGCAT_API_KEY,
+            base_url=LONGCAT_BASE_URL,
+            model="LongCat-Flash-Lite",
+            max_tokens=500,
+            temperature=0.1,
             timeout=30,
         )
-        if resp.status_code == 200:
-            result_text = resp.json()["choices"][0]["message"]["content"].strip()
-            result_text = re.sub(r'^```json\s*', '', result_text)
-            result_text = re.sub(r'\s*```$', '', result_text)
-            parsed = json.loads(result_text)
-            # 确保所有字段都有默认值
-            parsed.setdefault("key_points", [])
-            parsed.setdefault("concept_details", {})
-            parsed.setdefault("entity_details", {})
-            return parsed
-        else:
-            print(f"      LongCat API 失败: {resp.status_code}")
+        result_text = re.sub(r'^```json\s*', '', result_text)
+        result_text = re.sub(r'\s*```$', '', result_text)
+        parsed = json.loads(result_text)
+        # 确保所有字段都有默认值
+        parsed.setdefault("key_points", [])
+        parsed.setdefault("concept_details", {})
+        parsed.setdefault("entity_details", {})
+        return parsed
+    except requests.HTTPError as e:
+        print(f"      LongCat API 失败: {e.response.status_code if e.response is not None else e}")
     except Exception as e:
         print(f"      解析异常: {e}")
 
-    return {"summary": "解析失败", "concepts": [], "entities": [], "key_points": [], "concept_details": {}, "entity_details": {}}
+    return {"summary": "解析失败", "concepts": [], "entities": [], "key_points": [], "concept_details": {}, "entity_details": {},
+            "error": "llm_failed"}
 
 def make_slug(text):
     slug = re.sub(r'[^\w\s-]', '', text.lower())
     return re.sub(r'[-\s]+', '-', slug).strip('-')[:50]
 
+
+def node_filename(node_type, name):
+    slug = make_slug(name)
+    return f"{node_type}-{slug}.md" if slug else None
+
+
+def page_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# 本次运行实际写过的页面（决定要不要重写 index.md）
+written_pages = set()
+
+
+def write_page(filepath, content, manifest=None):
+    """写入页面并在清单里记下内容哈希；内容与清单记录（或磁盘上的文件）一致时不写，返回是否写入"""
+    digest = page_hash(content)
+    pages = manifest["pages"] if manifest is not None else {}
+    if filepath.exists() and (pages.get(filepath.name) == digest or filepath.read_text() == content):
+        pages[filepath.name] = digest
+        return False
+    filepath.write_text(content)
+    pages[filepath.name] = digest
+    written_pages.add(filepath.name)
+    return True
+
+
+def remove_node_mention(node_type, name, source_title, source_filename, manifest=None):
+    """从 concept/entity 页面里去掉某个 source 的提及（链接行和来源语境行），返回是否改动"""
+    filename = node_filename(node_type, name)
+    filepath = WIKI_PAGES_DIR / filename if filename else None
+    if not filepath or not filepath.exists():
+        return False
+    link_line = f"- [[{source_filename.replace('.md', '')}]] ({source_title})"
+    context_prefix = f"- **{source_title}**: "
+    content = filepath.read_text()
+    kept = [line for line in content.split("\n") if line != link_line and not line.startswith(context_prefix)]
+    return write_page(filepath, "\n".join(kept), manifest)
+
+
 def update_or_create_node_page(node_type, name, source_title, source_filename,
-                               context_description=None):
+                               context_description=None, manifest=None):
     """创建或更新实体/概念页面，增加上下文描述让页面更稠密。"""
-    slug = make_slug(name)
-    if not slug:
+    filename = node_filename(node_type, name)
+    if not filename:
         return None
 
-    filename = f"{node_type}-{slug}.md"
     filepath = WIKI_PAGES_DIR / filename
 
     link_line = f"- [[{source_filename.replace('.md', '')}]] ({source_title})"
@@ -259,7 +326,7 @@ def update_or_create_node_page(node_type, name, source_title, source_filename,
             changed = True
 
         if changed:
-            filepath.write_text(content)
+            write_page(filepath, content, manifest)
     else:
         date_str = datetime.now().strftime("%Y-%m-%d")
         # 新页面：如果有 context_description 则加入
@@ -278,19 +345,30 @@ date: {date_str}
 ## 关联来源 (Mentions)
 {link_line}
 """
-        filepath.write_text(md)
+        write_page(filepath, md, manifest)
 
     return filename
 
-def compile_wiki_article(entry):
-    """将知识条目编译成 source wiki 页面"""
+def node_mentions(analysis):
+    """提取结果里的 (node_type, name) 列表"""
+    return ([("concept", c) for c in analysis.get("concepts", [])]
+            + [("entity", e) for e in analysis.get("entities", [])])
+
+
+def compile_wiki_article(entry, analysis=None, update_nodes=True, manifest=None):
+    """
+    将知识条目编译成 source wiki 页面。
+    analysis 为 None 时调用 LLM 提取，否则直接复用（清单里缓存的结果）；
+    update_nodes=False 时只生成 source 页面内容，不动 concept/entity 页面。
+    """
     title = entry["title"]
     content = entry.get("content", "") or entry.get("summary", "")
     source_url = entry.get("source_url", "")
     created_at = entry.get("created_at", datetime.now())
 
-    print(f"    [LLM] 正在深度分析并提取知识图谱...")
-    analysis = analyze_article_with_llm(title, content)
+    if analysis is None:
+        print(f"    [LLM] 正在深度分析并提取知识图谱...")
+        analysis = analyze_article_with_llm(title, content)
 
     slug = make_slug(title)
     filename = f"source-{slug}.md"
@@ -305,16 +383,22 @@ def compile_wiki_article(entry):
     concept_links = []
     for c in analysis.get("concepts", []):
         context_desc = concept_details.get(c)
-        c_file = update_or_create_node_page("concept", c, title, filename,
-                                            context_description=context_desc)
+        if update_nodes:
+            c_file = update_or_create_node_page("concept", c, title, filename,
+                                                context_description=context_desc, manifest=manifest)
+        else:
+            c_file = node_filename("concept", c)
         if c_file:
             concept_links.append(f"[[{c_file.replace('.md', '')}]]")
 
     entity_links = []
     for e in analysis.get("entities", []):
         context_desc = entity_details.get(e)
-        e_file = update_or_create_node_page("entity", e, title, filename,
-                                            context_description=context_desc)
+        if update_nodes:
+            e_file = update_or_create_node_page("entity", e, title, filename,
+                                                context_description=context_desc, manifest=manifest)
+        else:
+            e_file = node_filename("entity", e)
         if e_file:
             entity_links.append(f"[[{e_file.replace('.md', '')}]]")
 
@@ -359,86 +443,66 @@ tags: [{', '.join(tags)}]
     return filename, article_md, analysis
 
 
+LINK_CARDS_SQL = """
+WITH source_cards AS (
+    SELECT id FROM memory_cards
+    WHERE source_item_ids @> ARRAY[%(entry_id)s] AND confidence > 0
+),
+matching_cards AS (
+    SELECT id FROM memory_cards
+    WHERE keywords && %(terms)s AND confidence > 0
+),
+pairs AS (
+    SELECT s.id AS source_id, m.id AS match_id
+    FROM source_cards s JOIN matching_cards m ON m.id <> s.id
+),
+edges AS (
+    SELECT source_id AS card_id, match_id AS related_id FROM pairs
+    UNION
+    SELECT match_id, source_id FROM pairs
+),
+additions AS (
+    SELECT e.card_id, array_agg(e.related_id ORDER BY e.related_id) AS related_ids
+    FROM edges e JOIN memory_cards c ON c.id = e.card_id
+    WHERE NOT (e.related_id = ANY (COALESCE(c.related_card_ids, '{}')))
+    GROUP BY e.card_id
+),
+updated AS (
+    UPDATE memory_cards c
+    SET related_card_ids = COALESCE(c.related_card_ids, '{}') || a.related_ids, updated_at = NOW()
+    FROM additions a
+    WHERE c.id = a.card_id
+    RETURNING c.id
+)
+SELECT (SELECT count(*) FROM pairs) AS linked, (SELECT count(*) FROM updated) AS updated
+"""
+
+
 def link_wiki_to_memory_cards(entry_id, concepts, entities):
     """
     将 wiki 编译提取的概念/实体与 memory_cards 双向关联。
     找到 keywords 与 concepts/entities 有交集的 memory_cards，
-    将它们互相添加到 related_card_ids。
+    将它们与该条目对应的 memory_card 互相添加到 related_card_ids。
+    一条 SQL 完成：配对、去掉已有关联、按卡片合并后一次 UPDATE，概念命中几百张卡也只有一次往返。
+    返回关联的卡片对数（含之前已关联的）。
     """
     all_terms = list(set(concepts + entities))
     if not all_terms:
         return 0
 
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-    try:
-        # 找到 keywords 与提取的概念有交集的活跃 memory_cards
-        cur.execute(
-            """
-            SELECT id, related_card_ids
-            FROM memory_cards
-            WHERE confidence > 0
-              AND keywords && %s
-            """,
-            [all_terms],
-        )
-        matching_cards = [dict(row) for row in cur.fetchall()]
-
-        if not matching_cards:
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(LINK_CARDS_SQL, {"entry_id": str(entry_id), "terms": all_terms})
+            linked, _ = cur.fetchone()
+            conn.commit()
+            return linked
+        except Exception as e:
+            print(f"      Warning: memory card linking failed: {e}")
+            conn.rollback()
             return 0
-
-        # 找到该 knowledge_item 对应的 memory_card（如果有）
-        cur.execute(
-            """
-            SELECT id, related_card_ids
-            FROM memory_cards
-            WHERE source_item_ids @> ARRAY[%s]
-              AND confidence > 0
-            """,
-            [str(entry_id)],
-        )
-        source_cards = [dict(row) for row in cur.fetchall()]
-
-        linked = 0
-        for match_card in matching_cards:
-            for source_card in source_cards:
-                # 双向添加关联（related_card_ids 是 UUID[]，必须传 UUID 对象）
-                match_id = match_card["id"]
-                source_id = source_card["id"]
-
-                if match_id == source_id:
-                    continue
-
-                # source_card → match_card
-                existing = source_card.get("related_card_ids") or []
-                if match_id not in existing:
-                    existing.append(match_id)
-                    cur.execute(
-                        "UPDATE memory_cards SET related_card_ids = %s, updated_at = NOW() WHERE id = %s",
-                        [existing, source_card["id"]],
-                    )
-
-                # match_card → source_card
-                existing_m = match_card.get("related_card_ids") or []
-                if source_id not in existing_m:
-                    existing_m.append(source_id)
-                    cur.execute(
-                        "UPDATE memory_cards SET related_card_ids = %s, updated_at = NOW() WHERE id = %s",
-                        [existing_m, match_card["id"]],
-                    )
-
-                linked += 1
-
-        conn.commit()
-        return linked
-    except Exception as e:
-        print(f"      Warning: memory card linking failed: {e}")
-        conn.rollback()
-        return 0
-    finally:
-        cur.close()
-        conn.close()
+        finally:
+            cur.close()
 
 def load_state():
     if STATE_FILE.exists():
@@ -449,6 +513,56 @@ def save_state(state):
     STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
     STATE_FILE.write_text(json.dumps(state, indent=2))
 
+def load_manifest():
+    """
+    编译清单：entries[条目 id] = {hash, source_id, title, page, analysis}，pages[文件名] = 页面内容哈希。
+    COMPILER_VERSION 不一致时整份作废（页面哈希保留，照样能省掉内容相同的重写）。
+    """
+    manifest = {"version": COMPILER_VERSION, "entries": {}, "pages": {}}
+    if MANIFEST_FILE.exists():
+        try:
+            saved = json.loads(MANIFEST_FILE.read_text())
+        except ValueError:
+            return manifest
+        manifest["pages"] = saved.get("pages", {})
+        if saved.get("version") == COMPILER_VERSION:
+            manifest["entries"] = saved.get("entries", {})
+    return manifest
+
+def save_manifest(manifest):
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, default=str))
+    tmp.replace(MANIFEST_FILE)
+
+_checkpoint_lock = threading.Lock()
+
+def load_checkpoint():
+    """上次中断时已完成的提取：条目 id → {hash, analysis}（后写的覆盖先写的，截断的最后一行忽略）"""
+    done = {}
+    if CHECKPOINT_FILE.exists():
+        for line in CHECKPOINT_FILE.read_text().splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            done[record["id"]] = record
+    return done
+
+def append_checkpoint(entry, analysis):
+    """提取线程里调用：一条结果一行，追加写入后立即落盘"""
+    line = json.dumps({"id": str(entry["id"]), "hash": entry["content_hash"], "analysis": analysis},
+                      ensure_ascii=False, default=str)
+    with _checkpoint_lock:
+        CHECKPOINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with CHECKPOINT_FILE.open("a") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+def clear_checkpoint():
+    CHECKPOINT_FILE.unlink(missing_ok=True)
+
 def update_index():
     """扫描 wiki 目录，动态生成总索引"""
     sources, concepts, entities = [], [], []
@@ -483,12 +597,76 @@ def update_index():
 
     INDEX_FILE.write_text(index_md)
 
+def is_fresh(entry, record, force=False):
+    """清单里有这个条目、内容哈希一致且有缓存的提取结果"""
+    return (not force and record is not None and record["hash"] == entry["content_hash"]
+            and record.get("analysis") is not None)
+
+
+def analyze_entry(entry):
+    """流水线的并发阶段：调用 LLM 提取，成功的结果立即写进检查点"""
+    print(f"    [LLM] 提取中: {entry['title'][:40]}")
+    content = entry.get("content", "") or entry.get("summary", "")
+    analysis = analyze_article_with_llm(entry["title"], content)
+    if not analysis.get("error"):
+        append_checkpoint(entry, analysis)
+    return analysis
+
+
+def compile_entry(entry, record, manifest, force=False, analysis=None):
+    """
+    编译单个条目，返回 (状态, source 页面文件名, analysis)：
+    - "unchanged": 内容哈希与清单一致，复用缓存的提取结果，只在页面缺失 / 被改动时补写，不调用 LLM
+    - "compiled": 新增或内容变化，用传入的 analysis（为 None 时在这里调用 LLM）；
+      先从旧 concept/entity 页面去掉这个 source 的提及再重新写入
+    """
+    if is_fresh(entry, record, force):
+        analysis = record["analysis"]
+        filename, article_md, _ = compile_wiki_article(entry, analysis=analysis, update_nodes=False)
+        write_page(WIKI_PAGES_DIR / filename, article_md, manifest)
+        # 被手动删掉的 concept/entity 页面按缓存的提取结果补回
+        details = {**analysis.get("concept_details", {}), **analysis.get("entity_details", {})}
+        for node_type, name in node_mentions(analysis):
+            node_file = node_filename(node_type, name)
+            if node_file and not (WIKI_PAGES_DIR / node_file).exists():
+                update_or_create_node_page(node_type, name, entry["title"], filename,
+                                           context_description=details.get(name), manifest=manifest)
+        return "unchanged", filename, analysis
+
+    print(f"\n➡️ 处理: {entry['title'][:40]}...")
+    if record is not None:
+        for node_type, name in node_mentions(record.get("analysis") or {}):
+            remove_node_mention(node_type, name, record["title"], record["page"], manifest)
+
+    filename, article_md, analysis = compile_wiki_article(entry, analysis=analysis, manifest=manifest)
+    write_page(WIKI_PAGES_DIR / filename, article_md, manifest)
+    # 标题变了 source 页面会换文件名，删掉旧的
+    if record is not None and record["page"] != filename:
+        (WIKI_PAGES_DIR / record["page"]).unlink(missing_ok=True)
+        manifest["pages"].pop(record["page"], None)
+        written_pages.add(record["page"])
+
+    if analysis.get("error"):
+        # 提取失败不进清单，下次 --recompile 会重试
+        manifest["entries"].pop(str(entry["id"]), None)
+    else:
+        manifest["entries"][str(entry["id"])] = {
+            "hash": entry["content_hash"],
+            "source_id": str(entry.get("source_id", entry["id"])),
+            "title": entry["title"],
+            "page": filename,
+            "analysis": analysis,
+        }
+    return "compiled", filename, analysis
+
+
 def main():
     parser = argparse.ArgumentParser(description="Karpathy LLM-Wiki 编译器")
     parser.add_argument("--limit", type=int, default=5, help="编译数量上限")
     parser.add_argument("--dry-run", action="store_true", help="只打印不写入")
     parser.add_argument("--recompile", action="store_true",
-                        help="重编译模式：对所有已编译条目重新提取，用增强版 LLM prompt 覆盖旧页面")
+                        help="重编译模式：重新生成所有条目的页面；内容没变的条目复用清单里的提取结果，不调用 LLM")
+    parser.add_argument("--force", action="store_true", help="忽略编译清单，所有选中的条目都重新调用 LLM 提取")
     parser.add_argument("--target-concept", action="append", help="优先编译能增强此 concept 的条目，可重复传入")
     parser.add_argument("--target-entity", action="append", help="优先编译能增强此 entity 的条目，可重复传入")
     args = parser.parse_args()
@@ -504,6 +682,7 @@ def main():
         print(f"🎯 定向增强: {', '.join(targets)}")
 
     WIKI_PAGES_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
 
     if args.recompile:
         # 重编译模式：获取所有条目（含已编译），重新生成增强版页面
@@ -512,8 +691,8 @@ def main():
         filtered = boost_by_targets(filtered, args.target_concept, args.target_entity)
         filtered = filtered[:args.limit]
     else:
-        # 正常模式：只编译新条目
-        uncompiled = get_uncompiled_entries(args.limit * 2)
+        # 正常模式：只编译新条目和内容变化的条目
+        uncompiled = get_uncompiled_entries(args.limit * 2, manifest)
         filtered = filter_by_profile(uncompiled)
         filtered = boost_by_targets(filtered, args.target_concept, args.target_entity)
         filtered = filtered[:args.limit]
@@ -525,25 +704,48 @@ def main():
     if args.dry_run:
         print(f"🔍 待编译条目 (dry-run): {len(filtered)} 条")
         for entry in filtered:
-            print(f"  - {entry['title'][:60]}")
+            record = manifest["entries"].get(str(entry["id"]))
+            status = "新增" if record is None else "未变化" if record["hash"] == entry["content_hash"] else "已变化"
+            print(f"  - [{status}] {entry['title'][:60]}")
         return
 
     state = load_state()
+    counts = {"compiled": 0, "unchanged": 0}
 
+    # 流水线：需要 LLM 的条目交给并发提取阶段（上次中断时已提取完的从检查点取），其余按顺序逐条写入
+    checkpoint = load_checkpoint()
+    resumed = {}
+    jobs = []
     for entry in filtered:
-        print(f"\n➡️ 处理: {entry['title'][:40]}...")
-        filename, article_md, analysis = compile_wiki_article(entry)
+        entry_id = str(entry["id"])
+        if is_fresh(entry, manifest["entries"].get(entry_id), args.force):
+            continue
+        saved = checkpoint.get(entry_id)
+        if saved and saved["hash"] == entry["content_hash"]:
+            resumed[entry_id] = saved["analysis"]
+        else:
+            jobs.append(entry)
+    job_ids = {str(entry["id"]) for entry in jobs}
+    analyses = imap_ordered(analyze_entry, jobs)
+    if jobs or resumed:
+        print(f"🧵 并发提取 {len(jobs)} 条（检查点恢复 {len(resumed)} 条）")
 
-        article_file = WIKI_PAGES_DIR / filename
-        article_file.write_text(article_md)
+    for entry in filtered:
+        entry_id = str(entry.get("id"))
+        analysis = next(analyses) if entry_id in job_ids else resumed.get(entry_id)
+        status, filename, analysis = compile_entry(entry, manifest["entries"].get(entry_id), manifest,
+                                                   force=args.force, analysis=analysis)
+        counts[status] += 1
 
         # 记录已编译
-        entry_id = str(entry.get("id"))
         source_id = str(entry.get("source_id", entry["id"]))
         if entry_id not in state["compiled_ids"]:
             state["compiled_ids"].append(entry_id)
         if source_id not in state["compiled_ids"]:
             state["compiled_ids"].append(source_id)
+        if status == "unchanged":
+            continue
+
         print(f"  ✅ 页面已生成: {filename}")
         print(f"  🧠 提取概念: {', '.join(analysis.get('concepts', []))}")
         print(f"  🏢 提取实体: {', '.join(analysis.get('entities', []))}")
@@ -561,9 +763,20 @@ def main():
         if linked > 0:
             print(f"  🔗 已关联 {linked} 对 memory_cards")
 
+        # 逐条保存进度：中断后重跑时，已写完的条目按清单跳过
+        save_state(state)
+        save_manifest(manifest)
+
     save_state(state)
-    update_index()
-    print("\n✅ 知识图谱索引 index.md 已更新。编译完成！")
+    save_manifest(manifest)
+    clear_checkpoint()
+    print(f"\n📊 LLM 提取 {len(jobs)} 条，检查点恢复 {len(resumed)} 条，复用 {counts['unchanged']} 条，"
+          f"重写页面 {len(written_pages)} 个")
+    if written_pages or not INDEX_FILE.exists():
+        update_index()
+        print("✅ 知识图谱索引 index.md 已更新。编译完成！")
+    else:
+        print("✅ 页面均无变化，跳过 index.md。编译完成！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()